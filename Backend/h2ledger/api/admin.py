@@ -5,4 +5,7 @@ from .models import *
 admin.site.register(HydrogenBatch)
 admin.site.register(Credit)
 admin.site.register(Transaction)
-admin.site.register(Payment)
\ No newline at end of file
+admin.site.register(Payment)
+admin.site.register(Trade)
+admin.site.register(UserLedgerSummary)
+admin.site.register(ChainSnapshot)
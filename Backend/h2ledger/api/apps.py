@@ -4,3 +4,25 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .expiry_service import order_expiry_service
+        from .auction_service import auction_service
+        from .chain_snapshot_service import chain_snapshot_service
+        from .price_history_service import price_history_service
+        from .chain_tx_service import chain_tx_service
+        from .chain_indexer import chain_indexer
+
+        # Periodic expiry sweep, enabled via TRADING_SETTINGS['EXPIRY_SWEEP_INTERVAL']
+        order_expiry_service.start()
+        # Call auctions for auction-mode batches, enabled via TRADING_SETTINGS['AUCTION_INTERVAL']
+        auction_service.start()
+        # Chain price/supply/balance snapshots, enabled via BLOCKCHAIN_SETTINGS['SNAPSHOT_INTERVAL']
+        chain_snapshot_service.start()
+        # MarketPrice downsampling, enabled via TRADING_SETTINGS['PRICE_COMPACTION_INTERVAL']
+        price_history_service.start()
+        # Submission and receipts of mirrored chain writes, enabled via BLOCKCHAIN_SETTINGS['RECEIPT_POLL_INTERVAL']
+        chain_tx_service.start()
+        # Contract Transfer logs copied into ChainEvent, enabled via BLOCKCHAIN_SETTINGS['INDEXER_INTERVAL']
+        chain_indexer.start()
@@ -0,0 +1,97 @@
+"""
+Async views for H2Ledger
+ASGI variants of the read-heavy endpoints, built on Django's async ORM so a
+request waiting on the database does not hold a worker thread
+"""
+
+from django.db.models import Sum
+from django.http import JsonResponse
+from rest_framework import status
+
+from .models import Credit, HydrogenBatch, Transaction
+from .serializers import HydrogenBatchSerializer
+from .dashboard_cache import dashboard_cache
+from .dashboard_service import dashboard_service
+from .views import _credit_detail_payload
+from auth1.models import User1
+
+
+def _error(message, code):
+    return JsonResponse({'error': message}, status=code)
+
+
+async def _query_user(request):
+    """The User1 named by `user_id` (authentication is disabled), or None"""
+    user_id = request.GET.get('user_id', '')
+    if not user_id.isdigit():
+        return None
+    return await User1.objects.filter(pk=user_id).afirst()
+
+
+async def hydrogen_leaderboard(request):
+    """Async variant of views.hydrogen_leaderboard"""
+    leaderboard = (
+        Transaction.objects.filter(tx_type="burn")
+        .values("from_user__email")
+        .annotate(total_hydrogen_used=Sum("amount"))
+        .order_by("-total_hydrogen_used")
+    )
+    leaderboard_list = [
+        {
+            "email": entry["from_user__email"],
+            "total_hydrogen_used": float(entry["total_hydrogen_used"] or 0),
+        }
+        async for entry in leaderboard if entry["from_user__email"]
+    ]
+    return JsonResponse({"leaderboard": leaderboard_list}, status=status.HTTP_200_OK)
+
+
+async def list_hydrogen_batches(request):
+    """Async variant of views.list_hydrogen_batches"""
+    try:
+        # The serializer reads producer.name, which must not trigger a sync query
+        batches = [
+            batch async for batch in
+            HydrogenBatch.objects.select_related("producer").order_by("-created_at")
+        ]
+        serializer = HydrogenBatchSerializer(batches, many=True)
+        return JsonResponse(serializer.data, safe=False, status=status.HTTP_200_OK)
+    except Exception as e:
+        return _error(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def credit_detail(request, credit_id):
+    """Async variant of views.credit_detail; like it, only for the authenticated owner"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return _error("Authentication credentials were not provided.", status.HTTP_403_FORBIDDEN)
+    try:
+        credit = await Credit.objects.select_related('batch__producer').aget(credit_id=credit_id, owner=user)
+        transactions = [
+            tx async for tx in Transaction.objects.filter(credit=credit).select_related(
+                'from_user', 'to_user'
+            ).order_by('-timestamp')
+        ]
+        return JsonResponse(_credit_detail_payload(credit, transactions), status=status.HTTP_200_OK)
+
+    except Credit.DoesNotExist:
+        return _error("Credit not found", status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return _error(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def dashboard_analytics(request):
+    """Comprehensive dashboard analytics for `user_id`, sections run as coroutines"""
+    user = await _query_user(request)
+    if user is None:
+        return _error("user_id is required", status.HTTP_400_BAD_REQUEST)
+    return JsonResponse(await dashboard_service.aget_comprehensive_analytics(user), status=status.HTTP_200_OK)
+
+
+async def market_data(request):
+    """Current price, 24h volume and change, and the 7-day trend"""
+    try:
+        data = await dashboard_cache.aget_market(dashboard_service._aget_market_analytics)
+        return JsonResponse(data, status=status.HTTP_200_OK)
+    except Exception as e:
+        return _error(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
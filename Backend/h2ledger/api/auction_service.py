@@ -0,0 +1,95 @@
+"""
+Auction service for H2Ledger
+Periodic call-auction clearing for batches switched to auction matching mode
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+
+from .models import HydrogenBatch, TradingOrder
+from .matching_engine import OPEN_STATUSES, matching_engine
+
+logger = logging.getLogger(__name__)
+
+
+class AuctionService:
+    """
+    Clears every auction-mode batch that has open orders, one call auction
+    per batch per interval
+    """
+
+    def __init__(self):
+        trading_config = getattr(settings, 'TRADING_SETTINGS', {})
+        self.interval = trading_config.get('AUCTION_INTERVAL', 0)
+        self._thread = None
+        self._stop = threading.Event()
+
+    def pending_batches(self):
+        """Auction-mode batches with orders waiting to be cleared"""
+        return list(
+            TradingOrder.objects.filter(
+                status__in=OPEN_STATUSES,
+                credit_batch__matching_mode='auction'
+            ).values_list('credit_batch_id', flat=True).distinct()
+        )
+
+    def run(self):
+        """Clear all pending auctions; returns {batch_id: AuctionResult} for batches that traded"""
+        results = {}
+        for batch_id in self.pending_batches():
+            result = matching_engine.clear_auction(batch_id)
+            if result is not None:
+                results[batch_id] = result
+                logger.info(
+                    f"Auction for batch {batch_id} cleared {result.volume} at {result.price} "
+                    f"({len(result.pairs)} fills)"
+                )
+        return results
+
+    def set_mode(self, batch_id, mode):
+        """
+        Switch a batch between continuous and auction matching.
+        Leaving auction mode runs a final clearing so that resting orders
+        enter the continuous book uncrossed.
+        """
+        batch = HydrogenBatch.objects.get(batch_id=batch_id)
+        if batch.matching_mode == mode:
+            return batch
+        if batch.matching_mode == 'auction':
+            matching_engine.clear_auction(batch_id)
+
+        batch.matching_mode = mode
+        batch.save(update_fields=['matching_mode'])
+        # The resident book has to gain or drop this batch's resting orders
+        matching_engine.reset()
+        return batch
+
+    def start(self, interval=None):
+        """Run auctions periodically in a background daemon thread"""
+        interval = interval or self.interval
+        if not interval or (self._thread and self._thread.is_alive()):
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name='call-auction', daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Call auction clearing started (every {interval}s)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"Error clearing call auctions: {e}")
+
+
+# Global auction service instance
+auction_service = AuctionService()
@@ -5,22 +5,46 @@ Handles Web3 interactions with the HydrogenCredits smart contract
 
 import json
 import os
+import threading
+import time
 from decimal import Decimal
 from typing import Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
 from web3 import Web3
 from web3.contract import Contract
+from web3.exceptions import TransactionNotFound
 from django.conf import settings
 import logging
 
+from .nonce_manager import NonceManager, classify_send_error, raw_transaction, send_transaction
+from .rpc_batch import RpcBatchClient
+
 logger = logging.getLogger(__name__)
 
 class BlockchainService:
+    """
+    Construction only reads settings. The Web3 client, its pooled HTTP
+    session, the contract ABI and the account are built on first use,
+    without any RPC, so importing this module costs no round trips and
+    never fails when the node is down.
+
+    Whether the node is reachable comes from a health probe whose result
+    is reused for HEALTH_TTL seconds. With HEALTH_CHECK_INTERVAL set, a
+    background thread started with the client keeps it fresh, so callers
+    never wait on a probe.
+    """
+
     def __init__(self):
-        # Initialize Web3 connection
-        self.w3 = None
-        self.contract = None
-        self.account = None
-        self.private_key = None
+        self._w3 = None
+        self._contract = None
+        self._account = None
+        self._nonces = None
+        self._connect_lock = threading.Lock()
+        self._healthy = False
+        self._health_checked_at = None
+        self._health_thread = None
+        self._health_stop = threading.Event()
         
         # Configuration
         blockchain_config = getattr(settings, 'BLOCKCHAIN_SETTINGS', {})
@@ -29,9 +53,14 @@ class BlockchainService:
         self.private_key = blockchain_config.get('PRIVATE_KEY', None)
         self.gas_limit = blockchain_config.get('GAS_LIMIT', 3000000)
         self.gas_price = blockchain_config.get('GAS_PRICE', 20000000000)
-        self.contract_abi = self._load_contract_abi()
-        
-        self._initialize_connection()
+        self.chain_id = blockchain_config.get('CHAIN_ID')
+        self.rpc_timeout = blockchain_config.get('RPC_TIMEOUT', 10)
+        self.pool_size = blockchain_config.get('RPC_POOL_SIZE', 10)
+        self.health_interval = blockchain_config.get('HEALTH_CHECK_INTERVAL', 0)
+        self.health_ttl = blockchain_config.get('HEALTH_TTL', 30)
+        self.batch_size = blockchain_config.get('RPC_BATCH_SIZE', 500)
+        self.batch_concurrency = blockchain_config.get('RPC_BATCH_CONCURRENCY', 4)
+        self.rpc_batch = None
 
     def _load_contract_abi(self) -> List[Dict]:
         """Load contract ABI from artifacts"""
@@ -95,42 +124,126 @@ class BlockchainService:
                 "outputs": [{"name": "", "type": "uint256"}],
                 "stateMutability": "view",
                 "type": "function"
+            },
+            {
+                "inputs": [],
+                "name": "getMarketPrice",
+                "outputs": [{"name": "", "type": "uint256"}],
+                "stateMutability": "view",
+                "type": "function"
             }
         ]
 
-    def _initialize_connection(self):
-        """Initialize Web3 connection and contract instance"""
+    def _connect(self):
+        """Build the client on first use; makes no RPC, so it cannot fail on a down node"""
+        if self._w3 is not None:
+            return
+        with self._connect_lock:
+            if self._w3 is not None:
+                return
+
+            # One keep-alive pool shared by every thread and by batched reads
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            w3 = Web3(Web3.HTTPProvider(self.rpc_url, request_kwargs={'timeout': self.rpc_timeout}, session=session))
+            self.rpc_batch = RpcBatchClient(
+                self.rpc_url,
+                chunk_size=self.batch_size,
+                concurrency=self.batch_concurrency,
+                timeout=self.rpc_timeout,
+                session=session,
+            )
+            self._nonces = NonceManager(w3)
+
+            try:
+                # Load account from environment variables
+                private_key = os.getenv('BLOCKCHAIN_PRIVATE_KEY')
+                if private_key:
+                    self._account = w3.eth.account.from_key(private_key)
+                    self.private_key = private_key
+                    logger.info(f"Loaded blockchain account: {self._account.address}")
+
+                # Initialize contract if address is provided
+                if self.contract_address and Web3.is_address(self.contract_address):
+                    self._contract = w3.eth.contract(
+                        address=Web3.to_checksum_address(self.contract_address),
+                        abi=self._load_contract_abi()
+                    )
+            except Exception as e:
+                logger.error(f"Error initializing blockchain client: {e}")
+
+            # Published last, so other threads only ever see a finished client
+            self._w3 = w3
+        self.start()
+
+    @property
+    def w3(self):
+        self._connect()
+        return self._w3
+
+    @property
+    def contract(self):
+        self._connect()
+        return self._contract
+
+    @property
+    def account(self):
+        self._connect()
+        return self._account
+
+    @property
+    def nonces(self):
+        self._connect()
+        return self._nonces
+
+    def probe(self) -> bool:
+        """Ask the node whether it is up and remember the answer"""
         try:
-            # Connect to blockchain
-            self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
-            
-            if not self.w3.is_connected():
+            healthy = self.w3.is_connected()
+        except Exception:
+            healthy = False
+        if healthy != self._healthy:
+            if healthy:
+                logger.info(f"Connected to blockchain at {self.rpc_url}")
+            else:
                 logger.warning(f"Unable to connect to blockchain at {self.rpc_url}")
-                return
-            
-            logger.info(f"Connected to blockchain at {self.rpc_url}")
-            
-            # Load account from environment variables
-            private_key = os.getenv('BLOCKCHAIN_PRIVATE_KEY')
-            if private_key:
-                self.account = self.w3.eth.account.from_key(private_key)
-                self.private_key = private_key
-                logger.info(f"Loaded blockchain account: {self.account.address}")
-            
-            # Initialize contract if address is provided
-            if self.contract_address and Web3.is_address(self.contract_address):
-                self.contract = self.w3.eth.contract(
-                    address=self.contract_address,
-                    abi=self.contract_abi
-                )
-                logger.info(f"Contract initialized at {self.contract_address}")
-            
-        except Exception as e:
-            logger.error(f"Error initializing blockchain connection: {e}")
+        self._healthy = healthy
+        self._health_checked_at = time.monotonic()
+        return healthy
 
     def is_connected(self) -> bool:
-        """Check if blockchain connection is active"""
-        return self.w3 is not None and self.w3.is_connected()
+        """Whether the node answered the last health probe (probing again once it is HEALTH_TTL old)"""
+        if self._health_checked_at is None or time.monotonic() - self._health_checked_at > self.health_ttl:
+            return self.probe()
+        return self._healthy
+
+    def is_ready(self) -> bool:
+        """Whether contract writes can be sent"""
+        return bool(self.contract and self.account) and self.is_connected()
+
+    def start(self, interval=None):
+        """Probe the node periodically in a background daemon thread"""
+        interval = interval or self.health_interval
+        if not interval or (self._health_thread and self._health_thread.is_alive()):
+            return False
+
+        self._health_stop.clear()
+        self._health_thread = threading.Thread(
+            target=self._run, args=(interval,), name='chain-health-probe', daemon=True
+        )
+        self._health_thread.start()
+        return True
+
+    def stop(self):
+        self._health_stop.set()
+
+    def _run(self, interval):
+        while True:
+            self.probe()
+            if self._health_stop.wait(interval):
+                break
 
     def get_balance(self, address: str) -> Decimal:
         """Get credit balance for an address"""
@@ -147,8 +260,101 @@ class BlockchainService:
             logger.error(f"Error getting balance for {address}: {e}")
             return Decimal('0')
 
-    def mint_credits(self, to_address: str, amount: Decimal) -> Optional[str]:
-        """Mint new credits to an address"""
+    def get_balances(self, addresses: List[str], block_identifier: Optional[int] = None) -> Tuple[int, Dict[str, Decimal]]:
+        """
+        Credit balances of many addresses, all read at one block (the latest
+        unless given) through batched JSON-RPC instead of one request per
+        address. Returns (block number, {address: balance}); invalid
+        addresses are left out. Raises when the node or any call fails.
+        """
+        if not self.contract:
+            raise ValueError("Contract not initialized")
+        block = self.w3.eth.block_number if block_identifier is None else block_identifier
+        addresses = [address for address in addresses if Web3.is_address(address)]
+        raw = self.rpc_batch.balances_of(self.contract_address, addresses, block)
+        return block, {address: Decimal(balance) / Decimal(10 ** 18) for address, balance in raw.items()}
+
+    def _submit(self, function, nonce: Optional[int] = None, gas_price: Optional[int] = None,
+                on_signed=None) -> Tuple[str, int, int]:
+        """
+        Sign and send a contract call from the service account without
+        waiting for it to be mined; returns (hash, nonce, gas price). Nonces
+        come from the local allocator, so calls can be pipelined; passing
+        a nonce instead replaces the transaction already sent with it.
+        `on_signed(hash, nonce, gas price)` runs just before each send.
+        """
+        address = self.account.address
+        gas_price = gas_price or self.w3.eth.gas_price
+        if self.chain_id is None:
+            self.chain_id = self.w3.eth.chain_id
+        used = {}
+
+        def build(nonce):
+            used['nonce'] = nonce
+            return function.build_transaction({
+                'from': address,
+                'nonce': nonce,
+                'gas': 100000,
+                'gasPrice': gas_price,
+                'chainId': self.chain_id,
+            })
+
+        def signed(raw, nonce):
+            if on_signed is not None:
+                on_signed(Web3.to_hex(Web3.keccak(raw)), nonce, gas_price)
+
+        if nonce is None:
+            tx_hash = send_transaction(self.w3, self.nonces, address, self.private_key, build, on_signed=signed)
+        else:
+            raw = raw_transaction(self.w3.eth.account.sign_transaction(build(nonce), self.private_key))
+            signed(raw, nonce)
+            try:
+                tx_hash = self.w3.eth.send_raw_transaction(raw)
+            except Exception as e:
+                # Signing the same nonce and gas price again gives the identical transaction
+                if classify_send_error(e) != 'known':
+                    raise
+                tx_hash = Web3.keccak(raw)
+        return Web3.to_hex(tx_hash), used['nonce'], gas_price
+
+    def submit_call(self, kind: str, payload: Dict, nonce: Optional[int] = None,
+                    gas_price: Optional[int] = None, on_signed=None) -> Tuple[str, int, int]:
+        """
+        Send the mint, transfer or burn described by a PendingChainTx
+        payload without waiting; returns (hash, nonce, gas price)
+        """
+        amount_wei = int(Decimal(payload['amount']) * Decimal(10 ** 18))
+        functions = self.contract.functions
+        if kind == 'mint':
+            function = functions.mintCredits(Web3.to_checksum_address(payload['to']), amount_wei)
+        elif kind == 'transfer':
+            function = functions.transfer(Web3.to_checksum_address(payload['to']), amount_wei)
+        elif kind == 'burn':
+            function = functions.burnCredits(amount_wei)
+        else:
+            raise ValueError(f"Unknown chain write: {kind}")
+        return self._submit(function, nonce=nonce, gas_price=gas_price, on_signed=on_signed)
+
+    def _confirm(self, tx_hash: str) -> bool:
+        """Wait for a submitted transaction to be mined; True if it succeeded"""
+        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        if receipt.status != 1:
+            logger.error(f"Transaction failed: {receipt}")
+            return False
+        return True
+
+    def wait_for_receipts(self, tx_hashes: List[str], timeout: int = 120) -> Dict[str, bool]:
+        """Wait for several submitted transactions; maps each hash to whether it succeeded"""
+        return {
+            tx_hash: self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout).status == 1
+            for tx_hash in tx_hashes
+        }
+
+    def mint_credits(self, to_address: str, amount: Decimal, wait: bool = True) -> Optional[str]:
+        """
+        Mint new credits to an address. With wait=False the transaction hash
+        is returned as soon as the node accepts it.
+        """
         try:
             if not self.contract or not self.account:
                 logger.error("Contract or account not initialized")
@@ -161,34 +367,18 @@ class BlockchainService:
             # Convert amount to wei (18 decimals)
             amount_wei = int(amount * Decimal(10 ** 18))
             
-            # Build transaction
-            function = self.contract.functions.mintCredits(to_address, amount_wei)
-            transaction = function.build_transaction({
-                'from': self.account.address,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
-                'gas': 100000,
-                'gasPrice': self.w3.eth.gas_price,
-            })
-            
-            # Sign and send transaction
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            
-            # Wait for transaction confirmation
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-            
-            if receipt.status == 1:
-                logger.info(f"Successfully minted {amount} credits to {to_address}")
-                return receipt.transactionHash.hex()
-            else:
-                logger.error(f"Transaction failed: {receipt}")
+            tx_hash, _, _ = self._submit(self.contract.functions.mintCredits(to_address, amount_wei))
+            if wait and not self._confirm(tx_hash):
                 return None
+            
+            logger.info(f"Successfully {'minted' if wait else 'submitted mint of'} {amount} credits to {to_address}")
+            return tx_hash
                 
         except Exception as e:
             logger.error(f"Error minting credits: {e}")
             return None
 
-    def transfer_credits(self, from_address: str, to_address: str, amount: Decimal) -> Optional[str]:
+    def transfer_credits(self, from_address: str, to_address: str, amount: Decimal, wait: bool = True) -> Optional[str]:
         """Transfer credits between addresses"""
         try:
             if not self.contract:
@@ -204,30 +394,18 @@ class BlockchainService:
             
             # For simplicity, using the contract owner account
             # In production, you'd need proper key management
-            function = self.contract.functions.transfer(to_address, amount_wei)
-            transaction = function.build_transaction({
-                'from': self.account.address,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
-                'gas': 100000,
-                'gasPrice': self.w3.eth.gas_price,
-            })
-            
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-            
-            if receipt.status == 1:
-                logger.info(f"Successfully transferred {amount} credits to {to_address}")
-                return receipt.transactionHash.hex()
-            else:
-                logger.error(f"Transfer failed: {receipt}")
+            tx_hash, _, _ = self._submit(self.contract.functions.transfer(to_address, amount_wei))
+            if wait and not self._confirm(tx_hash):
                 return None
+            
+            logger.info(f"Successfully {'transferred' if wait else 'submitted transfer of'} {amount} credits to {to_address}")
+            return tx_hash
                 
         except Exception as e:
             logger.error(f"Error transferring credits: {e}")
             return None
 
-    def burn_credits(self, amount: Decimal) -> Optional[str]:
+    def burn_credits(self, amount: Decimal, wait: bool = True) -> Optional[str]:
         """Burn credits (offset emissions)"""
         try:
             if not self.contract or not self.account:
@@ -236,24 +414,12 @@ class BlockchainService:
             
             amount_wei = int(amount * Decimal(10 ** 18))
             
-            function = self.contract.functions.burnCredits(amount_wei)
-            transaction = function.build_transaction({
-                'from': self.account.address,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
-                'gas': 100000,
-                'gasPrice': self.w3.eth.gas_price,
-            })
-            
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-            
-            if receipt.status == 1:
-                logger.info(f"Successfully burned {amount} credits")
-                return receipt.transactionHash.hex()
-            else:
-                logger.error(f"Burn failed: {receipt}")
+            tx_hash, _, _ = self._submit(self.contract.functions.burnCredits(amount_wei))
+            if wait and not self._confirm(tx_hash):
                 return None
+            
+            logger.info(f"Successfully {'burned' if wait else 'submitted burn of'} {amount} credits")
+            return tx_hash
                 
         except Exception as e:
             logger.error(f"Error burning credits: {e}")
@@ -273,15 +439,28 @@ class BlockchainService:
             logger.error(f"Error getting total supply: {e}")
             return Decimal('0')
 
+    def get_market_price(self) -> Optional[Decimal]:
+        """Market price per credit set on the contract (stored in wei)"""
+        try:
+            if not self.contract:
+                return None
+            
+            price_wei = self.contract.functions.getMarketPrice().call()
+            return Decimal(price_wei) / Decimal(10 ** 18)
+            
+        except Exception as e:
+            logger.error(f"Error getting market price: {e}")
+            return None
+
     def get_transaction_receipt(self, tx_hash: str) -> Optional[Dict]:
-        """Get transaction receipt"""
+        """Get transaction receipt; None while the transaction is not mined"""
         try:
             if not self.w3:
                 return None
             
             receipt = self.w3.eth.get_transaction_receipt(tx_hash)
             return {
-                'transactionHash': receipt.transactionHash.hex(),
+                'transactionHash': Web3.to_hex(receipt.transactionHash),
                 'blockNumber': receipt.blockNumber,
                 'gasUsed': receipt.gasUsed,
                 'status': receipt.status,
@@ -289,10 +468,29 @@ class BlockchainService:
                 'to': receipt['to']
             }
             
+        except TransactionNotFound:
+            return None
         except Exception as e:
             logger.error(f"Error getting transaction receipt: {e}")
             return None
 
 
+    def get_transaction(self, tx_hash: str) -> Optional[Dict]:
+        """
+        A transaction the node knows, pending or mined; None if it has never
+        seen it. Unlike the receipt lookup, RPC errors are raised rather than
+        read as "not found", since callers resend what is not found.
+        """
+        try:
+            tx = self.w3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            return None
+        return {'hash': Web3.to_hex(tx['hash']), 'nonce': tx['nonce'], 'blockNumber': tx['blockNumber']}
+
+    def pending_nonce(self) -> int:
+        """The service account's next nonce on the node, counting transactions still in its pool"""
+        return self.w3.eth.get_transaction_count(self.account.address, 'pending')
+
+
 # Global blockchain service instance
 blockchain_service = BlockchainService()
@@ -0,0 +1,133 @@
+"""
+Candle service for H2Ledger
+Maintains OHLCV candles at fixed resolutions from recorded trades
+"""
+
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Least
+
+from .models import Candle
+
+
+# Typed so SQLite compares prices numerically rather than as text
+CANDLE_PRICE = DecimalField(max_digits=10, decimal_places=2)
+
+
+RESOLUTIONS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+
+def bucket_start(timestamp, resolution):
+    """Floor a timestamp to the start of its candle bucket (UTC)"""
+    seconds = RESOLUTIONS[resolution]
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+
+class CandleService:
+    """
+    Folds (timestamp, price, quantity) prints into candles.
+    Prints are expected in time order, as the matching engine produces them.
+    """
+
+    def aggregate(self, prints):
+        """Build in-memory candles keyed by (resolution, bucket_start)"""
+        candles = {}
+        for timestamp, price, quantity in prints:
+            price = Decimal(price)
+            quantity = Decimal(quantity)
+            for resolution in RESOLUTIONS:
+                key = (resolution, bucket_start(timestamp, resolution))
+                candle = candles.get(key)
+                if candle is None:
+                    candles[key] = Candle(
+                        resolution=resolution, bucket_start=key[1],
+                        open=price, high=price, low=price, close=price,
+                        volume=quantity, notional=price * quantity, trade_count=1,
+                    )
+                    continue
+                candle.high = max(candle.high, price)
+                candle.low = min(candle.low, price)
+                candle.close = price
+                candle.volume += quantity
+                candle.notional += price * quantity
+                candle.trade_count += 1
+        return candles
+
+    def merge(self, candles):
+        """
+        Merge aggregated candles into the table. Existing buckets are folded
+        with one conditional UPDATE each (F/Greatest/Least, so no read is
+        needed); buckets that did not exist yet are bulk inserted.
+        """
+        if not candles:
+            return
+
+        with transaction.atomic():
+            created = [new for new in candles.values() if not self._fold(new)]
+            if not created:
+                return
+            try:
+                with transaction.atomic():
+                    Candle.objects.bulk_create(created)
+            except IntegrityError:
+                # Another process opened some of these buckets first; fold into theirs
+                for new in created:
+                    try:
+                        with transaction.atomic():
+                            new.save(force_insert=True)
+                    except IntegrityError:
+                        self._fold(new)
+
+    @staticmethod
+    def _fold(new):
+        """Fold one aggregated candle into its stored bucket; 0 if there is none"""
+        return Candle.objects.filter(resolution=new.resolution, bucket_start=new.bucket_start).update(
+            high=Greatest('high', Value(new.high, output_field=CANDLE_PRICE)),
+            low=Least('low', Value(new.low, output_field=CANDLE_PRICE)),
+            close=new.close,
+            volume=F('volume') + new.volume,
+            notional=F('notional') + new.notional,
+            trade_count=F('trade_count') + new.trade_count,
+        )
+
+    def record_trades(self, trades):
+        """Fold a match cycle's Trade rows into the candles"""
+        self.merge(self.aggregate(
+            (trade.executed_at, trade.price, trade.quantity) for trade in trades
+        ))
+
+    def _candle_query(self, resolution, start, end, limit):
+        """Queryset for a candle range and whether its rows come newest first"""
+        candles = Candle.objects.filter(resolution=resolution)
+        if start is not None:
+            candles = candles.filter(bucket_start__gte=bucket_start(start, resolution))
+        if end is not None:
+            candles = candles.filter(bucket_start__lte=end)
+        if start is None:
+            # Without a start, return the most recent `limit` candles
+            return candles.order_by('-bucket_start')[:limit], True
+        return candles.order_by('bucket_start')[:limit], False
+
+    def get_candles(self, resolution, start=None, end=None, limit=500):
+        """Read a range of candles for one resolution, oldest first"""
+        candles, newest_first = self._candle_query(resolution, start, end, limit)
+        candles = list(candles)
+        return candles[::-1] if newest_first else candles
+
+    async def aget_candles(self, resolution, start=None, end=None, limit=500):
+        """Async ORM variant of get_candles"""
+        candles, newest_first = self._candle_query(resolution, start, end, limit)
+        candles = [candle async for candle in candles]
+        return candles[::-1] if newest_first else candles
+
+
+# Global candle service instance
+candle_service = CandleService()
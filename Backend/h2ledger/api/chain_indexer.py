@@ -0,0 +1,192 @@
+"""
+Chain event indexer for H2Ledger
+Copies the credits contract's Transfer logs into ChainEvent, resuming from a block checkpoint
+"""
+
+from decimal import Decimal
+import logging
+import re
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ChainCheckpoint, ChainEvent
+from .chain_snapshot_service import ChainUnavailable, WEI
+
+logger = logging.getLogger(__name__)
+
+# keccak('Transfer(address,address,uint256)'), the ERC20 event; mints come from and burns go to zero
+TRANSFER_TOPIC = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+ZERO_ADDRESS = '0x' + '0' * 40
+ADDRESS_PATTERN = re.compile(r'^0x[0-9a-fA-F]{40}$')
+
+
+def is_hex_address(value):
+    """Shape check for a wallet address, without importing web3 into request paths"""
+    return bool(ADDRESS_PATTERN.match(value or ''))
+
+
+def as_hex(value):
+    return value if isinstance(value, str) else '0x' + bytes(value).hex()
+
+
+def decode_transfer(log):
+    """An unsaved ChainEvent for one Transfer log"""
+    topics = [as_hex(topic) for topic in log['topics']]
+    from_address = '0x' + topics[1][-40:].lower()
+    to_address = '0x' + topics[2][-40:].lower()
+    if from_address == ZERO_ADDRESS:
+        event = 'mint'
+    elif to_address == ZERO_ADDRESS:
+        event = 'burn'
+    else:
+        event = 'transfer'
+    return ChainEvent(
+        block_number=log['blockNumber'],
+        block_hash=as_hex(log['blockHash']),
+        tx_hash=as_hex(log['transactionHash']),
+        log_index=log['logIndex'],
+        event=event,
+        from_address='' if event == 'mint' else from_address,
+        to_address='' if event == 'burn' else to_address,
+        amount=Decimal(int(as_hex(log['data']), 16)) / WEI,
+    )
+
+
+def serialize_event(event):
+    return {
+        'blockNumber': event.block_number,
+        'txHash': event.tx_hash,
+        'logIndex': event.log_index,
+        'event': event.event,
+        'from': event.from_address or None,
+        'to': event.to_address or None,
+        'amount': float(event.amount),
+    }
+
+
+class ChainIndexer:
+    """
+    Each pass reads logs from the block after the checkpoint to the head,
+    INDEXER_CHUNK_BLOCKS at a time. A chunk's events and the new
+    checkpoint commit together, and inserts ignore logs already stored,
+    so a pass interrupted at any point resumes cleanly.
+
+    The checkpoint keeps the hash of its block. When the chain no longer
+    has that hash a reorg replaced it: events above the confirmation
+    depth (INDEXER_CONFIRMATIONS blocks below the checkpoint) are deleted
+    and indexing resumes from there.
+    """
+
+    def __init__(self):
+        blockchain_config = getattr(settings, 'BLOCKCHAIN_SETTINGS', {})
+        self.contract_address = (blockchain_config.get('CONTRACT_ADDRESS') or '').lower()
+        self.chunk_blocks = blockchain_config.get('INDEXER_CHUNK_BLOCKS', 2000)
+        self.confirmations = blockchain_config.get('INDEXER_CONFIRMATIONS', 12)
+        self.start_block = blockchain_config.get('INDEXER_START_BLOCK', 0)
+        self.interval = blockchain_config.get('INDEXER_INTERVAL', 0)
+        self._thread = None
+        self._stop = threading.Event()
+
+    def checkpoint(self):
+        return ChainCheckpoint.objects.filter(contract_address=self.contract_address).first()
+
+    @staticmethod
+    def _block_hash(w3, block_number):
+        return as_hex(w3.eth.get_block(block_number)['hash'])
+
+    def _rewind(self, w3, checkpoint):
+        """Roll back past a reorg; returns the checkpoint to resume from (None to start over)"""
+        if checkpoint is None or self._block_hash(w3, checkpoint.block_number) == checkpoint.block_hash:
+            return checkpoint
+
+        target = checkpoint.block_number - self.confirmations
+        logger.warning(f"Reorg below indexed block {checkpoint.block_number}; rolling back to block {target}")
+        with transaction.atomic():
+            ChainEvent.objects.filter(block_number__gt=target).delete()
+            if target < self.start_block:
+                checkpoint.delete()
+                return None
+            checkpoint.block_number = target
+            checkpoint.block_hash = self._block_hash(w3, target)
+            checkpoint.save()
+        return checkpoint
+
+    def index(self, service=None, max_chunks=None):
+        """Index from the checkpoint to the current head; returns the number of events stored"""
+        from web3 import Web3
+
+        if service is None:
+            from .blockchain_service import blockchain_service as service
+        if not self.contract_address or not service.is_connected():
+            raise ChainUnavailable(f"Blockchain node unavailable at {service.rpc_url}")
+
+        w3 = service.w3
+        checkpoint = self._rewind(w3, self.checkpoint())
+        next_block = checkpoint.block_number + 1 if checkpoint else self.start_block
+        head = w3.eth.block_number
+        stored = 0
+        chunks = 0
+
+        while next_block <= head and (max_chunks is None or chunks < max_chunks):
+            to_block = min(head, next_block + self.chunk_blocks - 1)
+            to_hash = self._block_hash(w3, to_block)
+            logs = w3.eth.get_logs({
+                'address': Web3.to_checksum_address(self.contract_address),
+                'fromBlock': next_block,
+                'toBlock': to_block,
+                'topics': [TRANSFER_TOPIC],
+            })
+            if self._block_hash(w3, to_block) != to_hash:
+                # The chunk's last block changed while its logs were read; read it again
+                continue
+
+            events = [decode_transfer(log) for log in logs if not log.get('removed')]
+            with transaction.atomic():
+                ChainEvent.objects.bulk_create(events, batch_size=500, ignore_conflicts=True)
+                ChainCheckpoint.objects.update_or_create(
+                    contract_address=self.contract_address,
+                    defaults={'block_number': to_block, 'block_hash': to_hash},
+                )
+            stored += len(events)
+            next_block = to_block + 1
+            chunks += 1
+        return stored
+
+    def events_for(self, address, limit=100):
+        """The address's indexed events, newest first"""
+        address = address.lower()
+        return list(
+            ChainEvent.objects.filter(Q(from_address=address) | Q(to_address=address))
+            .order_by('-block_number', '-log_index')[:limit]
+        )
+
+    def start(self, interval=None):
+        """Index periodically in a background daemon thread"""
+        interval = interval or self.interval
+        if not interval or (self._thread and self._thread.is_alive()):
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name='chain-event-indexer', daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Chain event indexer started (every {interval}s)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.index()
+            except Exception as e:
+                logger.error(f"Error indexing chain events: {e}")
+
+
+# Global chain event indexer instance
+chain_indexer = ChainIndexer()
@@ -0,0 +1,175 @@
+"""
+Chain snapshot service for H2Ledger
+Background refresher that keeps on-chain price, supply and watched balances in a local snapshot
+"""
+
+from decimal import Decimal
+import logging
+import threading
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from .models import ChainSnapshot
+from .dashboard_cache import dashboard_cache
+from auth1.models import User1
+
+logger = logging.getLogger(__name__)
+
+CHAIN_KEY = 'chain'
+WEI = Decimal(10 ** 18)
+
+
+class ChainUnavailable(Exception):
+    pass
+
+
+class ChainSnapshotService:
+    """
+    Polls the contract on a schedule and stores what dashboards show from
+    the chain, all read at one block so the figures are consistent with
+    each other. Readers only ever see the stored snapshot: no request
+    waits on the node, and a failing node shows up as a growing age.
+    """
+
+    def __init__(self):
+        blockchain_config = getattr(settings, 'BLOCKCHAIN_SETTINGS', {})
+        self.contract_address = blockchain_config.get('CONTRACT_ADDRESS') or ''
+        self.interval = blockchain_config.get('SNAPSHOT_INTERVAL', 0)
+        self.max_age = blockchain_config.get('SNAPSHOT_MAX_AGE', 120)
+        self.extra_addresses = blockchain_config.get('WATCHED_ADDRESSES', [])
+        self._thread = None
+        self._stop = threading.Event()
+
+    def watched_addresses(self):
+        """User wallets plus any configured addresses, lower-cased and deduplicated"""
+        from web3 import Web3
+
+        addresses = list(User1.objects.values_list('wallet_address', flat=True)) + list(self.extra_addresses)
+        return sorted({address.lower() for address in addresses if Web3.is_address(address)})
+
+    def read_chain(self, service, addresses):
+        """Read price, supply and balances pinned to the latest block; raises when the node is unusable"""
+        if service.contract is None or not service.is_connected():
+            raise ChainUnavailable(f"Blockchain node unavailable at {service.rpc_url}")
+
+        block = service.w3.eth.block_number
+        functions = service.contract.functions
+        try:
+            market_price = Decimal(functions.getMarketPrice().call(block_identifier=block)) / WEI
+        except Exception as e:
+            # Contracts deployed without the price feature still have supply and balances
+            logger.warning(f"Market price unavailable at block {block}: {e}")
+            market_price = None
+
+        return {
+            'block_number': block,
+            'market_price': market_price,
+            'total_supply': Decimal(functions.totalSupply().call(block_identifier=block)) / WEI,
+            # One batched round trip per RPC_BATCH_SIZE wallets rather than one per wallet
+            'balances': {
+                address: str(balance)
+                for address, balance in service.get_balances(addresses, block_identifier=block)[1].items()
+            },
+        }
+
+    def refresh(self, service=None):
+        """Take a new snapshot; on failure the previous one is kept and the error recorded"""
+        if service is None:
+            from .blockchain_service import blockchain_service as service
+
+        attempted_at = now()
+        try:
+            state = self.read_chain(service, self.watched_addresses())
+        except Exception as e:
+            logger.error(f"Error refreshing chain snapshot: {e}")
+            ChainSnapshot.objects.filter(contract_address=self.contract_address).update(
+                last_error=str(e), last_attempt_at=attempted_at
+            )
+            dashboard_cache.invalidate([CHAIN_KEY])
+            return None
+
+        snapshot, _ = ChainSnapshot.objects.update_or_create(
+            contract_address=self.contract_address,
+            defaults=dict(state, synced_at=attempted_at, last_attempt_at=attempted_at, last_error=''),
+        )
+        dashboard_cache.invalidate([CHAIN_KEY])
+        return snapshot
+
+    def _load(self):
+        snapshot = ChainSnapshot.objects.filter(contract_address=self.contract_address).first()
+        return snapshot or False  # False is cacheable, None would count as a miss
+
+    async def _aload(self):
+        snapshot = await ChainSnapshot.objects.filter(contract_address=self.contract_address).afirst()
+        return snapshot or False
+
+    def latest(self):
+        """The stored snapshot (cached until the next refresh), or None"""
+        return dashboard_cache.get_or_compute(CHAIN_KEY, self._load) or None
+
+    async def alatest(self):
+        return await dashboard_cache.aget_or_compute(CHAIN_KEY, self._aload) or None
+
+    def for_user(self, user):
+        """Chain figures for a dashboard, with how old they are"""
+        return self._describe(self.latest(), user)
+
+    async def afor_user(self, user):
+        return self._describe(await self.alatest(), user)
+
+    def _describe(self, snapshot, user):
+        if snapshot is None:
+            return {
+                'blockchain_price': None,
+                'blockchain_balance': None,
+                'sync_timestamp': None,
+                'stale': True,
+                'error': 'No chain snapshot yet',
+            }
+
+        age = (now() - snapshot.synced_at).total_seconds()
+        wallet = (getattr(user, 'wallet_address', '') or '').lower()
+        balance = snapshot.balances.get(wallet)
+        data = {
+            'blockchain_price': float(snapshot.market_price) if snapshot.market_price is not None else None,
+            'blockchain_balance': float(balance) if balance is not None else None,
+            'total_supply': float(snapshot.total_supply),
+            'block_number': snapshot.block_number,
+            'sync_timestamp': snapshot.synced_at.isoformat(),
+            'age_seconds': round(age, 1),
+            'stale': age > self.max_age,
+        }
+        if snapshot.last_error:
+            data['error'] = snapshot.last_error
+        return data
+
+    def start(self, interval=None):
+        """Refresh periodically in a background daemon thread"""
+        interval = interval or self.interval
+        if not interval or (self._thread and self._thread.is_alive()):
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name='chain-snapshot', daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Chain snapshot refresher started (every {interval}s)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing chain snapshot: {e}")
+            if self._stop.wait(interval):
+                break
+
+
+# Global chain snapshot service instance
+chain_snapshot_service = ChainSnapshotService()
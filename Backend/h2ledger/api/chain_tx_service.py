@@ -0,0 +1,272 @@
+"""
+Chain transaction service for H2Ledger
+Queues on-chain writes behind ledger transactions and settles them from a background receipt poller
+"""
+
+from datetime import timedelta
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .models import Credit, LedgerChange, PendingChainTx, Transaction
+from .change_feed import change_feed
+from .dashboard_cache import dashboard_cache
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_chain_tx(pending):
+    return {
+        'txId': pending.ledger_tx_id,
+        'kind': pending.kind,
+        'status': pending.status,
+        'chainTxHash': pending.tx_hash,
+        'nonce': pending.nonce,
+        'attempts': pending.attempts,
+        'blockNumber': pending.block_number,
+        'error': pending.error or None,
+        'submittedAt': pending.submitted_at.isoformat() if pending.submitted_at else None,
+    }
+
+
+class ChainTxService:
+    """
+    A ledger write only inserts a queued PendingChainTx in its own DB
+    transaction, so the request never waits on the node. Once it commits
+    the poller is woken, sends the queued writes (nonces come from the
+    local allocator, so they pipeline) and then collects receipts for
+    submitted ones a batch at a time.
+
+    Every worker process runs a poller, so a queued row is first claimed
+    with a conditional UPDATE to 'submitting'. Only the poller whose claim
+    matched sends it; the others skip it. A failed send that may be
+    retried goes back to 'queued'.
+
+    The hash, nonce and gas price are recorded on the row once signed and
+    before the node can see the transaction. A row left 'submitting' for
+    STUCK_TX_AFTER seconds (its worker died mid-send) is claimed again,
+    and it and any retried row are checked on chain before resending: a
+    hash the node knows is not sent again, a nonce still unused is signed
+    again into the identical transaction, and only a nonce taken by
+    another transaction makes the write go out with a fresh one.
+
+    A transaction with no receipt after STUCK_TX_AFTER seconds is resent
+    with the same nonce and a higher gas price; whichever version is
+    mined settles the row. Confirmed hashes replace the placeholder
+    tx_hash of the ledger Transaction (and of the Credit it minted), and
+    every outcome reaches the parties through the change feed.
+    """
+
+    def __init__(self):
+        blockchain_config = getattr(settings, 'BLOCKCHAIN_SETTINGS', {})
+        self.mirror_writes = blockchain_config.get('MIRROR_WRITES', False)
+        self.interval = blockchain_config.get('RECEIPT_POLL_INTERVAL', 0)
+        self.batch_size = blockchain_config.get('RECEIPT_BATCH_SIZE', 100)
+        self.stuck_after = timedelta(seconds=blockchain_config.get('STUCK_TX_AFTER', 60))
+        self.gas_bump_percent = blockchain_config.get('GAS_BUMP_PERCENT', 15)
+        self.max_attempts = blockchain_config.get('MAX_TX_ATTEMPTS', 5)
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    @staticmethod
+    def payload_for(ledger_tx):
+        """Contract call arguments mirroring a ledger Transaction, or None if it has no chain write"""
+        amount = str(ledger_tx.amount)
+        if ledger_tx.tx_type == 'mint':
+            return {'to': ledger_tx.to_user.wallet_address, 'amount': amount}
+        if ledger_tx.tx_type == 'transfer':
+            return {
+                'from': ledger_tx.from_user.wallet_address,
+                'to': ledger_tx.to_user.wallet_address,
+                'amount': amount,
+            }
+        if ledger_tx.tx_type == 'burn':
+            return {'amount': amount}
+        return None
+
+    def enqueue(self, ledger_tx):
+        """Queue the chain write for a new ledger Transaction; call inside its DB transaction"""
+        payload = self.payload_for(ledger_tx)
+        if payload is None:
+            return None
+        pending = PendingChainTx.objects.create(ledger_tx=ledger_tx, kind=ledger_tx.tx_type, payload=payload)
+        transaction.on_commit(self._wake.set)
+        return pending
+
+    def _send(self, pending, service, **replacing):
+        def record(tx_hash, nonce, gas_price):
+            pending.tx_hash, pending.nonce, pending.gas_price = tx_hash, nonce, gas_price
+            PendingChainTx.objects.filter(pk=pending.pk).update(
+                tx_hash=tx_hash, nonce=nonce, gas_price=gas_price, updated_at=now()
+            )
+        service.submit_call(pending.kind, pending.payload, on_signed=record, **replacing)
+
+    def _resend(self, pending, service):
+        """Send a write whose transaction was signed before, and may have reached the node"""
+        if service.get_transaction(pending.tx_hash) is not None:
+            return
+        if service.pending_nonce() > pending.nonce:
+            # Another transaction took the nonce, so the recorded one can never be mined
+            self._send(pending, service)
+        else:
+            self._send(pending, service, nonce=pending.nonce, gas_price=pending.gas_price)
+
+    def _submit(self, pending, service):
+        pending.attempts += 1
+        try:
+            if pending.nonce is None:
+                self._send(pending, service)
+            else:
+                self._resend(pending, service)
+        except Exception as e:
+            logger.error(f"Error submitting chain tx {pending.id}: {e}")
+            pending.error = str(e)
+            if pending.attempts >= self.max_attempts:
+                self._finish(pending, 'failed')
+            else:
+                pending.status = 'queued'
+                pending.save(update_fields=['status', 'attempts', 'error', 'updated_at'])
+            return
+        pending.status = 'submitted'
+        pending.submitted_at = now()
+        pending.error = ''
+        pending.save()
+
+    def _bump(self, pending, service):
+        """Resend a stuck transaction with the same nonce and a higher gas price"""
+        from .nonce_manager import classify_send_error
+
+        gas_price = pending.gas_price * (100 + self.gas_bump_percent) // 100
+        try:
+            tx_hash, _, gas_price = service.submit_call(
+                pending.kind, pending.payload, nonce=pending.nonce, gas_price=gas_price
+            )
+        except Exception as e:
+            if classify_send_error(e) == 'behind':
+                # A version already sent was mined; its receipt settles the row on the next poll
+                return
+            logger.error(f"Error replacing chain tx {pending.id}: {e}")
+            pending.error = str(e)
+            pending.save(update_fields=['error', 'updated_at'])
+            return
+        logger.warning(f"Chain tx {pending.id} stuck; resent nonce {pending.nonce} at {gas_price} wei")
+        pending.replaced_hashes = pending.replaced_hashes + [pending.tx_hash]
+        pending.tx_hash = tx_hash
+        pending.gas_price = gas_price
+        pending.attempts += 1
+        pending.submitted_at = now()
+        pending.save()
+
+    def _receipt(self, pending, service):
+        """The receipt of whichever version of the transaction was mined, or None"""
+        for tx_hash in [pending.tx_hash] + pending.replaced_hashes[::-1]:
+            receipt = service.get_transaction_receipt(tx_hash)
+            if receipt:
+                return receipt
+        return None
+
+    def _finish(self, pending, status):
+        """Record the outcome, and on confirmation swap the chain hash onto the ledger rows"""
+        with transaction.atomic():
+            pending.status = status
+            pending.save()
+            ledger_tx = Transaction.objects.only('credit_id', 'tx_hash', 'from_user_id', 'to_user_id').get(
+                pk=pending.ledger_tx_id
+            )
+            if status == 'confirmed':
+                # A mint shares its placeholder hash with the credit it created
+                Credit.objects.filter(pk=ledger_tx.credit_id, tx_hash=ledger_tx.tx_hash).update(tx_hash=pending.tx_hash)
+                Transaction.objects.filter(pk=ledger_tx.pk).update(tx_hash=pending.tx_hash)
+
+            parties = sorted({ledger_tx.from_user_id, ledger_tx.to_user_id} - {None})
+            data = serialize_chain_tx(pending)
+            change_feed.record([LedgerChange(user_id=user_id, kind='chain', data=data) for user_id in parties])
+            dashboard_cache.invalidate_users(parties)
+
+    def _settle(self, pending, receipt):
+        if receipt['transactionHash'] != pending.tx_hash:
+            # An earlier version of a bumped transaction was the one mined
+            pending.replaced_hashes = [h for h in pending.replaced_hashes if h != receipt['transactionHash']]
+            pending.replaced_hashes.append(pending.tx_hash)
+            pending.tx_hash = receipt['transactionHash']
+        pending.block_number = receipt['blockNumber']
+        if receipt['status'] == 1:
+            pending.error = ''
+            self._finish(pending, 'confirmed')
+        else:
+            pending.error = 'Transaction reverted'
+            self._finish(pending, 'failed')
+
+    def poll(self, service=None):
+        """
+        Send queued writes, then settle the submitted ones that have a
+        receipt and bump the stuck ones. Returns the number settled.
+        """
+        if service is None:
+            from .blockchain_service import blockchain_service as service
+        if not service.is_ready():
+            return 0
+
+        stuck_before = now() - self.stuck_after
+        claimable = PendingChainTx.objects.filter(
+            Q(status='queued') | Q(status='submitting', updated_at__lte=stuck_before)
+        ).order_by('id')[:self.batch_size]
+        for pending in claimable:
+            # Matching the row as read lets exactly one poller claim it, abandoned or not
+            claimed = PendingChainTx.objects.filter(
+                pk=pending.pk, status=pending.status, updated_at=pending.updated_at
+            ).update(status='submitting', updated_at=now())
+            if claimed:
+                if pending.status == 'submitting':
+                    logger.warning(f"Chain tx {pending.id} was left mid-send; reclaiming it")
+                pending.status = 'submitting'
+                self._submit(pending, service)
+
+        settled = 0
+        stuck_before = now() - self.stuck_after
+        for pending in PendingChainTx.objects.filter(status='submitted').order_by('id')[:self.batch_size]:
+            receipt = self._receipt(pending, service)
+            if receipt:
+                self._settle(pending, receipt)
+                settled += 1
+            elif pending.submitted_at <= stuck_before and pending.attempts < self.max_attempts:
+                self._bump(pending, service)
+        return settled
+
+    def start(self, interval=None):
+        """Poll in a background daemon thread, and straight after each queued write commits"""
+        interval = interval or self.interval
+        if not interval or (self._thread and self._thread.is_alive()):
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name='chain-receipt-poller', daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Chain receipt poller started (every {interval}s)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self, interval):
+        while not self._stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error polling chain transactions: {e}")
+
+
+# Global chain transaction service instance
+chain_tx_service = ChainTxService()
@@ -0,0 +1,102 @@
+"""
+Change feed for H2Ledger
+Per-user ledger events behind the delta-sync endpoint, with in-process wake-ups for long polls
+"""
+
+from django.db import transaction
+
+from .models import LedgerChange
+from .market_stream import market_stream
+from auth1.models import User1
+
+
+def change_topic(user_id):
+    return f"changes:{user_id}"
+
+
+def serialize_change(change):
+    return {
+        'cursor': change.id,
+        'kind': change.kind,
+        'data': change.data,
+        'createdAt': change.created_at.isoformat(),
+    }
+
+
+class ChangeFeed:
+    """
+    Writes one LedgerChange per affected user inside the ledger write's
+    transaction, so a change is visible exactly when its ledger rows are.
+    Long polls waiting on a user are woken once the write commits.
+
+    Cursors are autoincrement ids, and a client only reads its own user's
+    changes. Before inserting, a writer locks the rows of the users it
+    records for until it commits. A second writer for the same user waits
+    for that commit before its ids are even allocated, so each user's ids
+    become visible in order and a client never skips past a change that
+    was still in flight. SQLite, which commits one writer at a time and
+    ignores the lock, gets the same order for free.
+    """
+
+    def record(self, changes):
+        if not changes:
+            return
+        users = {change.user_id for change in changes}
+        with transaction.atomic():
+            # Locked in primary key order so two feed writers never take the same
+            # users' locks in opposite orders. Row locks the caller already holds
+            # (credits, ledger summaries) are outside this and must be ordered there
+            list(User1.objects.select_for_update().filter(pk__in=users).order_by('pk').values_list('pk', flat=True))
+            LedgerChange.objects.bulk_create(changes)
+        transaction.on_commit(lambda: self._notify(users))
+
+    @staticmethod
+    def _notify(users):
+        for user_id in users:
+            market_stream.publish(change_topic(user_id), 'change', {'user_id': user_id})
+
+    def record_transaction(self, tx):
+        """One change per party of a new mint, transfer, burn or purchase"""
+        data = {
+            'tx_id': tx.tx_id,
+            'credit_id': tx.credit_id,
+            'amount': str(tx.amount),
+            'from_user_id': tx.from_user_id,
+            'to_user_id': tx.to_user_id,
+            'fiat_value_usd': str(tx.fiat_value_usd) if tx.fiat_value_usd is not None else None,
+            'tx_hash': tx.tx_hash,
+        }
+        parties = {tx.from_user_id, tx.to_user_id} - {None}
+        self.record([LedgerChange(user_id=user_id, kind=tx.tx_type, data=data) for user_id in sorted(parties)])
+
+    def record_trades(self, trades):
+        """A fill change for the buyer and the seller of each trade"""
+        changes = []
+        for trade in trades:
+            data = {
+                'sequence': trade.sequence,
+                'buy_order_id': trade.buy_order_id,
+                'sell_order_id': trade.sell_order_id,
+                'quantity': str(trade.quantity),
+                'price': str(trade.price),
+                'executed_at': trade.executed_at.isoformat(),
+            }
+            changes.append(LedgerChange(user_id=trade.buyer_id, kind='fill', data={**data, 'side': 'buy'}))
+            changes.append(LedgerChange(user_id=trade.seller_id, kind='fill', data={**data, 'side': 'sell'}))
+        self.record(changes)
+
+    async def acursor(self, user_id):
+        """The user's latest cursor, or 0 before their first change"""
+        latest = await LedgerChange.objects.filter(user_id=user_id).order_by('-id').values_list('id', flat=True).afirst()
+        return latest or 0
+
+    async def asince(self, user_id, cursor, limit):
+        """Up to `limit` of the user's changes after `cursor`, oldest first"""
+        return [
+            change async for change in
+            LedgerChange.objects.filter(user_id=user_id, id__gt=cursor).order_by('id')[:limit]
+        ]
+
+
+# Global change feed instance
+change_feed = ChangeFeed()
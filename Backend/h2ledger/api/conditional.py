@@ -0,0 +1,73 @@
+"""
+Conditional GET for H2Ledger
+ETag / Last-Modified validators built from dashboard cache generation tokens
+"""
+
+from functools import wraps
+import hashlib
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .dashboard_cache import dashboard_cache, token_time, user_key
+
+
+def query_user_id(request):
+    """The `user_id` query parameter (authentication is disabled), or None"""
+    user_id = request.GET.get('user_id', '')
+    return int(user_id) if user_id.isdigit() else None
+
+
+def user_resources(*shared):
+    """Cache keys of the requesting user's data plus any shared keys"""
+    def keys_for(request, *args, **kwargs):
+        user_id = query_user_id(request)
+        return ([user_key(user_id)] if user_id else []) + list(shared)
+    return keys_for
+
+
+def shared_resources(*keys):
+    """Cache keys of data that is the same for every user"""
+    return lambda request, *args, **kwargs: list(keys)
+
+
+def versioned(keys_for):
+    """
+    Answer GETs with 304 Not Modified, before the view runs, while the
+    generation tokens of the cache keys returned by `keys_for(request,
+    *args, **kwargs)` are unchanged. Every invalidation of those keys
+    issues a new token, so the validators cost a cache read rather than
+    the view's queries. Responses are marked private and must be
+    revalidated, so polling clients always ask and usually get a 304.
+
+    Validators are only issued while the dashboard cache is shared by all
+    workers. A per-process cache never hears of another worker's
+    invalidation, so its tokens would answer 304 for data that changed.
+    """
+    def versions(request, *args, **kwargs):
+        if not hasattr(request, '_resource_versions'):
+            request._resource_versions = dashboard_cache.versions(keys_for(request, *args, **kwargs))
+        return request._resource_versions
+
+    def etag(request, *args, **kwargs):
+        tokens = versions(request, *args, **kwargs)
+        raw = '|'.join(f"{key}={tokens[key]}" for key in sorted(tokens))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        times = [token_time(token) for token in versions(request, *args, **kwargs).values()]
+        return max(times) if times and None not in times else None
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if dashboard_cache.shared:
+                response = conditional_view(request, *args, **kwargs)
+            else:
+                response = view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
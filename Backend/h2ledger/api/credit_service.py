@@ -0,0 +1,177 @@
+"""
+Credit service for H2Ledger
+Concurrency-safe credit transfer, use and burn operations
+"""
+
+import hashlib
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from .models import Credit, Transaction
+from .ledger_summary_service import ledger_summary_service
+
+
+class CreditConflictError(Exception):
+    """The credit changed concurrently; the caller may retry"""
+
+
+class InsufficientCreditError(Exception):
+    """The credit does not hold enough to cover the requested amount"""
+
+
+class CreditService:
+    """
+    Every mutation is a conditional UPDATE that only applies to the row
+    state that was validated (compare-and-swap), issued before any other
+    write in its transaction. A lost race therefore changes nothing and
+    surfaces as a conflict instead of a lost update or double spend.
+
+    The owner's UserLedgerSummary balance is adjusted right after each
+    credit write in the same transaction; the Transaction rows update
+    their counters through post_save.
+    """
+
+    def mint(self, batch, owner, amount, tx_hash):
+        """Create an active credit and its mint Transaction; returns (credit, tx)"""
+        with transaction.atomic():
+            credit = Credit.objects.create(
+                batch=batch,
+                owner=owner,
+                amount=amount,
+                status="active",
+                tx_hash=tx_hash,
+            )
+            ledger_summary_service.apply(owner.user_id, credits_owned=Decimal(str(amount)))
+
+            tx = Transaction.objects.create(
+                credit=credit,
+                from_user=None,   # Mint has no "from"
+                to_user=owner,
+                tx_type="mint",
+                amount=amount,
+                fiat_value_usd=None,
+                tx_hash=tx_hash,
+            )
+        return credit, tx
+
+    def transfer(self, credit_id, to_user, amount, fiat_value_usd=None):
+        """Move a credit to another owner; returns the transfer Transaction"""
+        credit = Credit.objects.select_related('owner').get(credit_id=credit_id)
+        from_user = credit.owner
+        amount = Decimal(str(amount))
+
+        if credit.status != "active":
+            raise CreditConflictError("Credit is not active")
+        if amount > credit.amount:
+            raise InsufficientCreditError("Insufficient credit amount")
+
+        tx_raw = f"{credit_id}{from_user.user_id}{to_user.user_id}{now()}"
+        tx_hash = hashlib.sha256(tx_raw.encode()).hexdigest()
+
+        with transaction.atomic():
+            # Matching the validated amount too keeps the balance delta exact
+            updated = Credit.objects.filter(
+                credit_id=credit_id,
+                owner_id=from_user.user_id,
+                status="active",
+                amount=credit.amount
+            ).update(owner=to_user, status="transferred")
+            if not updated:
+                raise CreditConflictError("Credit was modified by another request")
+            # Both parties' summaries change in this transaction
+            ledger_summary_service.lock(from_user.user_id, to_user.user_id)
+            # A transferred credit is no longer active for anyone
+            ledger_summary_service.apply(from_user.user_id, credits_owned=-credit.amount)
+
+            return Transaction.objects.create(
+                credit_id=credit_id,
+                from_user=from_user,
+                to_user=to_user,
+                tx_type="transfer",
+                amount=amount,
+                fiat_value_usd=fiat_value_usd,
+                tx_hash=tx_hash,
+            )
+
+    def use(self, user, credit_id, amount):
+        """
+        Consume part of a credit; returns (remaining_amount, Transaction).
+        Raises Credit.DoesNotExist if the user does not own the credit.
+        """
+        amount = Decimal(str(amount))
+        raw_data = f"{credit_id}{user.user_id}{amount}{time.time()}"
+        tx_hash = hashlib.sha256(raw_data.encode()).hexdigest()
+
+        with transaction.atomic():
+            updated = Credit.objects.filter(
+                credit_id=credit_id,
+                owner=user,
+                amount__gte=amount
+            ).exclude(status="burned").update(amount=F("amount") - amount)
+
+            if not updated:
+                # Distinguish a missing credit from an insufficient balance
+                Credit.objects.get(credit_id=credit_id, owner=user)
+                raise InsufficientCreditError("Insufficient credit balance")
+
+            remaining, credit_status = Credit.objects.values_list("amount", "status").get(credit_id=credit_id)
+            # Received (transferred) credits can be used but never counted as owned
+            if credit_status == "active":
+                ledger_summary_service.apply(user.user_id, credits_owned=-amount)
+            if remaining == 0:
+                Credit.objects.filter(credit_id=credit_id, amount=0).update(status="burned")
+
+            tx = Transaction.objects.create(
+                credit_id=credit_id,
+                from_user=user,
+                to_user=None,  # since credits are burned, no receiver
+                tx_type="burn",
+                amount=amount,
+                fiat_value_usd=None,
+                tx_hash=tx_hash
+            )
+        return remaining, tx
+
+    def burn(self, user, credit_ids):
+        """
+        Burn whole active credits owned by the user.
+        Returns the list of burned credits; credits lost to a race are skipped.
+        """
+        candidates = list(Credit.objects.filter(
+            credit_id__in=credit_ids,
+            owner=user,
+            status="active"
+        ))
+        burned = []
+        stamp = int(time.time())
+
+        with transaction.atomic():
+            for credit in candidates:
+                updated = Credit.objects.filter(
+                    credit_id=credit.credit_id,
+                    owner=user,
+                    status="active",
+                    amount=credit.amount
+                ).update(status="burned")
+                if updated:
+                    credit.status = "burned"
+                    burned.append(credit)
+                    ledger_summary_service.apply(user.user_id, credits_owned=-credit.amount)
+
+            for credit in burned:
+                Transaction.objects.create(
+                    credit=credit,
+                    from_user=user,
+                    tx_type="burn",
+                    amount=credit.amount,
+                    tx_hash=f"burn_{stamp}_{credit.credit_id}"
+                )
+        return burned
+
+
+# Global credit service instance
+credit_service = CreditService()
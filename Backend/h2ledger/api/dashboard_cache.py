@@ -0,0 +1,186 @@
+"""
+Dashboard cache for H2Ledger
+Per-user cache in front of dashboard analytics with event-driven invalidation
+"""
+
+from datetime import datetime, timezone as dt_timezone
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+
+MARKET_KEY = 'market'
+LEADERBOARD_KEY = 'leaderboard'
+
+# Backends whose entries live in one process and are never seen by other workers
+PER_PROCESS_BACKENDS = (LocMemCache, DummyCache)
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+def new_token():
+    """A unique generation token that also records when it was issued"""
+    return f"{time.time_ns() // 1000000:x}-{uuid.uuid4().hex}"
+
+
+def token_time(token):
+    """When a generation token was issued, or None for tokens without a time"""
+    try:
+        return datetime.fromtimestamp(int(token.split('-', 1)[0], 16) / 1000, tz=dt_timezone.utc)
+    except ValueError:
+        return None
+
+
+class DashboardCache:
+    """
+    Entries live in a Django cache backend (the 'dashboard' alias when it is
+    configured), which provides the TTL and, for local memory, LRU eviction.
+
+    Each entry is stored under a generation token that invalidation
+    replaces. A computation racing with an invalidation therefore writes
+    under a token nobody reads any more instead of resurrecting stale
+    figures, and an evicted token simply starts a new generation.
+
+    Tokens expire with the alias TTL like the entries do. With a
+    per-process backend (local memory) an invalidation only reaches the
+    worker that made it, so the TTL is what bounds how long the others
+    keep serving old figures, and tokens are not `shared` enough to be
+    used as HTTP validators.
+    """
+
+    def __init__(self, alias=None):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        if self.alias is None:
+            self.alias = 'dashboard' if 'dashboard' in settings.CACHES else 'default'
+        return caches[self.alias]
+
+    @property
+    def shared(self):
+        """Whether every worker reads the same entries and generation tokens"""
+        return not isinstance(self.cache, PER_PROCESS_BACKENDS)
+
+    def _generation(self, key):
+        generation_key = f"dashboard:gen:{key}"
+        token = self.cache.get(generation_key)
+        if token is None:
+            self.cache.add(generation_key, new_token())
+            token = self.cache.get(generation_key)
+        return f"dashboard:{key}:{token}"
+
+    async def _ageneration(self, key):
+        generation_key = f"dashboard:gen:{key}"
+        token = await self.cache.aget(generation_key)
+        if token is None:
+            await self.cache.aadd(generation_key, new_token())
+            token = await self.cache.aget(generation_key)
+        return f"dashboard:{key}:{token}"
+
+    def versions(self, keys):
+        """
+        Current generation token of each key, starting a generation where
+        none exists. Tokens change whenever the key is invalidated, so they
+        version the data behind it without computing it.
+        """
+        generation_keys = {f"dashboard:gen:{key}": key for key in keys}
+        tokens = self.cache.get_many(list(generation_keys))
+        for generation_key in generation_keys.keys() - tokens.keys():
+            self.cache.add(generation_key, new_token())
+            tokens[generation_key] = self.cache.get(generation_key)
+        return {generation_keys[generation_key]: token for generation_key, token in tokens.items()}
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, computing and storing it on a miss"""
+        data_key = self._generation(key)
+        value = self.cache.get(data_key)
+        self._count(value is not None)
+        if value is not None:
+            return value
+
+        value = compute()
+        self.cache.set(data_key, value)
+        return value
+
+    async def aget_or_compute(self, key, acompute):
+        """Async variant of get_or_compute; `acompute` is a coroutine function"""
+        data_key = await self._ageneration(key)
+        value = await self.cache.aget(data_key)
+        self._count(value is not None)
+        if value is not None:
+            return value
+
+        value = await acompute()
+        await self.cache.aset(data_key, value)
+        return value
+
+    def get_user(self, user_id, compute):
+        return self.get_or_compute(user_key(user_id), compute)
+
+    def get_market(self, compute):
+        return self.get_or_compute(MARKET_KEY, compute)
+
+    async def aget_user(self, user_id, acompute):
+        return await self.aget_or_compute(user_key(user_id), acompute)
+
+    async def aget_market(self, acompute):
+        return await self.aget_or_compute(MARKET_KEY, acompute)
+
+    def _invalidate(self, keys):
+        self.cache.set_many({f"dashboard:gen:{key}": new_token() for key in keys})
+        with self._lock:
+            self.invalidations += len(keys)
+
+    def invalidate(self, keys):
+        """Drop entries once the surrounding transaction (if any) commits"""
+        keys = set(keys)
+        if keys:
+            transaction.on_commit(lambda: self._invalidate(keys))
+
+    def invalidate_users(self, user_ids):
+        self.invalidate(user_key(user_id) for user_id in user_ids if user_id)
+
+    def invalidate_market(self):
+        self.invalidate([MARKET_KEY])
+
+    def invalidate_leaderboard(self):
+        self.invalidate([LEADERBOARD_KEY])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': self.alias,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.invalidations = 0
+
+
+# Global dashboard cache instance
+dashboard_cache = DashboardCache()
@@ -3,14 +3,69 @@ Dashboard service for H2Ledger
 Provides comprehensive analytics and data aggregation for dashboard
 """
 
-from django.db.models import Sum, Count, Q, Avg, Max, Min
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import asyncio
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Sum, Count, Q, Avg, Max, Min, OuterRef, Subquery
+from django.db.models import DecimalField, F, Func, IntegerField
+from django.db.models.expressions import Star
 from django.utils.timezone import now, timedelta
-from datetime import datetime, date
+from datetime import date
 from decimal import Decimal
 import json
 
 from .models import *
-from .blockchain_service import BlockchainService
+from .candle_service import candle_service
+from .chain_snapshot_service import chain_snapshot_service
+from .dashboard_cache import dashboard_cache
+from .ledger_summary_service import ledger_summary_service
+from auth1.models import User1
+
+
+TRADED_TX_TYPES = ("transfer", "purchase")
+
+# Served for a section that times out or fails, so the rest of the dashboard still renders
+FIGURE_DEFAULTS = {
+    'total_credits': 0, 'batches_produced': 0, 'total_transactions': 0, 'active_orders': 0,
+    'emissions_total': 0, 'emissions_month': 0, 'traded_today': 0, 'traded_week': 0,
+}
+MARKET_DEFAULTS = {'current_price': 50.0, 'volume_24h': 0.0, 'change_24h': 0, 'trend': []}
+BLOCKCHAIN_DEFAULTS = {'stale': True, 'error': 'Chain snapshot unavailable'}
+
+
+def user_scalar(queryset, user_field, function='COUNT', field=None):
+    """
+    Correlated scalar subquery applying an aggregate function to `queryset`
+    for the outer user row, so figures from several tables come back in a
+    single round trip. A bare Func keeps Django from adding a GROUP BY, and
+    COUNT(*) can be answered from an index alone.
+    """
+    if field is None:
+        expression = Func(Star(), function=function, output_field=IntegerField())
+    else:
+        expression = Func(F(field), function=function, output_field=DecimalField(max_digits=20, decimal_places=3))
+    return Subquery(
+        queryset.filter(**{user_field: OuterRef('pk')}).order_by().values(value=expression)
+    )
+
+
+def _run_section(compute):
+    """
+    Run one section on a pool thread. Pool threads are few and long-lived,
+    so each keeps its connection between requests; one that errored is
+    dropped in case it is broken.
+    """
+    started = time.perf_counter()
+    try:
+        return compute(), time.perf_counter() - started
+    except Exception:
+        connections.close_all()
+        raise
 
 
 class DashboardService:
@@ -19,65 +74,251 @@ class DashboardService:
     """
     
     def __init__(self):
-        self.blockchain_service = BlockchainService()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+    
+    @property
+    def executor(self):
+        """Bounded pool shared by all requests, created on first use"""
+        workers = getattr(settings, 'DASHBOARD_SETTINGS', {}).get('SECTION_WORKERS', 8)
+        if workers <= 0:
+            return None
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard')
+        return self._executor
     
     def get_comprehensive_analytics(self, user):
         """
         Get comprehensive dashboard analytics for a user
         """
         try:
-            analytics = {
-                'user_analytics': self._get_user_analytics(user),
-                'market_analytics': self._get_market_analytics(),
-                'emissions_analytics': self._get_emissions_analytics(user),
-                'trading_analytics': self._get_trading_analytics(user),
-                'blockchain_sync': self._sync_blockchain_data(user)
-            }
+            results, meta = self._run_sections({
+                # Served from the dashboard cache until one of the user's rows changes
+                'user': (lambda: dashboard_cache.get_user(user.pk, lambda: self._get_user_figures(user)),
+                         FIGURE_DEFAULTS),
+                'market': (lambda: dashboard_cache.get_market(self._get_market_analytics), MARKET_DEFAULTS),
+                # Last background snapshot of the chain; no RPC on the request path
+                'blockchain': (lambda: chain_snapshot_service.for_user(user), BLOCKCHAIN_DEFAULTS),
+            })
+            return self._assemble(results, meta)
             
-            return self._format_dashboard_response(analytics)
+        except Exception as e:
+            print(f"Error getting dashboard analytics: {e}")
+            return self._get_default_analytics()
+    
+    async def aget_comprehensive_analytics(self, user):
+        """
+        Async ORM variant of get_comprehensive_analytics for ASGI views:
+        sections run as concurrent coroutines instead of pool threads
+        """
+        try:
+            results, meta = await self._arun_sections({
+                'user': (lambda: dashboard_cache.aget_user(user.pk, lambda: self._aget_user_figures(user)),
+                         FIGURE_DEFAULTS),
+                'market': (lambda: dashboard_cache.aget_market(self._aget_market_analytics), MARKET_DEFAULTS),
+                'blockchain': (lambda: chain_snapshot_service.afor_user(user), BLOCKCHAIN_DEFAULTS),
+            })
+            return self._assemble(results, meta)
             
         except Exception as e:
             print(f"Error getting dashboard analytics: {e}")
             return self._get_default_analytics()
     
-    def _get_user_analytics(self, user):
-        """Get user-specific analytics"""
-        # Total credits owned
-        total_credits = Credit.objects.filter(
-            owner=user, 
-            status="active"
-        ).aggregate(total=Sum("amount"))["total"] or 0
+    def _assemble(self, results, meta):
+        """Build the dashboard response from section results"""
+        figures = results['user']
+        analytics = {
+            'user_analytics': self._get_user_analytics(figures),
+            'market_analytics': results['market'],
+            'emissions_analytics': self._get_emissions_analytics(figures),
+            'trading_analytics': self._get_trading_analytics(figures),
+            'blockchain_sync': results['blockchain']
+        }
+        
+        response = self._format_dashboard_response(analytics)
+        response['meta'] = meta
+        return response
+    
+    def _run_sections(self, sections):
+        """
+        Compute independent sections concurrently on the shared pool, each
+        bounded by its own timeout; a section that times out or fails is
+        served from its fallback. Returns ({name: result}, metadata) with
+        per-section timings.
+        
+        Sections run inline when the pool is disabled or the caller is
+        inside a transaction, whose uncommitted rows other connections
+        cannot see.
+        """
+        timeouts = getattr(settings, 'DASHBOARD_SETTINGS', {}).get('SECTION_TIMEOUTS', {})
+        executor = None if connection.in_atomic_block else self.executor
+        started = time.perf_counter()
+        futures = {}
+        if executor is not None:
+            futures = {name: executor.submit(_run_section, compute) for name, (compute, _) in sections.items()}
+        
+        results = {}
+        timings = {}
+        for name, (compute, fallback) in sections.items():
+            try:
+                if executor is None:
+                    section_started = time.perf_counter()
+                    results[name] = compute()
+                    elapsed = time.perf_counter() - section_started
+                else:
+                    # Timeouts count from the fan-out, as every section started then
+                    remaining = started + timeouts.get(name, 2.0) - time.perf_counter()
+                    results[name], elapsed = futures[name].result(timeout=max(0, remaining))
+                timings[name] = {'status': 'ok', 'ms': round(elapsed * 1000, 2)}
+            except FutureTimeoutError:
+                futures[name].cancel()
+                results[name] = fallback
+                timings[name] = {'status': 'timeout', 'ms': round((time.perf_counter() - started) * 1000, 2)}
+            except Exception as e:
+                print(f"Error computing dashboard section {name}: {e}")
+                results[name] = fallback
+                timings[name] = {'status': 'error', 'ms': round((time.perf_counter() - started) * 1000, 2)}
+        
+        return results, {
+            'sections': timings,
+            'partial': any(timing['status'] != 'ok' for timing in timings.values()),
+            'parallel': executor is not None,
+            'total_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+    
+    async def _arun_sections(self, sections):
+        """Coroutine counterpart of _run_sections, with the same fallbacks and metadata"""
+        timeouts = getattr(settings, 'DASHBOARD_SETTINGS', {}).get('SECTION_TIMEOUTS', {})
+        started = time.perf_counter()
+        
+        async def run(name, compute, fallback):
+            section_started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(compute(), timeouts.get(name, 2.0))
+                status = 'ok'
+            except asyncio.TimeoutError:
+                result, status = fallback, 'timeout'
+            except Exception as e:
+                print(f"Error computing dashboard section {name}: {e}")
+                result, status = fallback, 'error'
+            return name, result, {'status': status, 'ms': round((time.perf_counter() - section_started) * 1000, 2)}
         
-        # User's batches
-        user_batches = HydrogenBatch.objects.filter(producer=user).count()
+        outcomes = await asyncio.gather(*(
+            run(name, compute, fallback) for name, (compute, fallback) in sections.items()
+        ))
+        timings = {name: timing for name, _, timing in outcomes}
+        return {name: result for name, result, _ in outcomes}, {
+            'sections': timings,
+            'partial': any(timing['status'] != 'ok' for timing in timings.values()),
+            'parallel': True,
+            'total_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+    
+    def _user_figure_queries(self, user):
+        """
+        Every per-user figure in two queries: the user's ledger summary row
+        (credits, batches, transaction count and emissions, maintained with
+        each ledger write) joined with the open-order subquery and this
+        month's emissions rollup, and one conditional aggregation over the
+        week's trades. Returns the row queryset, the trades queryset and
+        its aggregates, for the sync and async readers to evaluate.
+        """
+        today_start = now().replace(hour=0, minute=0, second=0, microsecond=0)
+        week_start = today_start - timedelta(days=7)
+        month_start = today_start.replace(day=1)
+        
+        row = User1.objects.filter(pk=user.pk).annotate(
+            total_credits=F('ledger_summary__credits_owned'),
+            batches_produced=F('ledger_summary__batches_produced'),
+            total_transactions=F('ledger_summary__transaction_count'),
+            emissions_total=F('ledger_summary__emissions_offset_kg'),
+            active_orders=user_scalar(TradingOrder.objects.filter(status__in=['pending', 'partial']), 'user'),
+            emissions_month=user_scalar(
+                EmissionsRollup.objects.filter(period='month', period_start=month_start.date()),
+                'user', 'SUM', 'co2_offset_kg'
+            ),
+        ).values(
+            'total_credits', 'batches_produced', 'total_transactions', 'emissions_total',
+            'active_orders', 'emissions_month'
+        )
         
-        # User's transaction count
-        user_transactions = Transaction.objects.filter(
-            Q(from_user=user) | Q(to_user=user)
-        ).count()
+        # Each OR branch carries every predicate so both user/type/time indexes apply
+        traded = Transaction.objects.filter(
+            Q(from_user=user, tx_type__in=TRADED_TX_TYPES, timestamp__gte=week_start) |
+            Q(to_user=user, tx_type__in=TRADED_TX_TYPES, timestamp__gte=week_start)
+        )
+        aggregates = {
+            'traded_week': Sum('amount'),
+            'traded_today': Sum('amount', filter=Q(timestamp__gte=today_start)),
+        }
+        return row, traded, aggregates
+    
+    def _summary_figures(self, summary):
+        return {
+            'total_credits': summary.credits_owned,
+            'batches_produced': summary.batches_produced,
+            'total_transactions': summary.transaction_count,
+            'emissions_total': summary.emissions_offset_kg,
+        }
+    
+    def _get_user_figures(self, user):
+        row, traded, aggregates = self._user_figure_queries(user)
+        figures = row.first() or {}
+        if figures.get('total_transactions') is None:
+            # No summary row yet: build it once from history
+            figures.update(self._summary_figures(ledger_summary_service.get(user.pk)))
+        figures.update(traded.aggregate(**aggregates))
         
+        # Subqueries and filtered sums over no rows come back as NULL
+        return {key: value or 0 for key, value in figures.items()}
+    
+    async def _aget_user_figures(self, user):
+        row, traded, aggregates = self._user_figure_queries(user)
+        figures = await row.afirst() or {}
+        if figures.get('total_transactions') is None:
+            summary = await sync_to_async(ledger_summary_service.get)(user.pk)
+            figures.update(self._summary_figures(summary))
+        figures.update(await traded.aaggregate(**aggregates))
+        return {key: value or 0 for key, value in figures.items()}
+    
+    def _get_user_analytics(self, figures):
+        """Get user-specific analytics"""
         return {
-            'total_credits_owned': float(total_credits),
-            'batches_produced': user_batches,
-            'total_transactions': user_transactions
+            'total_credits_owned': float(figures['total_credits']),
+            'batches_produced': figures['batches_produced'],
+            'total_transactions': figures['total_transactions']
         }
     
     def _get_market_analytics(self):
         """Get market analytics"""
         # Current market price
         latest_price = MarketPrice.objects.first()
-        current_price = float(latest_price.price_per_credit) if latest_price else 50.0
         
         # 24h trading volume
         yesterday = now() - timedelta(days=1)
-        volume_24h = Transaction.objects.filter(
-            timestamp__gte=yesterday,
-            tx_type__in=['transfer', 'purchase'],
-            fiat_value_usd__isnull=False
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        volume_24h = Trade.objects.filter(
+            executed_at__gte=yesterday
+        ).aggregate(total=Sum('quantity'))['total'] or 0
+        
+        # Daily candles already carry the volume-weighted price; one indexed read
+        candles = candle_service.get_candles('1d', start=now() - timedelta(days=6))
+        return self._market_analytics(latest_price, volume_24h, candles)
+    
+    async def _aget_market_analytics(self):
+        """Async ORM variant of _get_market_analytics"""
+        latest_price = await MarketPrice.objects.afirst()
+        volume_24h = (await Trade.objects.filter(
+            executed_at__gte=now() - timedelta(days=1)
+        ).aaggregate(total=Sum('quantity')))['total'] or 0
+        candles = await candle_service.aget_candles('1d', start=now() - timedelta(days=6))
+        return self._market_analytics(latest_price, volume_24h, candles)
+    
+    def _market_analytics(self, latest_price, volume_24h, candles):
+        current_price = float(latest_price.price_per_credit) if latest_price else 50.0
         
         # Price trend (last 7 days)
-        trend = self._calculate_price_trend()
+        trend = self._calculate_price_trend(candles)
         
         # Calculate 24h change
         change_24h = self._calculate_24h_change(trend, current_price)
@@ -89,118 +330,38 @@ class DashboardService:
             'trend': trend
         }
     
-    def _get_emissions_analytics(self, user):
+    def _get_emissions_analytics(self, figures):
         """Get emissions offset analytics"""
-        # Total emissions offset
-        total_emissions = EmissionsData.objects.filter(user=user).aggregate(
-            total=Sum('co2_offset_kg')
-        )['total'] or 0
-        
-        # Monthly emissions offset
-        month_start = now().date().replace(day=1)
-        monthly_emissions = EmissionsData.objects.filter(
-            user=user,
-            timestamp__date__gte=month_start
-        ).aggregate(total=Sum('co2_offset_kg'))['total'] or 0
-        
         # Monthly target (could be user-configurable)
         monthly_target = 1000  # kg CO2
         
         return {
-            'total': float(total_emissions),
-            'monthly_progress': float(monthly_emissions),
+            'total': float(figures['emissions_total']),
+            'monthly_progress': float(figures['emissions_month']),
             'target': monthly_target
         }
     
-    def _get_trading_analytics(self, user):
+    def _get_trading_analytics(self, figures):
         """Get trading analytics"""
-        today = now().date()
-        week_start = today - timedelta(days=7)
-        
-        # Credits traded today
-        credits_today = Transaction.objects.filter(
-            Q(from_user=user) | Q(to_user=user),
-            tx_type__in=["transfer", "purchase"],
-            timestamp__date=today
-        ).aggregate(total=Sum("amount"))["total"] or 0
-        
-        # Credits traded this week
-        credits_week = Transaction.objects.filter(
-            Q(from_user=user) | Q(to_user=user),
-            tx_type__in=["transfer", "purchase"],
-            timestamp__date__gte=week_start
-        ).aggregate(total=Sum("amount"))["total"] or 0
-        
-        # Active trading orders
-        active_orders = TradingOrder.objects.filter(
-            user=user,
-            status__in=['pending', 'partial']
-        ).count()
-        
         return {
-            'today': float(credits_today),
-            'this_week': float(credits_week),
-            'active_orders': active_orders
+            'today': float(figures['traded_today']),
+            'this_week': float(figures['traded_week']),
+            'active_orders': figures['active_orders']
         }
     
-    def _sync_blockchain_data(self, user):
-        """Sync relevant blockchain data"""
-        try:
-            # Sync market price from blockchain
-            blockchain_price = self.blockchain_service.sync_market_price()
-            
-            # Get user's blockchain balance (if address available)
-            blockchain_balance = 0
-            if hasattr(user, 'blockchain_address') and user.blockchain_address:
-                blockchain_balance = self.blockchain_service.get_blockchain_balance(
-                    user.blockchain_address
-                )
-            
-            return {
-                'blockchain_price': blockchain_price,
-                'blockchain_balance': blockchain_balance,
-                'sync_timestamp': now().isoformat()
-            }
-        except Exception as e:
-            print(f"Error syncing blockchain data: {e}")
-            return {
-                'blockchain_price': 50.0,
-                'blockchain_balance': 0,
-                'sync_timestamp': now().isoformat(),
-                'error': str(e)
-            }
-    
-    def _calculate_price_trend(self):
-        """Calculate 7-day price trend"""
+    def _calculate_price_trend(self, candles):
+        """Calculate 7-day price trend from the week's daily candles"""
         trend = []
         today = now().date()
+        daily_prices = {candle.bucket_start.date(): candle.vwap for candle in candles}
         
         for i in range(6, -1, -1):
             trend_date = today - timedelta(days=i)
-            day_start = datetime.combine(trend_date, datetime.min.time())
-            day_end = datetime.combine(trend_date, datetime.max.time())
-            
-            # Get average price for that day
-            day_transactions = Transaction.objects.filter(
-                timestamp__range=[day_start, day_end],
-                tx_type__in=['transfer', 'purchase'],
-                fiat_value_usd__isnull=False,
-                amount__gt=0
-            )
-            
-            if day_transactions.exists():
-                day_prices = []
-                for tx in day_transactions:
-                    if tx.amount and tx.fiat_value_usd:
-                        price = float(tx.fiat_value_usd) / float(tx.amount)
-                        day_prices.append(price)
-                day_avg = sum(day_prices) / len(day_prices) if day_prices else 50.0
-            else:
-                day_avg = 50.0  # Default price
+            day_avg = daily_prices.get(trend_date)
             
             trend.append({
                 'date': trend_date.strftime('%Y-%m-%d'),
-                'price': round(day_avg, 2)
+                'price': round(float(day_avg), 2) if day_avg is not None else 50.0  # Default price
             })
         
         return trend
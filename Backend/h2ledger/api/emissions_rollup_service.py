@@ -0,0 +1,141 @@
+"""
+Emissions rollup service for H2Ledger
+Keeps per-user daily and monthly EmissionsRollup rows in step with EmissionsData
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+
+from .models import EmissionsData, EmissionsRollup
+
+
+PERIODS = {
+    'day': TruncDay,
+    'month': TruncMonth,
+}
+
+
+def period_start(timestamp, period):
+    """The UTC day, or first day of the UTC month, a timestamp falls in"""
+    day = timestamp.astimezone(dt_timezone.utc).date()
+    return day if period == 'day' else day.replace(day=1)
+
+
+def period_bounds(period, start):
+    """[start, end) of a rollup period as UTC datetimes"""
+    lower = datetime(start.year, start.month, start.day, tzinfo=dt_timezone.utc)
+    if period == 'day':
+        return lower, lower + timedelta(days=1)
+    return lower, (lower + timedelta(days=32)).replace(day=1)
+
+
+def summarize_emissions(user_ids, period):
+    """
+    Recompute a period's rollups from raw EmissionsData for a set of users
+    with one grouped query. Returns unsaved EmissionsRollup rows.
+    """
+    rows = (
+        EmissionsData.objects.filter(user_id__in=list(user_ids))
+        .annotate(bucket=PERIODS[period]('timestamp', tzinfo=dt_timezone.utc))
+        .values('user_id', 'bucket')
+        .annotate(credits=Sum('credits_burned'), co2=Sum('co2_offset_kg'), entries=Count('pk'))
+        .order_by()
+    )
+    return [
+        EmissionsRollup(
+            user_id=row['user_id'],
+            period=period,
+            period_start=period_start(row['bucket'], period),
+            credits_burned=row['credits'],
+            co2_offset_kg=row['co2'],
+            entry_count=row['entries'],
+        )
+        for row in rows
+    ]
+
+
+class EmissionsRollupService:
+    """
+    Adds each new EmissionsData row to its user's day and month rollups
+    with F() updates inside the writer's transaction. A period without a
+    rollup yet is created from the raw rows it covers, which already
+    include the in-flight entry.
+    """
+
+    def record(self, entry):
+        """Fold a new EmissionsData row into its day and month rollups"""
+        with transaction.atomic():
+            for period in PERIODS:
+                self._apply(entry, period)
+
+    def _apply(self, entry, period):
+        start = period_start(entry.timestamp, period)
+        rollups = EmissionsRollup.objects.filter(user_id=entry.user_id, period=period, period_start=start)
+        updates = {
+            'credits_burned': F('credits_burned') + entry.credits_burned,
+            'co2_offset_kg': F('co2_offset_kg') + entry.co2_offset_kg,
+            'entry_count': F('entry_count') + 1,
+        }
+        if rollups.update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                EmissionsRollup.objects.create(**self._from_history(entry.user_id, period, start))
+        except IntegrityError:
+            # Created concurrently; the other writer's snapshot predates this entry
+            rollups.update(**updates)
+
+    def _from_history(self, user_id, period, start):
+        lower, upper = period_bounds(period, start)
+        totals = EmissionsData.objects.filter(
+            user_id=user_id, timestamp__gte=lower, timestamp__lt=upper
+        ).aggregate(credits=Sum('credits_burned'), co2=Sum('co2_offset_kg'), entries=Count('pk'))
+        return {
+            'user_id': user_id,
+            'period': period,
+            'period_start': start,
+            'credits_burned': totals['credits'] or Decimal('0'),
+            'co2_offset_kg': totals['co2'] or Decimal('0'),
+            'entry_count': totals['entries'],
+        }
+
+    def rebuild(self, user_ids):
+        """Replace a set of users' rollups with ones recomputed from raw rows"""
+        user_ids = list(user_ids)
+        rollups = [rollup for period in PERIODS for rollup in summarize_emissions(user_ids, period)]
+        with transaction.atomic():
+            EmissionsRollup.objects.filter(user_id__in=user_ids).delete()
+            EmissionsRollup.objects.bulk_create(rollups)
+        return len(rollups)
+
+    def totals(self, period, start=None, end=None, user_id=None):
+        """
+        Offset totals per period across all users (or one user), oldest
+        first, read from the rollups alone. `start` and `end` are dates.
+        """
+        rollups = EmissionsRollup.objects.filter(period=period)
+        if start is not None:
+            # A month counts when any of its days falls in the range
+            rollups = rollups.filter(period_start__gte=start if period == 'day' else start.replace(day=1))
+        if end is not None:
+            rollups = rollups.filter(period_start__lte=end)
+        if user_id is not None:
+            rollups = rollups.filter(user_id=user_id)
+        return list(
+            rollups.values('period_start')
+            .annotate(
+                co2_offset_kg=Sum('co2_offset_kg'),
+                credits_burned=Sum('credits_burned'),
+                entries=Sum('entry_count'),
+                users=Count('user_id'),
+            )
+            .order_by('period_start')
+        )
+
+
+# Global emissions rollup service instance
+emissions_rollup_service = EmissionsRollupService()
@@ -0,0 +1,93 @@
+"""
+Order expiry service for H2Ledger
+Cancels trading orders whose expires_at has passed and evicts them from the order book
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from .models import TradingOrder
+from .matching_engine import OPEN_STATUSES, matching_engine
+from .dashboard_cache import dashboard_cache
+
+logger = logging.getLogger(__name__)
+
+
+class OrderExpiryService:
+    """
+    Sweeps expired orders in bulk UPDATEs driven by the (status, expires_at) index
+    """
+
+    def __init__(self):
+        trading_config = getattr(settings, 'TRADING_SETTINGS', {})
+        self.batch_size = trading_config.get('EXPIRY_SWEEP_BATCH_SIZE', 500)
+        self.interval = trading_config.get('EXPIRY_SWEEP_INTERVAL', 0)
+        self._thread = None
+        self._stop = threading.Event()
+
+    def sweep(self, as_of=None):
+        """
+        Cancel every open order that expired at or before `as_of`.
+        Returns the number of orders cancelled.
+        """
+        as_of = as_of or now()
+        cancelled = 0
+
+        while True:
+            expired = list(
+                TradingOrder.objects.filter(
+                    status__in=OPEN_STATUSES,
+                    expires_at__lte=as_of
+                ).values_list('id', 'user_id')[:self.batch_size]
+            )
+            if not expired:
+                break
+            expired_ids = [order_id for order_id, _ in expired]
+
+            # Re-check status in the UPDATE so orders filled meanwhile are left alone
+            cancelled += TradingOrder.objects.filter(
+                id__in=expired_ids,
+                status__in=OPEN_STATUSES
+            ).update(status='cancelled')
+
+            for order_id in expired_ids:
+                matching_engine.cancel(order_id)
+            dashboard_cache.invalidate_users({user_id for _, user_id in expired})
+
+            if len(expired_ids) < self.batch_size:
+                break
+
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} expired trading orders")
+        return cancelled
+
+    def start(self, interval=None):
+        """Run the sweep periodically in a background daemon thread"""
+        interval = interval or self.interval
+        if not interval or (self._thread and self._thread.is_alive()):
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name='order-expiry-sweeper', daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Order expiry sweeper started (every {interval}s)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping expired orders: {e}")
+
+
+# Global order expiry service instance
+order_expiry_service = OrderExpiryService()
@@ -0,0 +1,122 @@
+"""
+Ledger summary service for H2Ledger
+Keeps UserLedgerSummary rows in step with mints, transfers, burns and batch creation
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import Credit, EmissionsData, HydrogenBatch, Transaction, UserLedgerSummary
+
+
+SUMMARY_FIELDS = (
+    'credits_owned', 'credits_burned', 'batches_produced', 'transaction_count', 'emissions_offset_kg',
+)
+
+
+def summarize_users(user_ids):
+    """
+    Recompute summary figures from raw history for a set of users with one
+    grouped query per table. Returns {user_id: {field: value}}.
+    """
+    user_ids = list(user_ids)
+    totals = {
+        user_id: {
+            'credits_owned': Decimal('0'),
+            'credits_burned': Decimal('0'),
+            'batches_produced': 0,
+            'transaction_count': 0,
+            'emissions_offset_kg': Decimal('0'),
+        } for user_id in user_ids
+    }
+
+    def fold(rows, field, sign=1):
+        for user_id, value in rows:
+            if value:
+                totals[user_id][field] += sign * value
+
+    fold(Credit.objects.filter(owner_id__in=user_ids, status="active")
+         .values('owner_id').annotate(v=Sum('amount')).values_list('owner_id', 'v'), 'credits_owned')
+    fold(Transaction.objects.filter(from_user_id__in=user_ids, tx_type="burn")
+         .values('from_user_id').annotate(v=Sum('amount')).values_list('from_user_id', 'v'), 'credits_burned')
+    fold(HydrogenBatch.objects.filter(producer_id__in=user_ids)
+         .values('producer_id').annotate(v=Count('pk')).values_list('producer_id', 'v'), 'batches_produced')
+    fold(EmissionsData.objects.filter(user_id__in=user_ids)
+         .values('user_id').annotate(v=Sum('co2_offset_kg')).values_list('user_id', 'v'), 'emissions_offset_kg')
+
+    # A transaction counts once per party: sent + received - to self
+    fold(Transaction.objects.filter(from_user_id__in=user_ids)
+         .values('from_user_id').annotate(v=Count('pk')).values_list('from_user_id', 'v'), 'transaction_count')
+    fold(Transaction.objects.filter(to_user_id__in=user_ids)
+         .values('to_user_id').annotate(v=Count('pk')).values_list('to_user_id', 'v'), 'transaction_count')
+    fold(Transaction.objects.filter(from_user_id__in=user_ids, to_user_id=F('from_user_id'))
+         .values('from_user_id').annotate(v=Count('pk')).values_list('from_user_id', 'v'),
+         'transaction_count', sign=-1)
+    return totals
+
+
+class LedgerSummaryService:
+    """
+    Applies deltas to UserLedgerSummary with conditional F() updates inside
+    the caller's transaction, so the summary commits or rolls back together
+    with the ledger write that caused it. A user without a row yet gets one
+    computed from history, which already includes the in-flight write.
+    """
+
+    def apply(self, user_id, **deltas):
+        """Add deltas (keyword per summary field) to one user's summary"""
+        if not user_id:
+            return
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if not updates:
+            return
+
+        with transaction.atomic():
+            if UserLedgerSummary.objects.filter(user_id=user_id).update(**updates):
+                return
+            try:
+                with transaction.atomic():
+                    UserLedgerSummary.objects.create(user_id=user_id, **summarize_users([user_id])[user_id])
+            except IntegrityError:
+                # Created concurrently; the other writer's snapshot predates this change
+                UserLedgerSummary.objects.filter(user_id=user_id).update(**updates)
+
+    def lock(self, *user_ids):
+        """
+        Lock existing summary rows in user order. A write that goes on to
+        update more than one user calls this first, so whichever order it
+        applies its deltas in, it never holds one row while waiting on a
+        row that another writer took first.
+        """
+        list(UserLedgerSummary.objects.select_for_update()
+             .filter(user_id__in=[u for u in user_ids if u])
+             .order_by("user_id").values_list("user_id", flat=True))
+
+    def get(self, user_id):
+        """Summary row for a user, creating it from history when missing"""
+        summary = UserLedgerSummary.objects.filter(user_id=user_id).first()
+        if summary is not None:
+            return summary
+        try:
+            with transaction.atomic():
+                return UserLedgerSummary.objects.create(user_id=user_id, **summarize_users([user_id])[user_id])
+        except IntegrityError:
+            return UserLedgerSummary.objects.get(user_id=user_id)
+
+    def record_transaction(self, tx):
+        """Count a new ledger transaction for its parties"""
+        burned = tx.amount if tx.tx_type == "burn" else 0
+        deltas = {}
+        if tx.to_user_id:
+            deltas[tx.to_user_id] = {"transaction_count": 1}
+        if tx.from_user_id:
+            deltas[tx.from_user_id] = {"transaction_count": 1, "credits_burned": burned}
+        # In user order, like lock(), so two writers never wait on each other's rows
+        for user_id in sorted(deltas):
+            self.apply(user_id, **deltas[user_id])
+
+
+# Global ledger summary service instance
+ledger_summary_service = LedgerSummaryService()
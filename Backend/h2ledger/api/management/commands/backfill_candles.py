@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Candle, Trade
+from api.candle_service import candle_service
+
+
+class Command(BaseCommand):
+    help = 'Build OHLCV candles from existing trade history in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete existing candles first (recommended; backfill assumes time order)',
+        )
+
+    def _trade_prints(self, chunk_size):
+        last_sequence = 0
+        while True:
+            chunk = list(
+                Trade.objects.filter(sequence__gt=last_sequence)
+                .order_by('sequence')
+                .values_list('sequence', 'executed_at', 'price', 'quantity')[:chunk_size]
+            )
+            if not chunk:
+                return
+            yield [(executed_at, price, quantity) for _, executed_at, price, quantity in chunk]
+            last_sequence = chunk[-1][0]
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = Candle.objects.all().delete()
+            self.stdout.write(f'Deleted {deleted} existing candles')
+
+        # Only Trade rows carry execution prices; Transaction.fiat_value_usd is
+        # a placeholder on transfers (amount / 5) and would chart as ~0.2
+        total = 0
+        for prints in self._trade_prints(options['chunk_size']):
+            candle_service.merge(candle_service.aggregate(prints))
+            total += len(prints)
+            self.stdout.write(f'  processed {total} prints')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled candles from {total} trades; {Candle.objects.count()} candles in table'
+        ))
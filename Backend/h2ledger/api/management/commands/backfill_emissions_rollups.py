@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import EmissionsData
+from api.emissions_rollup_service import emissions_rollup_service
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily and monthly EmissionsRollup rows from raw EmissionsData in chunks of users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        user_ids = list(
+            EmissionsData.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+        )
+
+        started = time.perf_counter()
+        total = 0
+        for offset in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[offset:offset + chunk_size]
+            total += emissions_rollup_service.rebuild(chunk)
+            self.stdout.write(f'  rebuilt {offset + len(chunk)} of {len(user_ids)} users')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {total} rollups for {len(user_ids)} users in {time.perf_counter() - started:.2f}s'
+        ))
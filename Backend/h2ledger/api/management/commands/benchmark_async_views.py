@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.test.utils import override_settings
+
+from api.dashboard_cache import dashboard_cache
+from api.dashboard_service import dashboard_service
+from api.management.commands.benchmark_queries import percentile
+from auth1.models import User1
+
+
+DASHBOARD_BENCH_EMAIL = 'user0@dashboard.h2ledger.local'
+
+# Without a shared cache every dashboard and market request does its full work
+UNCACHED = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'dashboard': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent-request throughput of the sync views and their async (ASGI) variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32],
+                            help='Concurrent in-flight requests to run')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per run')
+        parser.add_argument('--cached', action='store_true',
+                            help='Keep the dashboard cache enabled (measures cache hits)')
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    def _targets(self):
+        """(name, sync request, async request); each request is a coroutine function"""
+        user = (User1.objects.filter(email=DASHBOARD_BENCH_EMAIL).first()
+                or User1.objects.order_by('pk').first())
+        if user is None:
+            raise CommandError('Needs at least one user; run populate_sample_data first')
+        client = AsyncClient()
+
+        def get(path):
+            return lambda: client.get(path)
+
+        # Credit detail is left out: it only serves its authenticated owner
+        return [
+            ('leaderboard', get('/api/leaderboard/'), get('/api/async/leaderboard/')),
+            ('batch list', get('/api/batch/list/'), get('/api/async/batch/list/')),
+            # The sync dashboard and market views serve demo data, so compare the
+            # services behind them, run the way ASGI runs a sync view
+            ('dashboard', lambda: sync_to_async(dashboard_service.get_comprehensive_analytics)(user),
+             lambda: dashboard_service.aget_comprehensive_analytics(user)),
+            ('market data', sync_to_async(lambda: dashboard_cache.get_market(dashboard_service._get_market_analytics)),
+             lambda: dashboard_cache.aget_market(dashboard_service._aget_market_analytics)),
+        ]
+
+    async def _run(self, request, total, concurrency):
+        latencies = []
+        errors = 0
+        remaining = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await request()
+                latencies.append(time.perf_counter() - started)
+                if getattr(response, 'status_code', 200) >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return {
+            'requests_per_sec': total / elapsed,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'errors': errors,
+        }
+
+    def handle(self, *args, **options):
+        caches = {} if options['cached'] else {'CACHES': UNCACHED}
+        with override_settings(ALLOWED_HOSTS=['testserver'], **caches):
+            dashboard_cache.alias = None
+            targets = self._targets()
+            report = []
+            for name, sync_request, async_request in targets:
+                for concurrency in options['concurrency']:
+                    row = {'endpoint': name, 'concurrency': concurrency}
+                    for variant, request in (('sync', sync_request), ('async', async_request)):
+                        async_to_sync(self._run)(request, min(2 * concurrency, options['requests']), concurrency)
+                        row[variant] = async_to_sync(self._run)(request, options['requests'], concurrency)
+                    report.append(row)
+        dashboard_cache.alias = None
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{'endpoint':<14} {'conc':>4}  {'sync req/s':>10} {'p99':>8}  {'async req/s':>11} {'p99':>8}")
+        for row in report:
+            sync, async_ = row['sync'], row['async']
+            self.stdout.write(
+                f"{row['endpoint']:<14} {row['concurrency']:>4}  "
+                f"{sync['requests_per_sec']:>10.1f} {sync['p99_ms']:>6.1f}ms  "
+                f"{async_['requests_per_sec']:>11.1f} {async_['p99_ms']:>6.1f}ms"
+            )
+        errors = sum(row[variant]['errors'] for row in report for variant in ('sync', 'async'))
+        if errors:
+            self.stdout.write(self.style.ERROR(f'{errors} requests failed'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All requests succeeded'))
@@ -0,0 +1,144 @@
+from decimal import Decimal
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import HydrogenBatch, Trade, TradingOrder
+from api.matching_engine import matching_engine, OPEN_STATUSES
+from api.order_flow import SIZE_DISTRIBUTIONS, generate_orders
+from auth1.models import User1
+
+
+BENCH_EMAIL_DOMAIN = 'auction.h2ledger.local'
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    """Counts executed statements without keeping them, unlike the debug query log"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Compare continuous matching with one call auction on the same order burst'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=2000, help='Orders in the burst')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--mid', type=float, default=50.0)
+        parser.add_argument('--spread', type=float, default=1.0)
+        parser.add_argument('--cross-ratio', type=float, default=0.5)
+        parser.add_argument('--size-distribution', choices=SIZE_DISTRIBUTIONS, default='lognormal')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    def _setup(self, users, mode):
+        TradingOrder.objects.filter(status__in=OPEN_STATUSES).update(status='cancelled')
+        User1.objects.bulk_create([
+            User1(
+                wallet_address=f"0xauction{i:033d}",
+                name=f"Auction User {i}",
+                email=f"user{i}@{BENCH_EMAIL_DOMAIN}",
+                role='buyer',
+                password='pbkdf2_sha256$bench',
+            ) for i in range(users)
+        ])
+        user_ids = list(
+            User1.objects.filter(email__endswith=BENCH_EMAIL_DOMAIN)
+            .order_by('user_id').values_list('user_id', flat=True)
+        )
+        batch = HydrogenBatch.objects.create(
+            producer_id=user_ids[0], quantity_kg=100000,
+            production_date=timezone.now().date(), is_approved=True, matching_mode=mode,
+        )
+        matching_engine.load()
+        return user_ids, batch
+
+    def _ingest(self, burst, user_ids, batch):
+        """Submit the burst order by order, exactly as trading_orders does"""
+        for record in burst:
+            order = TradingOrder.objects.create(
+                user_id=user_ids[record['user']],
+                credit_batch=batch,
+                order_type=record['side'],
+                quantity=Decimal(record['quantity']),
+                price_per_credit=Decimal(record['price']),
+            )
+            matching_engine.submit(order)
+
+    def _measure(self, mode, burst, users):
+        first_sequence = None
+        report = {'mode': mode}
+        try:
+            with transaction.atomic():
+                user_ids, batch = self._setup(users, mode)
+                first_sequence = matching_engine.last_sequence
+
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    started = time.perf_counter()
+                    self._ingest(burst, user_ids, batch)
+                    report['ingest_s'] = time.perf_counter() - started
+                report['ingest_queries'] = counter.count
+
+                report['clear_s'] = 0.0
+                report['clear_queries'] = 0
+                if mode == 'auction':
+                    counter = QueryCounter()
+                    with connection.execute_wrapper(counter):
+                        started = time.perf_counter()
+                        result = matching_engine.clear_auction(batch.batch_id)
+                        report['clear_s'] = time.perf_counter() - started
+                    report['clear_queries'] = counter.count
+                    report['clearing_price'] = float(result.price) if result else None
+
+                trades = Trade.objects.filter(sequence__gt=first_sequence)
+                prices = list(trades.values_list('price', flat=True))
+                report['trades'] = len(prices)
+                report['volume'] = float(sum(trades.values_list('quantity', flat=True), Decimal('0')))
+                report['distinct_prices'] = len(set(prices))
+                report['total_s'] = report['ingest_s'] + report['clear_s']
+                report['orders_per_sec'] = len(burst) / report['total_s']
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            matching_engine.reset()
+        return report
+
+    def handle(self, *args, **options):
+        # A burst has little time for the mid to move
+        burst = list(generate_orders(
+            options['orders'], mid=options['mid'], volatility=0.0001, spread=options['spread'],
+            cross_ratio=options['cross_ratio'], size_distribution=options['size_distribution'],
+            users=options['users'], seed=options['seed'],
+        ))
+
+        reports = [self._measure(mode, burst, options['users']) for mode in ('continuous', 'auction')]
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+
+        for r in reports:
+            self.stdout.write(
+                f"{r['mode']:<11} ingest {r['ingest_s']:.3f}s ({r['ingest_queries']} queries)  "
+                f"clear {r['clear_s']:.3f}s ({r['clear_queries']} queries)  "
+                f"{r['trades']} trades at {r['distinct_prices']} prices, volume {r['volume']:.3f}"
+            )
+        continuous, auction = reports
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(burst)} orders: continuous {continuous['orders_per_sec']:,.0f} orders/sec, "
+            f"auction {auction['orders_per_sec']:,.0f} orders/sec "
+            f"({continuous['total_s'] / auction['total_s']:.1f}x)"
+        ))
@@ -0,0 +1,90 @@
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from web3 import Web3
+
+from api.rpc_batch import RpcBatchClient, balance_of_data, decode_uint
+
+
+class Command(BaseCommand):
+    help = 'Compare per-address balanceOf calls with batched JSON-RPC reads against a local node'
+
+    def add_arguments(self, parser):
+        blockchain_config = getattr(settings, 'BLOCKCHAIN_SETTINGS', {})
+        parser.add_argument('--rpc-url', default=blockchain_config.get('NETWORK_URL'),
+                            help='Node to read from (defaults to BLOCKCHAIN_SETTINGS)')
+        parser.add_argument('--contract', default=blockchain_config.get('CONTRACT_ADDRESS'),
+                            help='Token contract (defaults to BLOCKCHAIN_SETTINGS)')
+        parser.add_argument('--addresses', type=int, default=10000, help='Wallets to read')
+        parser.add_argument('--batch-size', type=int, default=blockchain_config.get('RPC_BATCH_SIZE', 500),
+                            help='eth_calls per batch request')
+        parser.add_argument('--concurrency', type=int, default=blockchain_config.get('RPC_BATCH_CONCURRENCY', 4),
+                            help='Batch requests in flight')
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    def _loop(self, w3, contract, addresses, block):
+        """The previous read path: one eth_call round trip per address"""
+        started = time.perf_counter()
+        balances = {
+            address: decode_uint(Web3.to_hex(w3.eth.call({'to': contract, 'data': balance_of_data(address)}, block)))
+            for address in addresses
+        }
+        return balances, time.perf_counter() - started
+
+    def _batched(self, client, contract, addresses, block):
+        started = time.perf_counter()
+        balances = client.balances_of(contract, addresses, block)
+        return balances, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        w3 = Web3(Web3.HTTPProvider(options['rpc_url']))
+        if not w3.is_connected():
+            raise CommandError(f"No node at {options['rpc_url']}; start a local dev node (e.g. npx hardhat node)")
+        if not options['contract']:
+            raise CommandError('A token contract address is required (--contract)')
+        contract = Web3.to_checksum_address(options['contract'])
+
+        rng = random.Random(23)
+        addresses = [Web3.to_checksum_address(f"0x{rng.getrandbits(160):040x}") for _ in range(options['addresses'])]
+        block = w3.eth.block_number
+        client = RpcBatchClient(options['rpc_url'], chunk_size=options['batch_size'], concurrency=options['concurrency'])
+
+        loop_balances, loop_s = self._loop(w3, contract, addresses, block)
+        batched_balances, batched_s = self._batched(client, contract, addresses, block)
+
+        count = len(addresses)
+        report = {
+            'rpc_url': options['rpc_url'],
+            'addresses': count,
+            'block_number': block,
+            'batch_size': options['batch_size'],
+            'concurrency': options['concurrency'],
+            'loop': {'elapsed_s': loop_s, 'reads_per_sec': count / loop_s, 'http_requests': count},
+            'batched': {
+                'elapsed_s': batched_s,
+                'reads_per_sec': count / batched_s,
+                'http_requests': -(-count // options['batch_size']),
+            },
+            'speedup': loop_s / batched_s,
+            'mismatches': sum(loop_balances[a] != batched_balances[a] for a in addresses),
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{count} balances at block {block} from {options['rpc_url']}")
+        for mode in ('loop', 'batched'):
+            r = report[mode]
+            self.stdout.write(
+                f"  {mode:<8} {r['elapsed_s']:>8.2f}s  {r['reads_per_sec']:>9.0f} reads/s  "
+                f"{r['http_requests']} HTTP requests"
+            )
+        self.stdout.write(f"  speedup {report['speedup']:.1f}x")
+        if report['mismatches']:
+            self.stdout.write(self.style.ERROR(f"{report['mismatches']} balances differ between the two reads"))
+        else:
+            self.stdout.write(self.style.SUCCESS('Both reads agree'))
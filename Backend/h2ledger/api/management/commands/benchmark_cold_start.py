@@ -0,0 +1,77 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Each probe runs in a fresh interpreter and prints the seconds it took from interpreter start
+PROBE = """
+import os, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings_module!r})
+import django
+django.setup()
+{body}
+print(time.perf_counter() - started)
+"""
+
+FIRST_REQUEST = """
+from django.conf import settings
+from django.test import Client
+host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+Client(HTTP_HOST=host).get({path!r})
+"""
+
+FIRST_CHAIN_USE = """
+from api.blockchain_service import blockchain_service
+blockchain_service.is_connected()
+"""
+
+
+class Command(BaseCommand):
+    help = 'Time cold starts: manage.py check, the first request, and the first use of the chain client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh processes per measurement')
+        parser.add_argument('--path', default='/api/health/', help='URL of the first request')
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    def _time_check(self):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, 'manage.py', 'check'], cwd=settings.BASE_DIR, check=True, capture_output=True)
+        return time.perf_counter() - started
+
+    def _time_probe(self, body):
+        code = PROBE.format(settings_module=settings.SETTINGS_MODULE, body=body)
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, check=True,
+                                capture_output=True, text=True)
+        return float(result.stdout.strip().splitlines()[-1])
+
+    def _summary(self, samples):
+        return {'median_s': statistics.median(samples), 'min_s': min(samples), 'max_s': max(samples)}
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        report = {
+            'repeat': repeat,
+            'rpc_url': getattr(settings, 'BLOCKCHAIN_SETTINGS', {}).get('NETWORK_URL'),
+            'manage_py_check': self._summary([self._time_check() for _ in range(repeat)]),
+            'first_request': self._summary([
+                self._time_probe(FIRST_REQUEST.format(path=options['path'])) for _ in range(repeat)
+            ]),
+            'first_chain_use': self._summary([self._time_probe(FIRST_CHAIN_USE) for _ in range(repeat)]),
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Cold starts over {repeat} fresh processes (node at {report['rpc_url']})")
+        for name in ('manage_py_check', 'first_request', 'first_chain_use'):
+            r = report[name]
+            self.stdout.write(f"  {name:<16} median {r['median_s']:.3f}s  (min {r['min_s']:.3f}s, max {r['max_s']:.3f}s)")
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,191 @@
+from datetime import timedelta
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q, Sum
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from api.models import Credit, EmissionsData, HydrogenBatch, TradingOrder, Transaction, UserLedgerSummary
+from api.emissions_rollup_service import emissions_rollup_service
+from api.ledger_summary_service import summarize_users
+from api.dashboard_service import dashboard_service, TRADED_TX_TYPES
+from api.management.commands.benchmark_queries import (
+    explicit_timestamps, percentile, routed_to, scratch_database,
+)
+from auth1.models import User1
+
+
+BENCH_EMAIL_DOMAIN = 'dashboard.h2ledger.local'
+
+# Scratch primary keys collide with real ones, so cached figures stay in this process
+PRIVATE_DASHBOARD_CACHE = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'h2ledger-dashboard-benchmark',
+}
+
+
+def legacy_user_figures(user):
+    """The per-figure queries the dashboard issued before the conditional-aggregation rewrite"""
+    today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today_start - timedelta(days=7)
+    month_start = today_start.replace(day=1)
+
+    def traded_since(start):
+        return Transaction.objects.filter(
+            Q(from_user=user, tx_type__in=TRADED_TX_TYPES, timestamp__gte=start) |
+            Q(to_user=user, tx_type__in=TRADED_TX_TYPES, timestamp__gte=start)
+        ).aggregate(total=Sum('amount'))['total'] or 0
+
+    return {
+        'total_credits': Credit.objects.filter(owner=user, status='active').aggregate(t=Sum('amount'))['t'] or 0,
+        'batches_produced': HydrogenBatch.objects.filter(producer=user).count(),
+        'total_transactions': Transaction.objects.filter(Q(from_user=user) | Q(to_user=user)).count(),
+        'emissions_total': EmissionsData.objects.filter(user=user).aggregate(t=Sum('co2_offset_kg'))['t'] or 0,
+        'emissions_month': EmissionsData.objects.filter(
+            user=user, timestamp__date__gte=month_start
+        ).aggregate(t=Sum('co2_offset_kg'))['t'] or 0,
+        'traded_today': traded_since(today_start),
+        'traded_week': traded_since(week_start),
+        'active_orders': TradingOrder.objects.filter(user=user, status__in=['pending', 'partial']).count(),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Benchmark dashboard analytics queries for a user with a very long transaction history, '
+            'seeded into a scratch database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', required=True,
+                            help='Migrated scratch database alias to seed and measure; never the default one')
+        parser.add_argument('--transactions', type=int, default=1000000,
+                            help='Transactions to seed for the benchmark user')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per variant')
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse the previously seeded user')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark user when done')
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    def _seed(self, count):
+        User1.objects.filter(email__endswith=BENCH_EMAIL_DOMAIN).delete()
+        user, counterparty = [
+            User1.objects.create(
+                wallet_address=f"0xdashboard{i:031d}",
+                name=f"Dashboard Bench {i}",
+                email=f"user{i}@{BENCH_EMAIL_DOMAIN}",
+                role='producer',
+                password='pbkdf2_sha256$bench',
+            ) for i in range(2)
+        ]
+        batch = HydrogenBatch.objects.create(
+            producer=user, quantity_kg=1000, production_date=timezone.now().date(), is_approved=True
+        )
+        credits = Credit.objects.bulk_create([
+            Credit(batch=batch, owner=user, amount=100) for _ in range(100)
+        ])
+
+        rng = random.Random(11)
+        start_time = timezone.now() - timedelta(days=365)
+        span = 365 * 24 * 3600
+        chunk = 20000
+        tx_types = ['mint', 'transfer', 'burn', 'purchase']
+        with explicit_timestamps(Transaction._meta.get_field('timestamp'),
+                                 EmissionsData._meta.get_field('timestamp')):
+            for offset in range(0, count, chunk):
+                rows = []
+                for i in range(offset, min(count, offset + chunk)):
+                    outgoing = rng.random() < 0.5
+                    rows.append(Transaction(
+                        credit=credits[i % len(credits)],
+                        from_user=user if outgoing else counterparty,
+                        to_user=counterparty if outgoing else user,
+                        tx_type=rng.choice(tx_types),
+                        amount=rng.randint(1, 100),
+                        tx_hash=f"dashboard_bench_{i}",
+                        timestamp=start_time + timedelta(seconds=rng.randint(0, span)),
+                    ))
+                Transaction.objects.bulk_create(rows)
+                self.stdout.write(f'  seeded {min(count, offset + chunk)} transactions')
+            EmissionsData.objects.bulk_create([
+                EmissionsData(user=user, credits_burned=1, co2_offset_kg=10,
+                              timestamp=start_time + timedelta(seconds=rng.randint(0, span)))
+                for _ in range(count // 100)
+            ])
+        # Bulk inserts skip the rollup and ledger summary signals
+        emissions_rollup_service.rebuild([user.pk])
+        UserLedgerSummary.objects.filter(user__in=[user, counterparty]).delete()
+        UserLedgerSummary.objects.bulk_create([
+            UserLedgerSummary(user_id=user_id, **figures)
+            for user_id, figures in summarize_users([user.pk, counterparty.pk]).items()
+        ])
+        with connections[self.db].cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return user
+
+    def _time(self, fn, repeat):
+        with CaptureQueriesContext(connections[self.db]) as queries:
+            fn()
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        return {
+            'queries': len(queries),
+            'p50_ms': percentile(samples, 50) * 1000,
+            'p99_ms': percentile(samples, 99) * 1000,
+        }
+
+    def handle(self, *args, **options):
+        self.db = scratch_database(options['database'])
+        caches = {**settings.CACHES, 'dashboard': PRIVATE_DASHBOARD_CACHE}
+        # The dashboard services only use the default managers, so route them to the scratch alias
+        with routed_to(self.db), override_settings(CACHES=caches):
+            try:
+                report = self._run(options)
+            finally:
+                if options['cleanup']:
+                    User1.objects.filter(email__endswith=BENCH_EMAIL_DOMAIN).delete()
+        self._print(report, options)
+
+    def _run(self, options):
+        if options['skip_seed']:
+            user = User1.objects.get(email=f"user0@{BENCH_EMAIL_DOMAIN}")
+        else:
+            user = self._seed(options['transactions'])
+
+        legacy = legacy_user_figures(user)
+        current = dashboard_service._get_user_figures(user)
+        mismatched = [key for key in legacy if float(legacy[key]) != float(current[key])]
+
+        return {
+            'database': self.db,
+            'transactions': Transaction.objects.filter(Q(from_user=user) | Q(to_user=user)).count(),
+            'legacy_user_figures': self._time(lambda: legacy_user_figures(user), options['repeat']),
+            'user_figures': self._time(lambda: dashboard_service._get_user_figures(user), options['repeat']),
+            'comprehensive_analytics': self._time(
+                lambda: dashboard_service.get_comprehensive_analytics(user), options['repeat']
+            ),
+            'mismatched_figures': mismatched,
+        }
+
+    def _print(self, report, options):
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"User with {report['transactions']} transactions")
+        for name in ('legacy_user_figures', 'user_figures', 'comprehensive_analytics'):
+            r = report[name]
+            self.stdout.write(
+                f"  {name:<25} {r['queries']:>3} queries  p50 {r['p50_ms']:.1f}ms  p99 {r['p99_ms']:.1f}ms"
+            )
+        if report['mismatched_figures']:
+            self.stdout.write(self.style.ERROR(
+                f"Figures differ from the legacy queries: {report['mismatched_figures']}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Rewritten figures match the legacy queries'))
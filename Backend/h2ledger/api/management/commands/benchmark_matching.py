@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from decimal import Decimal
+import random
+import time
+
+from api.matching_engine import BookOrder, OrderBook
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the in-memory matching engine against a large resting book'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resting', type=int, default=100000,
+                            help='Number of resting orders in the book')
+        parser.add_argument('--orders', type=int, default=20000,
+                            help='Number of incoming orders to match')
+        parser.add_argument('--mid', type=float, default=50.0,
+                            help='Mid price around which orders are generated')
+        parser.add_argument('--spread', type=float, default=5.0,
+                            help='Maximum distance from mid for generated prices')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _random_order(self, rng, order_id, mid, spread, side=None, cross=False):
+        side = side or rng.choice(('buy', 'sell'))
+        offset = Decimal(str(round(rng.uniform(0.01, spread), 2)))
+        if cross:
+            offset = -offset
+        # Resting bids sit below mid and asks above it; crossing orders invert that
+        price = Decimal(str(mid)) - offset if side == 'buy' else Decimal(str(mid)) + offset
+        quantity = Decimal(str(round(rng.uniform(1, 100), 3)))
+        return BookOrder(order_id, rng.randint(1, 1000), side, price.quantize(Decimal('0.01')), quantity)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        mid, spread = options['mid'], options['spread']
+        book = OrderBook()
+
+        start = time.perf_counter()
+        for order_id in range(1, options['resting'] + 1):
+            book.add(self._random_order(rng, order_id, mid, spread))
+        load_time = time.perf_counter() - start
+        self.stdout.write(f"Loaded {len(book)} resting orders in {load_time:.3f}s")
+
+        incoming = []
+        next_id = options['resting'] + 1
+        for i in range(options['orders']):
+            # Roughly half the flow crosses the spread and trades
+            incoming.append(self._random_order(rng, next_id + i, mid, spread, cross=rng.random() < 0.5))
+
+        fills = 0
+        start = time.perf_counter()
+        for order in incoming:
+            fills += len(book.match(order))
+            if order.remaining > 0:
+                book.add(order)
+        elapsed = time.perf_counter() - start
+
+        rate = len(incoming) / elapsed if elapsed else float('inf')
+        self.stdout.write(self.style.SUCCESS(
+            f"Matched {len(incoming)} orders ({fills} fills) in {elapsed:.3f}s "
+            f"-> {rate:,.0f} orders/sec, {elapsed / len(incoming) * 1e6:.1f} us/order"
+        ))
+        self.stdout.write(f"Book size after run: {len(book)} orders")
@@ -0,0 +1,125 @@
+from datetime import timedelta
+from decimal import Decimal
+import json
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.utils import timezone
+
+from api.models import MarketPrice, MarketPriceBucket
+from api.price_history_service import PriceHistoryService
+from api.management.commands.benchmark_queries import percentile, scratch_database
+
+
+class Command(BaseCommand):
+    help = ('Seed a long MarketPrice feed into a scratch database, compact it and report throughput, '
+            'peak memory and latest-price latency')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', required=True,
+                            help='Migrated scratch database alias to seed and compact; never the default one')
+        parser.add_argument('--rows', type=int, default=50000000, help='MarketPrice rows to seed')
+        parser.add_argument('--spacing', type=float, default=5.0, help='Seconds between seeded prices')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows compacted per transaction')
+        parser.add_argument('--repeat', type=int, default=200, help='Latest-price lookups timed')
+        parser.add_argument('--skip-seed', action='store_true', help='Compact the rows already in the table')
+        parser.add_argument('--no-trace-memory', action='store_true',
+                            help='Skip tracemalloc (faster, but no peak memory figure)')
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    def _seed(self, rows, spacing):
+        """Insert a price feed ending now with raw executemany; auto_now_add and signals are bypassed"""
+        rng = random.Random(5)
+        end = timezone.now()
+        connection = connections[self.db]
+        ops = connection.ops
+        table = ops.quote_name(MarketPrice._meta.db_table)
+        sql = f"INSERT INTO {table} (price_per_credit, volume_24h, timestamp) VALUES (%s, %s, %s)"
+        price = 50.0
+        chunk = 50000
+        for offset in range(0, rows, chunk):
+            batch = []
+            for i in range(offset, min(rows, offset + chunk)):
+                price = max(1.0, price + rng.uniform(-0.25, 0.25))
+                batch.append((
+                    ops.adapt_decimalfield_value(Decimal(f"{price:.2f}"), 10, 2),
+                    ops.adapt_decimalfield_value(Decimal(rng.randint(0, 5000)), 15, 3),
+                    ops.adapt_datetimefield_value(end - timedelta(seconds=(rows - i) * spacing)),
+                ))
+            with transaction.atomic(using=self.db), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            if not self.quiet and (offset // chunk) % 20 == 0:
+                self.stdout.write(f'  seeded {min(rows, offset + chunk)} prices')
+
+    def _latest(self, repeat):
+        queryset = MarketPrice.objects.using(self.db)
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset.first()
+            samples.append(time.perf_counter() - started)
+        return {
+            'plan': queryset.order_by('-timestamp')[:1].explain(),
+            'p50_ms': percentile(samples, 50) * 1000,
+            'p99_ms': percentile(samples, 99) * 1000,
+        }
+
+    def handle(self, *args, **options):
+        self.db = scratch_database(options['database'], 'compact')
+        self.quiet = options['json']
+        # A private service, so the batch size does not leak into the global one
+        service = PriceHistoryService()
+        if options['batch_size']:
+            service.batch_size = options['batch_size']
+
+        seed_s = 0.0
+        if not options['skip_seed']:
+            started = time.perf_counter()
+            self._seed(options['rows'], options['spacing'])
+            seed_s = time.perf_counter() - started
+        rows_before = MarketPrice.objects.using(self.db).count()
+        latest_before = self._latest(options['repeat'])
+
+        trace = not options['no_trace_memory']
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        compacted = service.compact(using=self.db)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+        if trace:
+            tracemalloc.stop()
+
+        report = {
+            'rows_before': rows_before,
+            'seed_s': seed_s,
+            'compacted': compacted,
+            'compact_s': elapsed,
+            'rows_per_sec': compacted / elapsed if elapsed else 0,
+            'database': self.db,
+            'batch_size': service.batch_size,
+            'peak_memory_mb': peak / 2 ** 20 if peak is not None else None,
+            'rows_after': MarketPrice.objects.using(self.db).count(),
+            'buckets': MarketPriceBucket.objects.using(self.db).count(),
+            'latest_before': latest_before,
+            'latest_after': self._latest(options['repeat']),
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"Compacted {report['compacted']} of {report['rows_before']} prices in {report['compact_s']:.2f}s "
+            f"({report['rows_per_sec']:.0f} rows/s, batches of {report['batch_size']})"
+        )
+        if peak is not None:
+            self.stdout.write(f"  peak traced memory {report['peak_memory_mb']:.1f} MB")
+        self.stdout.write(f"  {report['rows_after']} full-resolution rows and {report['buckets']} buckets remain")
+        for name in ('latest_before', 'latest_after'):
+            r = report[name]
+            self.stdout.write(f"  {name:<14} p50 {r['p50_ms']:.3f}ms  p99 {r['p99_ms']:.3f}ms  {r['plan']}")
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,359 @@
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import Q, Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.models import *
+from auth1.models import User1
+
+
+BENCH_EMAIL_DOMAIN = 'bench.h2ledger.local'
+
+# Indexes that replaced one the baseline schema already had (tx_from_to_user_idx
+# took over from the from_user foreign key index), so 'before' keeps them
+BASELINE_INDEXES = {'tx_from_to_user_idx'}
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Temporarily disable auto_now_add so seeded rows can be spread over time"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class ScratchRouter:
+    """Sends every ORM query that names no database to one alias"""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def db_for_read(self, model, **hints):
+        return self.alias
+
+    db_for_write = db_for_read
+
+
+@contextmanager
+def routed_to(alias):
+    """Temporarily run services that only use the default managers against `alias`"""
+    scratch = ScratchRouter(alias)
+    router.routers.insert(0, scratch)
+    try:
+        yield
+    finally:
+        router.routers.remove(scratch)
+
+
+@contextmanager
+def default_database(alias):
+    """
+    Point the default alias itself at `alias` while active, for services
+    whose transaction.atomic() blocks must land on the same database as
+    their queries. Threads started inside open their own connections to it.
+    """
+    saved = connections.settings[DEFAULT_DB_ALIAS]
+    connections[DEFAULT_DB_ALIAS].close()
+    del connections[DEFAULT_DB_ALIAS]
+    connections.settings[DEFAULT_DB_ALIAS] = connections.settings[alias]
+    try:
+        yield
+    finally:
+        connections[DEFAULT_DB_ALIAS].close()
+        del connections[DEFAULT_DB_ALIAS]
+        connections.settings[DEFAULT_DB_ALIAS] = saved
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def scratch_database(alias, action='benchmark'):
+    """The alias to seed, refusing anything that points at the default database"""
+    if alias not in settings.DATABASES:
+        raise CommandError(f"Unknown database '{alias}'")
+    default = settings.DATABASES[DEFAULT_DB_ALIAS]
+    target = settings.DATABASES[alias]
+    same = (target.get('ENGINE'), str(target.get('NAME')), target.get('HOST') or '') == \
+        (default.get('ENGINE'), str(default.get('NAME')), default.get('HOST') or '')
+    if alias == DEFAULT_DB_ALIAS or same:
+        # Seeded, deleted and mutated rows must never touch live data
+        raise CommandError(f'Refusing to {action} the default database; pass a scratch --database')
+    return alias
+
+
+class Command(BaseCommand):
+    help = 'Seed a large dataset into a scratch database and report EXPLAIN plans and p50/p99 latency for hot queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', required=True,
+                            help='Migrated scratch database alias to seed and measure; never the default one')
+        parser.add_argument('--rows', type=int, default=1000000,
+                            help='Number of Transaction rows to seed (other tables scale from it)')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Executions per query for latency percentiles')
+        parser.add_argument('--skip-seed', action='store_true',
+                            help='Reuse previously seeded benchmark data')
+        parser.add_argument('--compare', action='store_true',
+                            help='Also measure with the Meta.indexes dropped (before) and restore them')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the benchmark data when done')
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    # Seeding
+
+    def _seed(self, rows, user_count):
+        db = self.db
+        rng = random.Random(7)
+        start_time = timezone.now() - timedelta(days=90)
+        span = 90 * 24 * 3600
+        chunk = 10000
+
+        def stamp():
+            return start_time + timedelta(seconds=rng.randint(0, span))
+
+        User1.objects.using(db).bulk_create([
+            User1(
+                wallet_address=f"0xbench{i:035d}",
+                name=f"Bench User {i}",
+                email=f"user{i}@{BENCH_EMAIL_DOMAIN}",
+                role=rng.choice(['producer', 'buyer', 'consumer']),
+                password='pbkdf2_sha256$bench',
+            ) for i in range(user_count)
+        ], batch_size=chunk)
+        users = list(User1.objects.using(db).filter(email__endswith=BENCH_EMAIL_DOMAIN))
+        user_ids = [u.user_id for u in users]
+
+        HydrogenBatch.objects.using(db).bulk_create([
+            HydrogenBatch(
+                producer_id=rng.choice(user_ids),
+                quantity_kg=Decimal('1000'),
+                production_date=timezone.now().date(),
+                is_approved=True,
+            ) for _ in range(max(1, user_count // 10))
+        ], batch_size=chunk)
+        batch_ids = list(HydrogenBatch.objects.using(db).filter(
+            producer_id__in=user_ids).values_list('batch_id', flat=True))
+
+        credit_count = max(1, rows // 10)
+        for offset in range(0, credit_count, chunk):
+            Credit.objects.using(db).bulk_create([
+                Credit(
+                    batch_id=rng.choice(batch_ids),
+                    owner_id=rng.choice(user_ids),
+                    amount=Decimal(rng.randint(1, 500)),
+                    status=rng.choice(['active', 'active', 'transferred', 'burned']),
+                    tx_hash=f"bench-credit-{offset + i}",
+                ) for i in range(min(chunk, credit_count - offset))
+            ])
+        credit_ids = list(Credit.objects.using(db).filter(
+            tx_hash__startswith='bench-credit-').values_list('credit_id', flat=True))
+
+        with explicit_timestamps(
+            Transaction._meta.get_field('timestamp'),
+            EmissionsData._meta.get_field('timestamp'),
+            TradingOrder._meta.get_field('created_at'),
+        ):
+            for offset in range(0, rows, chunk):
+                txs = []
+                for i in range(min(chunk, rows - offset)):
+                    tx_type = rng.choice(['mint', 'transfer', 'transfer', 'purchase', 'burn'])
+                    amount = Decimal(rng.randint(1, 100))
+                    txs.append(Transaction(
+                        credit_id=rng.choice(credit_ids),
+                        from_user_id=None if tx_type == 'mint' else rng.choice(user_ids),
+                        to_user_id=None if tx_type == 'burn' else rng.choice(user_ids),
+                        tx_type=tx_type,
+                        amount=amount,
+                        fiat_value_usd=amount * 50 if tx_type in ('transfer', 'purchase') else None,
+                        tx_hash=f"bench-tx-{offset + i}",
+                        timestamp=stamp(),
+                    ))
+                Transaction.objects.using(db).bulk_create(txs)
+                self.stderr.write(f"  seeded {offset + len(txs)}/{rows} transactions", ending='\r')
+            self.stderr.write('')
+
+            emissions_count = max(1, rows // 10)
+            for offset in range(0, emissions_count, chunk):
+                EmissionsData.objects.using(db).bulk_create([
+                    EmissionsData(
+                        user_id=rng.choice(user_ids),
+                        credits_burned=Decimal('10'),
+                        co2_offset_kg=Decimal('100'),
+                        timestamp=stamp(),
+                    ) for _ in range(min(chunk, emissions_count - offset))
+                ])
+
+            order_count = max(1, rows // 5)
+            for offset in range(0, order_count, chunk):
+                TradingOrder.objects.using(db).bulk_create([
+                    TradingOrder(
+                        user_id=rng.choice(user_ids),
+                        order_type=rng.choice(['buy', 'sell']),
+                        quantity=Decimal(rng.randint(1, 100)),
+                        price_per_credit=Decimal(rng.randint(4000, 6000)) / 100,
+                        status=rng.choice(['pending', 'partial', 'completed', 'completed', 'cancelled']),
+                        created_at=stamp(),
+                    ) for _ in range(min(chunk, order_count - offset))
+                ])
+
+    def _analyze(self):
+        # Refresh planner statistics so index choices reflect the seeded data
+        with self.connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _cleanup(self):
+        db = self.db
+        # Cascades to batches, credits, transactions, emissions and orders
+        User1.objects.using(db).filter(email__endswith=BENCH_EMAIL_DOMAIN).delete()
+
+    # Queries
+
+    def _queries(self):
+        db = self.db
+        user = User1.objects.using(db).filter(email__endswith=BENCH_EMAIL_DOMAIN).first()
+        today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        week_start = today - timedelta(days=7)
+        month_start = today.replace(day=1)
+
+        return {
+            'dashboard_total_credits': lambda: Credit.objects.using(db).filter(
+                owner=user, status='active'
+            ).aggregate(total=Sum('amount')),
+            'dashboard_user_transactions': lambda: Transaction.objects.using(db).filter(
+                Q(from_user=user) | Q(to_user=user)
+            ).count(),
+            'dashboard_user_traded_week': lambda: Transaction.objects.using(db).filter(
+                Q(from_user=user, tx_type__in=['transfer', 'purchase'], timestamp__gte=week_start) |
+                Q(to_user=user, tx_type__in=['transfer', 'purchase'], timestamp__gte=week_start)
+            ).aggregate(total=Sum('amount')),
+            'dashboard_market_traded_week': lambda: Transaction.objects.using(db).filter(
+                tx_type='transfer', timestamp__gte=timezone.now() - timedelta(days=7)
+            ).aggregate(total=Sum('amount')),
+            'dashboard_emissions_month': lambda: EmissionsData.objects.using(db).filter(
+                user=user, timestamp__gte=month_start
+            ).aggregate(total=Sum('co2_offset_kg')),
+            'dashboard_active_orders': lambda: TradingOrder.objects.using(db).filter(
+                user=user, status__in=['pending', 'partial']
+            ).count(),
+            'leaderboard': lambda: list(
+                Transaction.objects.using(db).filter(tx_type='burn')
+                .values('from_user__email')
+                .annotate(total_hydrogen_used=Sum('amount'))
+                .order_by('-total_hydrogen_used')[:100]
+            ),
+            'matching_best_asks': lambda: list(
+                TradingOrder.objects.using(db).filter(
+                    order_type='sell', status='pending', price_per_credit__lte=Decimal('50.00')
+                ).order_by('price_per_credit', 'created_at')[:50]
+            ),
+            'matching_load_open_orders': lambda: list(
+                TradingOrder.objects.using(db).filter(
+                    status__in=['pending', 'partial']
+                ).order_by('created_at').values_list('id', flat=True)[:1000]
+            ),
+        }
+
+    def _explain(self, sql):
+        prefix = self.connection.ops.explain_query_prefix()
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}")
+            return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+
+    def _measure(self, repeat):
+        results = {}
+        for name, run in self._queries().items():
+            with CaptureQueriesContext(self.connection) as ctx:
+                run()
+            plan = self._explain(ctx.captured_queries[-1]['sql'])
+
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                samples.append((time.perf_counter() - start) * 1000)
+
+            results[name] = {
+                'p50_ms': round(percentile(samples, 50), 3),
+                'p99_ms': round(percentile(samples, 99), 3),
+                'plan': plan,
+            }
+        return results
+
+    def _indexed_models(self):
+        return [Transaction, TradingOrder, Credit, EmissionsData]
+
+    @staticmethod
+    def _added_indexes(model):
+        """Meta.indexes that the 'before' pass drops"""
+        return [index for index in model._meta.indexes if index.name not in BASELINE_INDEXES]
+
+    def _drop_indexes(self):
+        with self.connection.schema_editor() as editor:
+            for model in self._indexed_models():
+                for index in self._added_indexes(model):
+                    editor.remove_index(model, index)
+
+    def _restore_indexes(self):
+        with self.connection.schema_editor() as editor:
+            for model in self._indexed_models():
+                existing = self.connection.introspection.get_constraints(
+                    self.connection.cursor(), model._meta.db_table
+                )
+                for index in model._meta.indexes:
+                    if index.name not in existing:
+                        editor.add_index(model, index)
+
+    # Entry point
+
+    def handle(self, *args, **options):
+        self.db = scratch_database(options['database'])
+        self.connection = connections[self.db]
+
+        if not options['skip_seed']:
+            self.stderr.write(f"Seeding {options['rows']} transactions for {options['users']} users...")
+            self._cleanup()
+            self._seed(options['rows'], options['users'])
+        self._analyze()
+
+        report = {'backend': self.connection.vendor, 'database': self.db, 'rows': options['rows']}
+
+        if options['compare']:
+            try:
+                self._drop_indexes()
+                report['before'] = self._measure(options['repeat'])
+            finally:
+                self._restore_indexes()
+        report['after'] = self._measure(options['repeat'])
+
+        if options['cleanup']:
+            self._cleanup()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for name, after in report['after'].items():
+            line = f"{name:32} p50 {after['p50_ms']:9.3f}ms  p99 {after['p99_ms']:9.3f}ms"
+            if 'before' in report:
+                before = report['before'][name]
+                line += f"   (before: p50 {before['p50_ms']:9.3f}ms  p99 {before['p99_ms']:9.3f}ms)"
+            self.stdout.write(line)
+            for plan_line in after['plan']:
+                self.stdout.write(f"    {plan_line}")
@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from web3 import Web3
+
+from api.nonce_manager import NonceManager, raw_transaction, send_transaction
+
+
+class Command(BaseCommand):
+    help = 'Compare submitted tx/sec of per-send nonce lookups with the local nonce manager against a dev node'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rpc-url', default=None, help='Node to send to (defaults to BLOCKCHAIN_SETTINGS)')
+        parser.add_argument('--private-key', default=os.getenv('BLOCKCHAIN_PRIVATE_KEY'),
+                            help='Funded dev account key (defaults to $BLOCKCHAIN_PRIVATE_KEY)')
+        parser.add_argument('--count', type=int, default=200, help='Transactions per mode')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent senders in pipelined mode; use 1 against nodes that reject '
+                                 'out-of-order nonces (eth-tester, hardhat with automine)')
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    def _transfer(self, address, nonce, gas_price, chain_id):
+        # A zero-value self transfer: the cheapest transaction that still needs a nonce
+        return {
+            'from': address, 'to': address, 'value': 0, 'nonce': nonce,
+            'gas': 21000, 'gasPrice': gas_price, 'chainId': chain_id,
+        }
+
+    def _sequential(self, w3, account, count, gas_price, chain_id):
+        """The previous send path: look the nonce up, send, wait for the receipt"""
+        started = time.perf_counter()
+        for _ in range(count):
+            nonce = w3.eth.get_transaction_count(account.address)
+            signed = w3.eth.account.sign_transaction(
+                self._transfer(account.address, nonce, gas_price, chain_id), account.key
+            )
+            w3.eth.wait_for_transaction_receipt(w3.eth.send_raw_transaction(raw_transaction(signed)))
+        elapsed = time.perf_counter() - started
+        return {'submit_s': elapsed, 'confirmed_s': elapsed, 'submitted_per_sec': count / elapsed}
+
+    def _pipelined(self, w3, account, count, threads, gas_price, chain_id):
+        """Allocate nonces locally, send from several threads, then collect receipts"""
+        nonces = NonceManager(w3)
+
+        def send(_):
+            return send_transaction(
+                w3, nonces, account.address, account.key,
+                lambda nonce: self._transfer(account.address, nonce, gas_price, chain_id)
+            )
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            tx_hashes = list(pool.map(send, range(count)))
+        submitted = time.perf_counter() - started
+        failed = sum(w3.eth.wait_for_transaction_receipt(tx_hash).status != 1 for tx_hash in tx_hashes)
+        return {
+            'submit_s': submitted,
+            'confirmed_s': time.perf_counter() - started,
+            'submitted_per_sec': count / submitted,
+            'failed': failed,
+            'next_nonce': nonces.pending(account.address)[0],
+        }
+
+    def handle(self, *args, **options):
+        rpc_url = options['rpc_url'] or getattr(settings, 'BLOCKCHAIN_SETTINGS', {}).get('NETWORK_URL')
+        if not options['private_key']:
+            raise CommandError('A funded dev account key is required (--private-key or $BLOCKCHAIN_PRIVATE_KEY)')
+        w3 = Web3(Web3.HTTPProvider(rpc_url))
+        if not w3.is_connected():
+            raise CommandError(f'No node at {rpc_url}; start a local dev node (e.g. npx hardhat node)')
+
+        account = w3.eth.account.from_key(options['private_key'])
+        gas_price = w3.eth.gas_price
+        chain_id = w3.eth.chain_id
+        report = {
+            'rpc_url': rpc_url,
+            'count': options['count'],
+            'threads': options['threads'],
+            'sequential': self._sequential(w3, account, options['count'], gas_price, chain_id),
+            'pipelined': self._pipelined(w3, account, options['count'], options['threads'], gas_price, chain_id),
+        }
+        report['chain_nonce'] = w3.eth.get_transaction_count(account.address, 'pending')
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{options['count']} transactions to {rpc_url}")
+        for mode in ('sequential', 'pipelined'):
+            r = report[mode]
+            self.stdout.write(
+                f"  {mode:<10} {r['submitted_per_sec']:>8.1f} submitted tx/s  "
+                f"(all confirmed after {r['confirmed_s']:.2f}s)"
+            )
+        pipelined = report['pipelined']
+        if pipelined['failed'] or pipelined['next_nonce'] != report['chain_nonce']:
+            self.stdout.write(self.style.ERROR(
+                f"{pipelined['failed']} failed; local nonce {pipelined['next_nonce']}, chain {report['chain_nonce']}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Local nonces match the chain'))
@@ -0,0 +1,48 @@
+from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.price_history_service import price_history_service
+
+
+class Command(BaseCommand):
+    help = 'Downsample MarketPrice rows older than the retention window into fixed buckets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep compacting on an interval instead of running once',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=3600,
+            help='Seconds between runs when running with --loop',
+        )
+        parser.add_argument(
+            '--retention-hours',
+            type=int,
+            default=None,
+            help='Hours of history kept at full resolution',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Rows downsampled and deleted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        if options['retention_hours'] is not None:
+            price_history_service.retention = timedelta(hours=options['retention_hours'])
+        if options['batch_size']:
+            price_history_service.batch_size = options['batch_size']
+
+        while True:
+            compacted = price_history_service.compact()
+            self.stdout.write(self.style.SUCCESS(f'Compacted {compacted} market prices'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
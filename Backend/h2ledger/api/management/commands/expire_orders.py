@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+import time
+
+from api.expiry_service import order_expiry_service
+
+
+class Command(BaseCommand):
+    help = 'Cancel trading orders whose expiry time has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep sweeping on an interval instead of running once',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between sweeps when running with --loop',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Maximum number of orders cancelled per UPDATE',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size']:
+            order_expiry_service.batch_size = options['batch_size']
+
+        while True:
+            cancelled = order_expiry_service.sweep()
+            self.stdout.write(self.style.SUCCESS(f'Cancelled {cancelled} expired orders'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
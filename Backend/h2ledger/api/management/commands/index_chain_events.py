@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.chain_indexer import chain_indexer
+from api.chain_snapshot_service import ChainUnavailable
+
+
+class Command(BaseCommand):
+    help = 'Copy the credits contract Transfer logs into ChainEvent, resuming from the last checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep indexing on an interval instead of running once',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=5,
+            help='Seconds between runs when running with --loop',
+        )
+        parser.add_argument(
+            '--chunk-blocks',
+            type=int,
+            default=None,
+            help='Blocks per eth_getLogs request',
+        )
+        parser.add_argument(
+            '--from-block',
+            type=int,
+            default=None,
+            help='First block to index when there is no checkpoint yet',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_blocks']:
+            chain_indexer.chunk_blocks = options['chunk_blocks']
+        if options['from_block'] is not None:
+            chain_indexer.start_block = options['from_block']
+
+        while True:
+            try:
+                stored = chain_indexer.index()
+            except ChainUnavailable as e:
+                raise CommandError(str(e))
+            checkpoint = chain_indexer.checkpoint()
+            block = checkpoint.block_number if checkpoint else None
+            self.stdout.write(self.style.SUCCESS(f'Stored {stored} chain events; indexed to block {block}'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
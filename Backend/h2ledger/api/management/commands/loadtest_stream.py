@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+import asyncio
+import json
+import threading
+import time
+import tracemalloc
+
+from api.market_stream import MarketStream, TICKS_TOPIC
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = 'Measure broadcast latency of the market stream with many idle subscribers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=5000,
+                            help='Concurrent subscribers on one event loop (one worker)')
+        parser.add_argument('--events', type=int, default=200, help='Events to broadcast')
+        parser.add_argument('--rate', type=float, default=50.0, help='Events published per second')
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    def handle(self, *args, **options):
+        report = asyncio.run(self._run(options['subscribers'], options['events'], options['rate']))
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['subscribers']} subscribers, {report['events']} events, "
+            f"{report['deliveries']} deliveries ({report['dropped']} dropped)"
+        )
+        self.stdout.write(f"Memory per idle subscriber: {report['bytes_per_subscriber']:.0f} bytes")
+        self.stdout.write(self.style.SUCCESS(
+            f"Broadcast latency p50 {report['p50_ms']:.3f}ms  p99 {report['p99_ms']:.3f}ms  "
+            f"max {report['max_ms']:.3f}ms"
+        ))
+
+    async def _run(self, subscriber_count, event_count, rate):
+        stream = MarketStream(queue_size=event_count + 1)
+        latencies = []
+        done = asyncio.Event()
+        expected = subscriber_count * event_count
+
+        async def consume(subscription):
+            for _ in range(event_count):
+                message = await subscription.get()
+                received = time.perf_counter()
+                data = json.loads(message[message.index('data: ') + 6:])
+                latencies.append(received - data['sent'])
+            if len(latencies) >= expected:
+                done.set()
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        subscriptions = [stream.subscribe([TICKS_TOPIC]) for _ in range(subscriber_count)]
+        tasks = [asyncio.create_task(consume(s)) for s in subscriptions]
+        await asyncio.sleep(0)
+        per_subscriber = (tracemalloc.get_traced_memory()[0] - baseline) / max(1, subscriber_count)
+        tracemalloc.stop()
+
+        def publisher():
+            # Publish from a separate thread, the way sync views do under ASGI
+            interval = 1.0 / rate if rate else 0
+            for i in range(event_count):
+                stream.publish(TICKS_TOPIC, 'tick', {'price': 50.0 + i / 100, 'sent': time.perf_counter()})
+                if interval:
+                    time.sleep(interval)
+
+        thread = threading.Thread(target=publisher)
+        thread.start()
+        await done.wait()
+        thread.join()
+        for task in tasks:
+            task.cancel()
+
+        dropped = sum(s.dropped for s in subscriptions)
+        return {
+            'subscribers': subscriber_count,
+            'events': event_count,
+            'deliveries': len(latencies),
+            'dropped': dropped,
+            'bytes_per_subscriber': per_subscriber,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': max(latencies) * 1000,
+        }
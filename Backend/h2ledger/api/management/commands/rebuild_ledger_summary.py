@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import UserLedgerSummary
+from api.ledger_summary_service import SUMMARY_FIELDS, summarize_users
+from auth1.models import User1
+
+
+def summarize_chunk(user_ids):
+    """Worker: recompute one chunk of users on the thread's own connection"""
+    try:
+        return summarize_users(user_ids)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Recompute UserLedgerSummary rows from raw ledger history and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Chunks recomputed in parallel')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per chunk')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing')
+        parser.add_argument('--examples', type=int, default=10, help='Drifted users listed in the report')
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    def _apply(self, computed, existing):
+        """Write one chunk's recomputed figures; returns the drifted users"""
+        drift = []
+        missing = []
+        changed = []
+        for user_id, figures in computed.items():
+            summary = existing.get(user_id)
+            if summary is None:
+                missing.append(UserLedgerSummary(user_id=user_id, **figures))
+                continue
+            deltas = {
+                field: str(figures[field] - getattr(summary, field))
+                for field in SUMMARY_FIELDS if figures[field] != getattr(summary, field)
+            }
+            if deltas:
+                drift.append({'user_id': user_id, 'deltas': deltas})
+                for field in SUMMARY_FIELDS:
+                    setattr(summary, field, figures[field])
+                changed.append(summary)
+
+        if not self.dry_run:
+            with transaction.atomic():
+                UserLedgerSummary.objects.bulk_create(missing, ignore_conflicts=True)
+                UserLedgerSummary.objects.bulk_update(changed, SUMMARY_FIELDS)
+        return drift, len(missing)
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        chunk_size = max(1, options['chunk_size'])
+        user_ids = list(User1.objects.order_by('pk').values_list('pk', flat=True))
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+        drift = []
+        created = 0
+        started = time.perf_counter()
+        # Workers only read; writes stay on this thread so SQLite sees a single writer
+        pool = ThreadPoolExecutor(max_workers=options['workers']) if options['workers'] > 1 else None
+        results = pool.map(summarize_chunk, chunks) if pool else map(summarize_users, chunks)
+        try:
+            for chunk, computed in zip(chunks, results):
+                existing = UserLedgerSummary.objects.in_bulk(chunk)
+                chunk_drift, chunk_created = self._apply(computed, existing)
+                drift.extend(chunk_drift)
+                created += chunk_created
+        finally:
+            if pool:
+                pool.shutdown()
+
+        report = {
+            'users': len(user_ids),
+            'chunks': len(chunks),
+            'workers': options['workers'],
+            'elapsed_s': time.perf_counter() - started,
+            'missing': created,
+            'drifted': len(drift),
+            'examples': drift[:options['examples']],
+            'dry_run': self.dry_run,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"Recomputed {report['users']} users in {report['chunks']} chunks "
+            f"with {report['workers']} workers in {report['elapsed_s']:.2f}s"
+        )
+        for example in report['examples']:
+            self.stdout.write(f"  user {example['user_id']}: {example['deltas']}")
+        verb = 'found' if self.dry_run else 'repaired'
+        summary = f"{verb} {report['drifted']} drifted and {report['missing']} missing summaries"
+        if report['drifted']:
+            self.stdout.write(self.style.WARNING(summary.capitalize()))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary.capitalize()))
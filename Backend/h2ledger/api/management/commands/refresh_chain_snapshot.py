@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+import time
+
+from api.chain_snapshot_service import chain_snapshot_service
+
+
+class Command(BaseCommand):
+    help = 'Snapshot on-chain market price, total supply and watched balances for dashboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep refreshing on an interval instead of running once',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=15,
+            help='Seconds between snapshots when running with --loop',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            snapshot = chain_snapshot_service.refresh()
+            if snapshot is None:
+                self.stdout.write(self.style.ERROR('Chain snapshot failed; keeping the previous one'))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Block {snapshot.block_number}: supply {snapshot.total_supply}, '
+                    f'price {snapshot.market_price}, {len(snapshot.balances)} balances'
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
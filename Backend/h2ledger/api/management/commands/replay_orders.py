@@ -0,0 +1,236 @@
+from decimal import Decimal
+import hashlib
+import json
+import sys
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.models import Trade, TradingOrder
+from api.matching_engine import matching_engine, OPEN_STATUSES
+from api.order_flow import SIZE_DISTRIBUTIONS, generate_orders, read_ndjson, write_ndjson
+from api.views import trading_orders
+from auth1.models import User1
+
+
+REPLAY_EMAIL_DOMAIN = 'replay.h2ledger.local'
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Generate or load an NDJSON order stream and replay it through the matching path'
+
+    def add_arguments(self, parser):
+        source = parser.add_argument_group('order stream')
+        source.add_argument('--input', help='NDJSON order stream to replay ("-" for stdin)')
+        source.add_argument('--generate', type=int, metavar='N',
+                            help='Generate N synthetic orders instead of loading a stream')
+        source.add_argument('--output', help='Also write the generated stream to this NDJSON file')
+        source.add_argument('--mid', type=float, default=50.0)
+        source.add_argument('--volatility', type=float, default=0.001,
+                            help='Per-order standard deviation of mid-price log returns')
+        source.add_argument('--spread', type=float, default=1.0,
+                            help='Maximum distance from mid for passive orders')
+        source.add_argument('--cross-ratio', type=float, default=0.5,
+                            help='Share of orders priced through mid')
+        source.add_argument('--size-distribution', choices=SIZE_DISTRIBUTIONS, default='lognormal')
+        source.add_argument('--mean-size', type=float, default=10.0)
+        source.add_argument('--users', type=int, default=100)
+        source.add_argument('--seed', type=int, default=42)
+
+        parser.add_argument('--mode', choices=['inprocess', 'http'], default='inprocess',
+                            help='Submit through the engine directly or through the trading/orders/ '
+                                 'POST view, called in-process as the order owner')
+        parser.add_argument('--trace-alloc', action='store_true',
+                            help='Measure allocation per order with tracemalloc (slows the replay)')
+        parser.add_argument('--report', help='Write the JSON report to this file')
+        parser.add_argument('--json', action='store_true', help='Print the JSON report')
+
+    def _load_stream(self, options):
+        if options['generate']:
+            records = list(generate_orders(
+                options['generate'], mid=options['mid'], volatility=options['volatility'],
+                spread=options['spread'], cross_ratio=options['cross_ratio'],
+                size_distribution=options['size_distribution'], mean_size=options['mean_size'],
+                users=options['users'], seed=options['seed'],
+            ))
+            if options['output']:
+                with open(options['output'], 'w') as f:
+                    write_ndjson(records, f)
+            return records
+        if options['input'] == '-':
+            return list(read_ndjson(sys.stdin))
+        if options['input']:
+            with open(options['input']) as f:
+                return list(read_ndjson(f))
+        raise CommandError('Pass --input FILE or --generate N')
+
+    def _users(self, count):
+        User1.objects.bulk_create([
+            User1(
+                wallet_address=f"0xreplay{i:034d}",
+                name=f"Replay User {i}",
+                email=f"user{i}@{REPLAY_EMAIL_DOMAIN}",
+                role='buyer',
+                password='pbkdf2_sha256$replay',
+            ) for i in range(count)
+        ])
+        return list(
+            User1.objects.filter(email__endswith=REPLAY_EMAIL_DOMAIN)
+            .order_by('user_id').values_list('user_id', flat=True)
+        )
+
+    def _submitter(self, mode):
+        if mode == 'http':
+            factory = APIRequestFactory()
+            owners = User1.objects.filter(email__endswith=REPLAY_EMAIL_DOMAIN).in_bulk()
+
+            def submit(user_id, record):
+                request = factory.post('/api/trading/orders/', {
+                    'order_type': record['side'],
+                    'quantity': record['quantity'],
+                    'price_per_credit': record['price'],
+                }, format='json')
+                # The view takes the owner from the authenticated user, never the body
+                force_authenticate(request, user=owners[user_id])
+                response = trading_orders(request)
+                if response.status_code != 201:
+                    raise CommandError(f"Order {record['seq']} rejected: {response.data!r}")
+                return response.data['order']['id']
+            return submit
+
+        def submit(user_id, record):
+            order = TradingOrder.objects.create(
+                user_id=user_id,
+                order_type=record['side'],
+                quantity=Decimal(record['quantity']),
+                price_per_credit=Decimal(record['price']),
+            )
+            matching_engine.submit(order)
+            return order.id
+        return submit
+
+    def _replay(self, records, mode, trace_alloc):
+        # Start from an empty book so that a stream always produces the same trades
+        TradingOrder.objects.filter(status__in=OPEN_STATUSES).update(status='cancelled')
+        matching_engine.load()
+        first_sequence = matching_engine.last_sequence
+
+        users = self._users(max(r['user'] for r in records) + 1)
+        submit = self._submitter(mode)
+        latencies = []
+        allocations = []
+        seq_by_order = {}
+
+        if trace_alloc:
+            tracemalloc.start()
+            retained_start = tracemalloc.get_traced_memory()[0]
+
+        started = time.perf_counter()
+        for record in records:
+            if trace_alloc:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            t0 = time.perf_counter()
+            order_id = submit(users[record['user']], record)
+            latencies.append(time.perf_counter() - t0)
+            if trace_alloc:
+                allocations.append(tracemalloc.get_traced_memory()[1] - before)
+            seq_by_order[order_id] = record['seq']
+        elapsed = time.perf_counter() - started
+
+        retained = None
+        if trace_alloc:
+            retained = tracemalloc.get_traced_memory()[0] - retained_start
+            tracemalloc.stop()
+
+        trades = list(
+            Trade.objects.filter(sequence__gt=first_sequence).order_by('sequence')
+            .values_list('buy_order_id', 'sell_order_id', 'quantity', 'price')
+        )
+        # Digest over stream positions, not database ids, so replays are comparable
+        digest = hashlib.sha256()
+        volume = Decimal('0')
+        for buy_id, sell_id, quantity, price in trades:
+            digest.update(f"{seq_by_order[buy_id]},{seq_by_order[sell_id]},{quantity},{price};".encode())
+            volume += quantity
+        depth = matching_engine.depth_snapshot()
+
+        report = {
+            'mode': mode,
+            'orders': len(records),
+            'trades': len(trades),
+            'volume': float(volume),
+            'trade_digest': digest.hexdigest(),
+            'elapsed_s': elapsed,
+            'orders_per_sec': len(records) / elapsed if elapsed else 0,
+            'latency_ms': {
+                'mean': sum(latencies) / len(latencies) * 1000,
+                'p50': percentile(latencies, 50) * 1000,
+                'p90': percentile(latencies, 90) * 1000,
+                'p99': percentile(latencies, 99) * 1000,
+                'max': max(latencies) * 1000,
+            },
+            'resting': {
+                'bid_levels': len(depth['bids']),
+                'ask_levels': len(depth['asks']),
+            },
+        }
+        if trace_alloc:
+            report['allocation_bytes'] = {
+                'peak_mean': sum(allocations) / len(allocations),
+                'peak_p99': percentile(allocations, 99),
+                'retained_per_order': retained / len(records),
+            }
+        return report
+
+    def handle(self, *args, **options):
+        records = self._load_stream(options)
+        if not records:
+            raise CommandError('The order stream is empty')
+
+        # Replay inside a transaction that is rolled back, so existing orders,
+        # trades and candles are left untouched and runs are repeatable
+        report = None
+        try:
+            with transaction.atomic():
+                report = self._replay(records, options['mode'], options['trace_alloc'])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            matching_engine.reset()
+
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        latency = report['latency_ms']
+        self.stdout.write(
+            f"Replayed {report['orders']} orders ({report['mode']}): {report['trades']} trades, "
+            f"volume {report['volume']:.3f}, digest {report['trade_digest'][:16]}"
+        )
+        if 'allocation_bytes' in report:
+            alloc = report['allocation_bytes']
+            self.stdout.write(
+                f"Allocation per order: peak mean {alloc['peak_mean']:.0f} B, "
+                f"p99 {alloc['peak_p99']:.0f} B, retained {alloc['retained_per_order']:.0f} B"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['orders_per_sec']:,.0f} orders/sec  latency p50 {latency['p50']:.3f}ms  "
+            f"p90 {latency['p90']:.3f}ms  p99 {latency['p99']:.3f}ms  max {latency['max']:.3f}ms"
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+import time
+
+from api.auction_service import auction_service
+
+
+class Command(BaseCommand):
+    help = 'Clear pending call auctions for batches in auction matching mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep clearing on an interval instead of running once',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=5,
+            help='Seconds between auctions when running with --loop',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            results = auction_service.run()
+            for batch_id, result in results.items():
+                self.stdout.write(
+                    f'Batch {batch_id}: {result.volume} cleared at {result.price} ({len(result.pairs)} fills)'
+                )
+            self.stdout.write(self.style.SUCCESS(f'Cleared {len(results)} auctions'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,165 @@
+from decimal import Decimal
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from django.utils import timezone
+
+from api.models import Credit, HydrogenBatch, Transaction
+from api.chain_tx_service import chain_tx_service
+from api.credit_service import credit_service, CreditConflictError, InsufficientCreditError
+from api.management.commands.benchmark_queries import default_database, scratch_database
+from auth1.models import User1
+
+
+STRESS_EMAIL_DOMAIN = 'stress.h2ledger.local'
+
+
+class Command(BaseCommand):
+    help = ('Hammer one credit from many threads in a scratch database and check for double spends '
+            'and lost updates')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', required=True,
+                            help='Migrated scratch database alias to run against; never the default one')
+        parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64],
+                            help='Writer thread counts to run')
+        parser.add_argument('--mode', choices=['use', 'transfer', 'burn'], nargs='+',
+                            default=['use', 'transfer', 'burn'])
+        parser.add_argument('--ops', type=int, default=50, help='Operations attempted per writer')
+        parser.add_argument('--unit', type=Decimal, default=Decimal('1.000'),
+                            help='Amount consumed per use operation')
+        parser.add_argument('--retries', type=int, default=20,
+                            help='Retries on database lock errors before counting an error')
+        parser.add_argument('--json', action='store_true', help='Emit a machine-readable report')
+
+    def _setup(self, writers):
+        stamp = time.time_ns()
+        users = [
+            User1.objects.create(
+                wallet_address=f"0xstress{stamp % 10 ** 12:012d}{i:04d}",
+                name=f"Stress User {i}",
+                email=f"user{i}.{stamp}@{STRESS_EMAIL_DOMAIN}",
+                role='producer',
+                password='pbkdf2_sha256$stress',
+            ) for i in range(max(2, writers + 1))
+        ]
+        batch = HydrogenBatch.objects.create(
+            producer=users[0], quantity_kg=1000, production_date=timezone.now().date(), is_approved=True
+        )
+        return users, batch
+
+    def _cleanup(self):
+        User1.objects.filter(email__endswith=STRESS_EMAIL_DOMAIN).delete()
+
+    def _run(self, mode, writers, ops, unit, retries):
+        users, batch = self._setup(writers)
+        owner = users[0]
+        # Enough balance for about half the attempted uses, so insufficiency is exercised too
+        initial = unit * max(1, writers * ops // 2)
+        credit = Credit.objects.create(batch=batch, owner=owner, amount=initial)
+        counts = {'success': 0, 'conflict': 0, 'insufficient': 0, 'error': 0}
+        counts_lock = threading.Lock()
+        barrier = threading.Barrier(writers)
+
+        def operation(index):
+            if mode == 'use':
+                credit_service.use(owner, credit.credit_id, unit)
+            elif mode == 'transfer':
+                credit_service.transfer(credit.credit_id, users[index + 1], unit)
+            else:
+                if not credit_service.burn(owner, [credit.credit_id]):
+                    raise CreditConflictError("Credit already burned")
+
+        def writer(index):
+            try:
+                barrier.wait()
+                for _ in range(ops):
+                    outcome = 'error'
+                    for _ in range(retries + 1):
+                        try:
+                            operation(index)
+                            outcome = 'success'
+                        except CreditConflictError:
+                            outcome = 'conflict'
+                        except InsufficientCreditError:
+                            outcome = 'insufficient'
+                        except OperationalError:
+                            # SQLite reports writer contention as "database is locked"
+                            time.sleep(0.001)
+                            continue
+                        break
+                    with counts_lock:
+                        counts[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        credit.refresh_from_db()
+        txs = Transaction.objects.filter(credit=credit)
+        if mode == 'use':
+            correct = (
+                credit.amount == initial - unit * counts['success']
+                and credit.amount >= 0
+                and txs.count() == counts['success']
+            )
+        else:
+            # A whole credit can be transferred or burned exactly once
+            correct = counts['success'] == 1 and txs.count() == 1
+
+        attempted = writers * ops
+        report = {
+            'mode': mode,
+            'writers': writers,
+            'attempted': attempted,
+            **counts,
+            'elapsed_s': elapsed,
+            'ops_per_sec': attempted / elapsed if elapsed else 0,
+            'final_amount': float(credit.amount),
+            'final_status': credit.status,
+            'correct': correct,
+        }
+        self._cleanup()
+        return report
+
+    def handle(self, *args, **options):
+        alias = scratch_database(options['database'], 'stress')
+        # Stress transactions must never be mirrored on chain, even from a scratch queue
+        mirror_writes, chain_tx_service.mirror_writes = chain_tx_service.mirror_writes, False
+        try:
+            # credit_service commits on the default alias, so that is the one redirected
+            with default_database(alias):
+                self._cleanup()
+                reports = []
+                for mode in options['mode']:
+                    for writers in options['writers']:
+                        reports.append(self._run(
+                            mode, writers, options['ops'], options['unit'], options['retries']
+                        ))
+        finally:
+            chain_tx_service.mirror_writes = mirror_writes
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+        else:
+            self.stdout.write(f"{'mode':<9}{'writers':>8}{'ok':>7}{'conflict':>9}{'insuff':>8}"
+                              f"{'error':>7}{'ops/s':>10}  correct")
+            for r in reports:
+                self.stdout.write(
+                    f"{r['mode']:<9}{r['writers']:>8}{r['success']:>7}{r['conflict']:>9}"
+                    f"{r['insufficient']:>8}{r['error']:>7}{r['ops_per_sec']:>10.0f}  {r['correct']}"
+                )
+
+        if all(r['correct'] for r in reports):
+            self.stdout.write(self.style.SUCCESS('No double spends or lost updates detected'))
+        else:
+            self.stdout.write(self.style.ERROR('Correctness violations detected'))
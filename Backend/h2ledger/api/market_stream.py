@@ -0,0 +1,141 @@
+"""
+Market data streaming for H2Ledger
+In-process publish/subscribe hub behind the Server-Sent Events endpoint
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+TRADES_TOPIC = 'trades'
+TICKS_TOPIC = 'ticks'
+
+
+def user_topic(user_id):
+    return f"user:{user_id}"
+
+
+def format_sse(event_id, event, data):
+    """Encode one Server-Sent Events message"""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Subscription:
+    """
+    A single stream consumer. Messages are queued on the subscriber's own
+    event loop; when a slow consumer falls behind the oldest message is dropped.
+    """
+    __slots__ = ('topics', 'queue', 'loop', 'dropped')
+
+    def __init__(self, topics, loop, queue_size):
+        self.topics = frozenset(topics)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class MarketStream:
+    """
+    Fans published events out to subscribers.
+
+    Publishing is thread-safe and cheap for idle topics: a message is
+    encoded once and handed to each subscriber event loop with a single
+    call_soon_threadsafe, which then delivers it to every local queue.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._topics = defaultdict(set)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, topics):
+        """Register a subscriber on the running event loop"""
+        subscription = Subscription(topics, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def has_subscribers(self, topic):
+        return topic in self._topics
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(set().union(*self._topics.values())) if self._topics else 0
+
+    def publish(self, topic, event, data):
+        """Broadcast an event to every subscriber of a topic; returns the event id"""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        if not subscribers:
+            return None
+
+        event_id = next(self._ids)
+        message = format_sse(event_id, event, data)
+
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(self._deliver, group, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                for subscription in group:
+                    self.unsubscribe(subscription)
+        return event_id
+
+    @staticmethod
+    def _deliver(group, message):
+        for subscription in group:
+            subscription.put(message)
+
+    def publish_trades(self, trades):
+        """Broadcast executed trades and the resulting last-price tick"""
+        if not trades:
+            return
+        if self.has_subscribers(TRADES_TOPIC):
+            for trade in trades:
+                self.publish(TRADES_TOPIC, 'trade', {
+                    'sequence': trade.sequence,
+                    'price': float(trade.price),
+                    'quantity': float(trade.quantity),
+                    'executed_at': trade.executed_at.isoformat(),
+                })
+        last = trades[-1]
+        self.publish(TICKS_TOPIC, 'tick', {
+            'price': float(last.price),
+            'sequence': last.sequence,
+            'executed_at': last.executed_at.isoformat(),
+        })
+
+
+# Global market stream instance
+market_stream = MarketStream()
@@ -0,0 +1,612 @@
+"""
+Matching engine for H2Ledger
+Keeps open trading orders in a resident price-time-priority order book
+"""
+
+import threading
+from bisect import bisect_right, insort
+from collections import deque, namedtuple
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import HydrogenBatch, Trade, TradingOrder
+from .market_stream import market_stream
+from .candle_service import candle_service
+from .change_feed import change_feed
+from .dashboard_cache import dashboard_cache
+
+
+OPEN_STATUSES = ('pending', 'partial')
+
+# Attempts at numbering a match cycle's trades before a sequence clash is raised
+SEQUENCE_ATTEMPTS = 5
+
+# A single execution against a resting (maker) order
+Fill = namedtuple('Fill', ['maker', 'quantity', 'price'])
+
+# New aggregate quantity of one price level; quantity 0 means the level is gone
+DepthChange = namedtuple('DepthChange', ['sequence', 'side', 'price', 'quantity'])
+
+# Outcome of a call auction: the uniform price, matched volume and (buy, sell, quantity) pairs
+AuctionResult = namedtuple('AuctionResult', ['price', 'volume', 'pairs'])
+
+
+class StaleOrderBook(Exception):
+    """A resting order changed in the database behind the in-memory book"""
+
+
+class BookOrder:
+    """
+    Lightweight in-memory representation of an open trading order
+    """
+    __slots__ = ('order_id', 'user_id', 'side', 'price', 'quantity', 'filled', 'expires_at')
+
+    def __init__(self, order_id, user_id, side, price, quantity, filled=Decimal('0'), expires_at=None):
+        self.order_id = order_id
+        self.user_id = user_id
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.filled = filled
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_model(cls, order):
+        return cls(
+            order.id,
+            order.user_id,
+            order.order_type,
+            Decimal(order.price_per_credit),
+            Decimal(order.quantity),
+            Decimal(order.filled_quantity or 0),
+            order.expires_at,
+        )
+
+    def expired(self, as_of):
+        return self.expires_at is not None and self.expires_at <= as_of
+
+    @property
+    def remaining(self):
+        return self.quantity - self.filled
+
+    @property
+    def status(self):
+        if self.filled >= self.quantity:
+            return 'completed'
+        return 'partial' if self.filled > 0 else 'pending'
+
+
+class PriceLevel:
+    """
+    FIFO queue of orders resting at one price, with its aggregate quantity
+    """
+    __slots__ = ('price', 'orders', 'quantity')
+
+    def __init__(self, price):
+        self.price = price
+        self.orders = deque()
+        self.quantity = Decimal('0')
+
+
+class OrderBook:
+    """
+    Two-sided order book with price-time priority.
+
+    Each side keeps a dict of price -> PriceLevel plus a sorted list of
+    level keys whose last element is always the best price, so the best
+    level is found in O(1) and a new level is placed by binary search.
+
+    Every change to a level's aggregate quantity bumps `sequence` and is
+    kept in a bounded history so depth consumers can catch up incrementally.
+    """
+
+    def __init__(self, sequence=0, history=10000):
+        self._levels = {'buy': {}, 'sell': {}}
+        self._keys = {'buy': [], 'sell': []}
+        self._orders = {}
+        self.sequence = sequence
+        self.base_sequence = sequence
+        self._changes = deque(maxlen=history)
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __contains__(self, order_id):
+        return order_id in self._orders
+
+    @staticmethod
+    def _key(side, price):
+        # Bids sort ascending and asks descending so the best price is last
+        return price if side == 'buy' else -price
+
+    def best_price(self, side):
+        """Best resting price on a side, or None if the side is empty"""
+        keys = self._keys[side]
+        if not keys:
+            return None
+        return self._key(side, keys[-1])
+
+    def get(self, order_id):
+        return self._orders.get(order_id)
+
+    def _touch(self, side, price, quantity):
+        self.sequence += 1
+        self._changes.append(DepthChange(self.sequence, side, price, max(quantity, Decimal('0'))))
+
+    def mark_snapshot(self):
+        """Forget change history; consumers older than this must resnapshot"""
+        self._changes.clear()
+        self.base_sequence = self.sequence
+
+    def depth(self, side, limit=None):
+        """Aggregated (price, quantity) levels for a side, best price first"""
+        levels = self._levels[side]
+        keys = self._keys[side]
+        selected = keys[::-1] if limit is None else keys[:-limit - 1:-1]
+        return [(self._key(side, key), levels[self._key(side, key)].quantity) for key in selected]
+
+    def changes_since(self, since):
+        """
+        Level changes with a sequence greater than `since`, oldest first.
+        Returns None when that history is no longer available.
+        """
+        if since < self.base_sequence or since > self.sequence:
+            return None
+        if self._changes and since < self._changes[0].sequence - 1:
+            return None
+
+        changes = []
+        for change in reversed(self._changes):
+            if change.sequence <= since:
+                break
+            changes.append(change)
+        changes.reverse()
+        return changes
+
+    def add(self, order):
+        """Rest an order at the back of its price level"""
+        levels = self._levels[order.side]
+        level = levels.get(order.price)
+        if level is None:
+            level = levels[order.price] = PriceLevel(order.price)
+            insort(self._keys[order.side], self._key(order.side, order.price))
+        level.orders.append(order)
+        level.quantity += order.remaining
+        self._orders[order.order_id] = order
+        self._touch(order.side, order.price, level.quantity)
+
+    def cancel(self, order_id):
+        """
+        Remove an order from the book, including its entry in the level
+        queue, so a later add() of the same order_id cannot leave a second,
+        stale entry behind it.
+        """
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return None
+        level = self._levels[order.side].get(order.price)
+        if level is not None:
+            try:
+                level.orders.remove(order)
+            except ValueError:
+                pass
+            level.quantity -= order.remaining
+            if level.quantity <= 0:
+                self._remove_level(order.side, order.price)
+            self._touch(order.side, order.price, level.quantity)
+        return order
+
+    def _remove_level(self, side, price):
+        del self._levels[side][price]
+        keys = self._keys[side]
+        key = self._key(side, price)
+        if keys and keys[-1] == key:
+            keys.pop()
+        else:
+            keys.remove(key)
+
+    def _crosses(self, taker, price):
+        if taker.side == 'buy':
+            return price <= taker.price
+        return price >= taker.price
+
+    def match(self, taker, as_of=None, expired=None):
+        """
+        Match an incoming order against the opposite side of the book.
+        Fills are applied to both taker and makers; the taker is not rested.
+        Makers that expired at or before `as_of` are dropped from the book
+        instead of filled, and appended to `expired` when it is given.
+        """
+        fills = []
+        side = 'sell' if taker.side == 'buy' else 'buy'
+        levels = self._levels[side]
+
+        while taker.remaining > 0:
+            price = self.best_price(side)
+            if price is None or not self._crosses(taker, price):
+                break
+
+            level = levels[price]
+            while taker.remaining > 0 and level.orders:
+                maker = level.orders[0]
+                if self._orders.get(maker.order_id) is not maker or maker.remaining <= 0:
+                    # Not the live entry for its order, or already filled
+                    level.orders.popleft()
+                    continue
+                if as_of is not None and maker.expired(as_of):
+                    # Past its expiry but not swept yet
+                    level.orders.popleft()
+                    del self._orders[maker.order_id]
+                    level.quantity -= maker.remaining
+                    if expired is not None:
+                        expired.append(maker)
+                    continue
+
+                quantity = min(taker.remaining, maker.remaining)
+                taker.filled += quantity
+                maker.filled += quantity
+                level.quantity -= quantity
+                fills.append(Fill(maker, quantity, price))
+
+                if maker.remaining <= 0:
+                    level.orders.popleft()
+                    del self._orders[maker.order_id]
+
+            if level.quantity <= 0 or not level.orders:
+                self._remove_level(side, price)
+                self._touch(side, price, Decimal('0'))
+            else:
+                self._touch(side, price, level.quantity)
+
+        return fills
+
+
+def clear_call_auction(orders, reference_price=None):
+    """
+    Clear a set of BookOrders at the single price that maximizes matched
+    volume. Ties are broken by the smallest demand/supply imbalance, then
+    by distance to `reference_price` (or the middle of the tied prices).
+    Within each side orders fill by price, then by the order given (time).
+    Returns None when the book does not cross.
+    """
+    buys = sorted((o for o in orders if o.side == 'buy' and o.remaining > 0), key=lambda o: -o.price)
+    sells = sorted((o for o in orders if o.side == 'sell' and o.remaining > 0), key=lambda o: o.price)
+    if not buys or not sells or buys[0].price < sells[0].price:
+        return None
+
+    # Cumulative demand (bids at or above p) and supply (asks at or below p)
+    neg_bid_prices = [-o.price for o in buys]
+    ask_prices = [o.price for o in sells]
+    demand, supply = [Decimal('0')], [Decimal('0')]
+    for o in buys:
+        demand.append(demand[-1] + o.remaining)
+    for o in sells:
+        supply.append(supply[-1] + o.remaining)
+
+    candidates = sorted({o.price for o in buys + sells if sells[0].price <= o.price <= buys[0].price})
+    best_key, tied = None, []
+    for price in candidates:
+        bid = demand[bisect_right(neg_bid_prices, -price)]
+        ask = supply[bisect_right(ask_prices, price)]
+        key = (min(bid, ask), -abs(bid - ask))
+        if best_key is None or key > best_key:
+            best_key, tied = key, [price]
+        elif key == best_key:
+            tied.append(price)
+
+    if reference_price is not None:
+        price = min(tied, key=lambda p: (abs(p - reference_price), p))
+    else:
+        price = tied[len(tied) // 2]
+    volume = best_key[0]
+
+    pairs = []
+    bi = si = 0
+    left = volume
+    while left > 0:
+        buy, sell = buys[bi], sells[si]
+        quantity = min(buy.remaining, sell.remaining, left)
+        buy.filled += quantity
+        sell.filled += quantity
+        left -= quantity
+        pairs.append((buy, sell, quantity))
+        if buy.remaining == 0:
+            bi += 1
+        if sell.remaining == 0:
+            si += 1
+    return AuctionResult(price, volume, pairs)
+
+
+class MatchingEngine:
+    """
+    Resident matching engine backed by the TradingOrder table.
+
+    Open orders are loaded once on first use; afterwards each submitted
+    order is matched in memory and the resulting fills are persisted with
+    a single bulk write per match cycle.
+
+    Trade sequences are numbered from the database inside the write
+    transaction, not from a counter in this process, so several worker
+    processes can each run an engine without handing out the same one.
+    """
+
+    def __init__(self):
+        self.book = None
+        self._depth_sequence = 0
+        self._lock = threading.RLock()
+
+    @property
+    def last_sequence(self):
+        """Sequence of the newest recorded trade"""
+        return Trade.objects.aggregate(last=Max('sequence'))['last'] or 0
+
+    def _record_trades(self, trades):
+        """
+        Number and insert a match cycle's trades inside the caller's
+        transaction. A concurrent writer that takes the same sequences
+        first makes the insert fail on the unique constraint; the trades
+        are then renumbered after its rows and inserted again.
+        """
+        for attempt in range(SEQUENCE_ATTEMPTS):
+            sequence = self.last_sequence
+            for trade in trades:
+                sequence += 1
+                trade.sequence = sequence
+            try:
+                with transaction.atomic():
+                    Trade.objects.bulk_create(trades, batch_size=500)
+                return
+            except IntegrityError:
+                if attempt == SEQUENCE_ATTEMPTS - 1:
+                    raise
+
+    def load(self):
+        """(Re)build the book from open orders in the database"""
+        with self._lock:
+            if self.book is not None:
+                self._depth_sequence = self.book.sequence
+            book = OrderBook(sequence=self._depth_sequence)
+            # Orders for auction-mode batches wait for the next clearing instead,
+            # and expired ones are never loaded even when no sweeper runs
+            open_orders = TradingOrder.objects.filter(
+                status__in=OPEN_STATUSES
+            ).exclude(
+                credit_batch__matching_mode='auction'
+            ).exclude(
+                expires_at__lte=timezone.now()
+            ).order_by('created_at', 'id').values_list(
+                'id', 'user_id', 'order_type', 'price_per_credit',
+                'quantity', 'filled_quantity', 'expires_at'
+            )
+            for order_id, user_id, side, price, quantity, filled, expires_at in open_orders.iterator():
+                entry = BookOrder(order_id, user_id, side, price, quantity, filled or Decimal('0'), expires_at)
+                if entry.remaining > 0:
+                    book.add(entry)
+            book.mark_snapshot()
+            self.book = book
+            return book
+
+    def reset(self):
+        """Drop the resident book; it is reloaded on next use"""
+        with self._lock:
+            self._discard_book()
+
+    def _discard_book(self):
+        if self.book is not None:
+            # Depth sequence stays monotonic across reloads
+            self._depth_sequence = self.book.sequence
+        self.book = None
+
+    def _get_book(self):
+        if self.book is None:
+            self.load()
+        return self.book
+
+    def submit(self, order):
+        """
+        Match a freshly saved TradingOrder against the book, persist the
+        fills and rest any remainder. The order instance is updated in place.
+        """
+        if order.credit_batch_id and HydrogenBatch.objects.filter(
+            batch_id=order.credit_batch_id, matching_mode='auction'
+        ).exists():
+            # Collected for the batch's next call auction
+            return []
+
+        expired = []
+        with self._lock:
+            for attempt in range(2):
+                book = self._get_book()
+                # A lazy first load may already have picked up the saved order
+                book.cancel(order.id)
+                taker = BookOrder.from_model(order)
+                fills = book.match(taker, timezone.now(), expired)
+
+                try:
+                    trades = self._persist(order, taker, fills) if fills else []
+                    break
+                except StaleOrderBook:
+                    # Another writer touched a maker; reload and match once more
+                    self._discard_book()
+                    if attempt:
+                        raise
+                except Exception:
+                    # The book already reflects the fills; rebuild it from the DB
+                    self._discard_book()
+                    raise
+
+            if taker.remaining > 0 and order.status in OPEN_STATUSES:
+                book.add(taker)
+
+        if expired:
+            self._cancel_expired(expired)
+        self._publish(trades)
+        return fills
+
+    @staticmethod
+    def _cancel_expired(orders):
+        # Cancel makers dropped for expiry, as the sweeper would have; the
+        # status check leaves alone any that another writer settled meanwhile
+        TradingOrder.objects.filter(
+            id__in=[o.order_id for o in orders], status__in=OPEN_STATUSES
+        ).update(status='cancelled')
+        dashboard_cache.invalidate_users({o.user_id for o in orders})
+
+    def depth_snapshot(self, limit=None):
+        """Aggregated L2 depth for both sides with the book sequence"""
+        with self._lock:
+            book = self._get_book()
+            return {
+                'sequence': book.sequence,
+                'bids': book.depth('buy', limit),
+                'asks': book.depth('sell', limit),
+            }
+
+    def depth_changes(self, since):
+        """
+        Level changes after `since` with the current sequence, or None when
+        the caller has to fall back to a full snapshot.
+        """
+        with self._lock:
+            book = self._get_book()
+            changes = book.changes_since(since)
+            if changes is None:
+                return None
+            return {'sequence': book.sequence, 'changes': changes}
+
+    def cancel(self, order_id):
+        """Remove an order from the resident book, if it is loaded"""
+        with self._lock:
+            if self.book is not None:
+                return self.book.cancel(order_id)
+            return None
+
+    def clear_auction(self, batch_id):
+        """
+        Run one call auction over the open orders of a batch: every crossing
+        order fills at a single uniform price and all fills are written in
+        one transaction with bulk statements. Returns the AuctionResult or None.
+        """
+        with self._lock:
+            reference = Trade.objects.order_by('-sequence').values_list('price', flat=True).first()
+
+            with transaction.atomic():
+                rows = TradingOrder.objects.select_for_update().filter(
+                    credit_batch_id=batch_id,
+                    status__in=OPEN_STATUSES
+                ).exclude(
+                    expires_at__lte=timezone.now()
+                ).order_by('created_at', 'id').values_list(
+                    'id', 'user_id', 'order_type', 'price_per_credit', 'quantity', 'filled_quantity'
+                )
+                orders = [
+                    BookOrder(order_id, user_id, side, price, quantity, filled or Decimal('0'))
+                    for order_id, user_id, side, price, quantity, filled in rows
+                ]
+                result = clear_call_auction(orders, reference)
+                if result is None:
+                    return None
+
+                executed_at = timezone.now()
+                trades, touched = [], {}
+                for buy, sell, quantity in result.pairs:
+                    touched[buy.order_id] = buy
+                    touched[sell.order_id] = sell
+                    trades.append(Trade(
+                        buy_order_id=buy.order_id,
+                        sell_order_id=sell.order_id,
+                        buyer_id=buy.user_id,
+                        seller_id=sell.user_id,
+                        quantity=quantity,
+                        price=result.price,
+                        executed_at=executed_at,
+                    ))
+
+                TradingOrder.objects.bulk_update(
+                    [TradingOrder(id=o.order_id, filled_quantity=o.filled, status=o.status)
+                     for o in touched.values()],
+                    ['filled_quantity', 'status'],
+                    batch_size=500,
+                )
+                self._record_trades(trades)
+                candle_service.record_trades(trades)
+                change_feed.record_trades(trades)
+                self._invalidate_dashboards(trades)
+
+        self._publish(trades)
+        return result
+
+    @staticmethod
+    def _publish(trades):
+        # Subscribers only hear of trades that commit; a caller's rolled-back
+        # transaction (replay_orders, a failed request) never reaches them
+        if trades:
+            transaction.on_commit(lambda: market_stream.publish_trades(trades))
+
+    @staticmethod
+    def _invalidate_dashboards(trades):
+        # Fills are bulk writes, so no post_save signal reaches the dashboard cache
+        users = set()
+        for trade in trades:
+            users.add(trade.buyer_id)
+            users.add(trade.seller_id)
+        dashboard_cache.invalidate_users(users)
+        dashboard_cache.invalidate_market()
+
+    def _persist(self, order, taker, fills):
+        # Each maker row is updated only if it still holds the filled quantity
+        # the book matched against (an optimistic version check), so a
+        # cancel, expiry or second engine cannot be overwritten silently.
+        makers = {}
+        for fill in fills:
+            maker = fill.maker
+            entry = makers.setdefault(maker.order_id, [maker, maker.filled])
+            entry[1] -= fill.quantity
+
+        executed_at = timezone.now()
+        trades = []
+        for fill in fills:
+            maker = fill.maker
+            if taker.side == 'buy':
+                buy, sell = taker, maker
+            else:
+                buy, sell = maker, taker
+            trades.append(Trade(
+                buy_order_id=buy.order_id,
+                sell_order_id=sell.order_id,
+                buyer_id=buy.user_id,
+                seller_id=sell.user_id,
+                quantity=fill.quantity,
+                price=fill.price,
+                executed_at=executed_at,
+            ))
+
+        with transaction.atomic():
+            for maker, expected in makers.values():
+                updated = TradingOrder.objects.filter(
+                    id=maker.order_id,
+                    filled_quantity=expected,
+                    status__in=OPEN_STATUSES,
+                ).update(filled_quantity=maker.filled, status=maker.status)
+                if not updated:
+                    raise StaleOrderBook(f"Order {maker.order_id} changed during matching")
+            updated = TradingOrder.objects.filter(
+                id=order.id, status__in=OPEN_STATUSES
+            ).update(filled_quantity=taker.filled, status=taker.status)
+            if not updated:
+                raise StaleOrderBook(f"Order {order.id} changed during matching")
+            self._record_trades(trades)
+            candle_service.record_trades(trades)
+            change_feed.record_trades(trades)
+            self._invalidate_dashboards(trades)
+
+        order.filled_quantity = taker.filled
+        order.status = taker.status
+        return trades
+
+
+# Global matching engine instance
+matching_engine = MatchingEngine()
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        ('auth1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_per_credit', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('volume_24h', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EmissionsData',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('credits_burned', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('co2_offset_kg', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='emissions_data', to='auth1.user1')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TradingOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_type', models.CharField(choices=[('buy', 'Buy'), ('sell', 'Sell')], max_length=10)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('price_per_credit', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('filled_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('partial', 'Partial'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('credit_batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.hydrogenbatch')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trading_orders', to='auth1.user1')),
+            ],
+        ),
+    ]
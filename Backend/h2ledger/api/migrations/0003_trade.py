@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_marketprice_emissionsdata_tradingorder'),
+        ('auth1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.BigIntegerField(unique=True)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('executed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('buy_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buy_trades', to='api.tradingorder')),
+                ('buyer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trades_bought', to='auth1.user1')),
+                ('sell_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sell_trades', to='api.tradingorder')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trades_sold', to='auth1.user1')),
+            ],
+            options={
+                'ordering': ['sequence'],
+                'indexes': [models.Index(fields=['executed_at'], name='trade_executed_at_idx'), models.Index(fields=['buyer', 'executed_at'], name='trade_buyer_time_idx'), models.Index(fields=['seller', 'executed_at'], name='trade_seller_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_trade'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tradingorder',
+            index=models.Index(fields=['status', 'expires_at'], name='order_status_expiry_idx'),
+        ),
+    ]
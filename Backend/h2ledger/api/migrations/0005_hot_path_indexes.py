@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_tradingorder_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='credit',
+            index=models.Index(fields=['owner', 'status'], name='credit_owner_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emissionsdata',
+            index=models.Index(fields=['user', 'timestamp'], name='emissions_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tradingorder',
+            index=models.Index(fields=['order_type', 'status', 'price_per_credit', 'created_at'], name='order_match_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tradingorder',
+            index=models.Index(fields=['user', 'status'], name='order_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['tx_type', 'timestamp'], name='tx_type_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['from_user', 'tx_type', 'timestamp'], name='tx_from_user_type_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['to_user', 'tx_type', 'timestamp'], name='tx_to_user_type_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['tx_type', 'from_user', 'amount'], name='tx_type_user_amount_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Candle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=2)),
+                ('bucket_start', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('volume', models.DecimalField(decimal_places=3, default=0, max_digits=18)),
+                ('notional', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('trade_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['resolution', 'bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'bucket_start'), name='candle_resolution_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_candle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hydrogenbatch',
+            name='matching_mode',
+            field=models.CharField(choices=[('continuous', 'Continuous'), ('auction', 'Call auction')], default='continuous', max_length=20),
+        ),
+    ]
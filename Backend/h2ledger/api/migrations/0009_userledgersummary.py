@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_transaction_from_to_user_index'),
+        ('auth1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserLedgerSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_summary', serialize=False, to='auth1.user1')),
+                ('credits_owned', models.DecimalField(decimal_places=3, default=0, max_digits=18)),
+                ('credits_burned', models.DecimalField(decimal_places=3, default=0, max_digits=18)),
+                ('batches_produced', models.PositiveIntegerField(default=0)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('emissions_offset_kg', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
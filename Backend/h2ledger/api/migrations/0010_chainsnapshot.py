@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_userledgersummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contract_address', models.CharField(max_length=42, unique=True)),
+                ('block_number', models.BigIntegerField()),
+                ('market_price', models.DecimalField(blank=True, decimal_places=18, max_digits=36, null=True)),
+                ('total_supply', models.DecimalField(decimal_places=18, max_digits=36)),
+                ('balances', models.JSONField(blank=True, default=dict)),
+                ('synced_at', models.DateTimeField()),
+                ('last_error', models.TextField(blank=True)),
+                ('last_attempt_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_chainsnapshot'),
+        ('auth1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmissionsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('credits_burned', models.DecimalField(decimal_places=3, default=0, max_digits=18)),
+                ('co2_offset_kg', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='emissions_rollups', to='auth1.user1')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_start'], name='emissions_rollup_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'period', 'period_start'), name='emissions_rollup_uniq')],
+            },
+        ),
+    ]
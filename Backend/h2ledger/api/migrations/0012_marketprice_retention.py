@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_emissionsrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketPriceBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField(unique=True)),
+                ('bucket_seconds', models.PositiveIntegerField()),
+                ('last', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('mean', models.DecimalField(decimal_places=6, max_digits=14)),
+                ('volume', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('last_timestamp', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='marketprice',
+            index=models.Index(fields=['timestamp'], name='marketprice_time_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_marketprice_retention'),
+        ('auth1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('mint', 'Mint'), ('transfer', 'Transfer'), ('burn', 'Burn'), ('purchase', 'Purchase'), ('fill', 'Order fill')], max_length=20)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_changes', to='auth1.user1')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['user', 'id'], name='ledger_change_user_idx')],
+            },
+        ),
+    ]
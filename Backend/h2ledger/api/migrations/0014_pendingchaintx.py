@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_ledgerchange'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ledgerchange',
+            name='kind',
+            field=models.CharField(choices=[('mint', 'Mint'), ('transfer', 'Transfer'), ('burn', 'Burn'), ('purchase', 'Purchase'), ('fill', 'Order fill'), ('chain', 'Chain confirmation')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='PendingChainTx',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('mint', 'Mint'), ('transfer', 'Transfer'), ('burn', 'Burn')], max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('submitting', 'Submitting'), ('submitted', 'Submitted'), ('confirmed', 'Confirmed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('nonce', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('gas_price', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('tx_hash', models.CharField(blank=True, max_length=66, null=True, unique=True)),
+                ('replaced_hashes', models.JSONField(default=list)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('block_number', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ledger_tx', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='chain_tx', to='api.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='chain_tx_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_pendingchaintx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contract_address', models.CharField(max_length=42, unique=True)),
+                ('block_number', models.BigIntegerField()),
+                ('block_hash', models.CharField(max_length=66)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChainEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_number', models.BigIntegerField()),
+                ('block_hash', models.CharField(max_length=66)),
+                ('tx_hash', models.CharField(db_index=True, max_length=66)),
+                ('log_index', models.PositiveIntegerField()),
+                ('event', models.CharField(choices=[('mint', 'Mint'), ('transfer', 'Transfer'), ('burn', 'Burn')], max_length=20)),
+                ('from_address', models.CharField(blank=True, max_length=42)),
+                ('to_address', models.CharField(blank=True, max_length=42)),
+                ('amount', models.DecimalField(decimal_places=18, max_digits=36)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['block_number', 'log_index'], name='chain_event_block_idx'), models.Index(fields=['from_address', 'block_number'], name='chain_event_from_idx'), models.Index(fields=['to_address', 'block_number'], name='chain_event_to_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tx_hash', 'log_index'), name='chain_event_log_unique')],
+            },
+        ),
+    ]
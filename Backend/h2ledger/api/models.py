@@ -12,10 +12,32 @@ class MarketPrice(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Latest-price lookups and the oldest-first compaction scan
+            models.Index(fields=['timestamp'], name='marketprice_time_idx'),
+        ]
     
     def __str__(self):
         return f"${self.price_per_credit} at {self.timestamp}"
 
+class MarketPriceBucket(models.Model):
+    """Downsampled MarketPrice history older than the full-resolution window"""
+    bucket_start = models.DateTimeField(unique=True)
+    bucket_seconds = models.PositiveIntegerField()
+    last = models.DecimalField(max_digits=10, decimal_places=2)
+    min = models.DecimalField(max_digits=10, decimal_places=2)
+    max = models.DecimalField(max_digits=10, decimal_places=2)
+    mean = models.DecimalField(max_digits=14, decimal_places=6)
+    volume = models.DecimalField(max_digits=15, decimal_places=3, default=0)  # volume_24h of the last sample
+    sample_count = models.PositiveIntegerField(default=0)
+    last_timestamp = models.DateTimeField()  # when `last` was recorded
+
+    class Meta:
+        ordering = ['bucket_start']
+
+    def __str__(self):
+        return f"{self.bucket_start}: last ${self.last} ({self.sample_count} samples)"
+
 class EmissionsData(models.Model):
     """Track emissions offset data"""
     user = models.ForeignKey(User1, on_delete=models.CASCADE, related_name="emissions_data")
@@ -23,9 +45,43 @@ class EmissionsData(models.Model):
     co2_offset_kg = models.DecimalField(max_digits=12, decimal_places=2)
     timestamp = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='emissions_user_time_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.name} - {self.co2_offset_kg}kg CO2 offset"
 
+class EmissionsRollup(models.Model):
+    """
+    Per-user emissions totals for one day or month, maintained with each
+    EmissionsData row (see emissions_rollup_service)
+    """
+    PERIOD_CHOICES = (
+        ('day', 'Day'),
+        ('month', 'Month'),
+    )
+
+    user = models.ForeignKey(User1, on_delete=models.CASCADE, related_name="emissions_rollups")
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()  # UTC day, or first day of the month
+    credits_burned = models.DecimalField(max_digits=18, decimal_places=3, default=0)
+    co2_offset_kg = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    entry_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'period', 'period_start'], name='emissions_rollup_uniq'),
+        ]
+        indexes = [
+            # Cross-user totals for a range of periods
+            models.Index(fields=['period', 'period_start'], name='emissions_rollup_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.period} {self.period_start}: {self.co2_offset_kg}kg CO2 offset"
+
 class TradingOrder(models.Model):
     """Trading orders for credits"""
     ORDER_TYPES = (
@@ -50,10 +106,83 @@ class TradingOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='order_status_expiry_idx'),
+            models.Index(
+                fields=['order_type', 'status', 'price_per_credit', 'created_at'],
+                name='order_match_idx'
+            ),
+            models.Index(fields=['user', 'status'], name='order_user_status_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.order_type.upper()} {self.quantity} credits @ ${self.price_per_credit}"
 
+class Trade(models.Model):
+    """Append-only ledger of fills produced by the matching engine"""
+    sequence = models.BigIntegerField(unique=True)
+    buy_order = models.ForeignKey(TradingOrder, on_delete=models.CASCADE, related_name="buy_trades")
+    sell_order = models.ForeignKey(TradingOrder, on_delete=models.CASCADE, related_name="sell_trades")
+    buyer = models.ForeignKey(User1, on_delete=models.CASCADE, related_name="trades_bought")
+    seller = models.ForeignKey(User1, on_delete=models.CASCADE, related_name="trades_sold")
+    quantity = models.DecimalField(max_digits=12, decimal_places=3)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    executed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['sequence']
+        indexes = [
+            models.Index(fields=['executed_at'], name='trade_executed_at_idx'),
+            models.Index(fields=['buyer', 'executed_at'], name='trade_buyer_time_idx'),
+            models.Index(fields=['seller', 'executed_at'], name='trade_seller_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Trades are append-only and cannot be modified")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Trade #{self.sequence}: {self.quantity} credits @ ${self.price}"
+
+class Candle(models.Model):
+    """OHLCV price candles maintained from recorded trades"""
+    RESOLUTION_CHOICES = (
+        ('1m', '1 minute'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    )
+
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    volume = models.DecimalField(max_digits=18, decimal_places=3, default=0)
+    notional = models.DecimalField(max_digits=20, decimal_places=2, default=0)  # sum of price * quantity
+    trade_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['resolution', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['resolution', 'bucket_start'], name='candle_resolution_bucket_uniq'),
+        ]
+
+    @property
+    def vwap(self):
+        return self.notional / self.volume if self.volume else self.close
+
+    def __str__(self):
+        return f"{self.resolution} candle {self.bucket_start}: O{self.open} H{self.high} L{self.low} C{self.close}"
+
 class HydrogenBatch(models.Model):
+    MATCHING_MODES = (
+        ("continuous", "Continuous"),
+        ("auction", "Call auction"),
+    )
+
     batch_id = models.AutoField(primary_key=True)
     producer = models.ForeignKey(
         User1,
@@ -64,6 +193,8 @@ class HydrogenBatch(models.Model):
     production_date = models.DateField()
     certification = models.TextField(blank=True, null=True)  
     is_approved = models.BooleanField(default=False) 
+    # Orders for an auction-mode batch are collected and cleared periodically at one price
+    matching_mode = models.CharField(max_length=20, choices=MATCHING_MODES, default="continuous")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -93,6 +224,11 @@ class Credit(models.Model):
     tx_hash = models.CharField(max_length=100, unique=True, blank=True, null=True)  # blockchain reference
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'status'], name='credit_owner_status_idx'),
+        ]
+
     def __str__(self):
         return f"Credit {self.credit_id} - Owner: {self.owner.name}, Status: {self.status}"
     
@@ -115,7 +251,8 @@ class Transaction(models.Model):
         User1,
         on_delete=models.CASCADE,
         related_name="transactions_sent",
-        null=True, blank=True
+        null=True, blank=True,
+        db_index=False  # Leading column of tx_from_to_user_idx
     )
     to_user = models.ForeignKey(
         User1,
@@ -129,6 +266,17 @@ class Transaction(models.Model):
     tx_hash = models.CharField(max_length=100, unique=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['tx_type', 'timestamp'], name='tx_type_time_idx'),
+            models.Index(fields=['from_user', 'tx_type', 'timestamp'], name='tx_from_user_type_time_idx'),
+            models.Index(fields=['to_user', 'tx_type', 'timestamp'], name='tx_to_user_type_time_idx'),
+            # Index-only sent counts, and self-transfers with a single seek
+            models.Index(fields=['from_user', 'to_user'], name='tx_from_to_user_idx'),
+            # Covers the leaderboard's burn totals per user
+            models.Index(fields=['tx_type', 'from_user', 'amount'], name='tx_type_user_amount_idx'),
+        ]
+
     def __str__(self):
         return f"Tx {self.tx_id} | {self.tx_type} | Credit {self.credit.credit_id}"
     
@@ -158,4 +306,171 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Payment {self.payment_id} - {self.buyer.name} ({self.amount_usd} USD)"
\ No newline at end of file
+        return f"Payment {self.payment_id} - {self.buyer.name} ({self.amount_usd} USD)"
+
+class UserLedgerSummary(models.Model):
+    """
+    Running per-user totals, updated in the same DB transaction as the
+    ledger rows they summarize (see ledger_summary_service)
+    """
+    user = models.OneToOneField(
+        User1,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="ledger_summary"
+    )
+    credits_owned = models.DecimalField(max_digits=18, decimal_places=3, default=0)  # active credits
+    credits_burned = models.DecimalField(max_digits=18, decimal_places=3, default=0)
+    batches_produced = models.PositiveIntegerField(default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+    emissions_offset_kg = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Ledger summary for {self.user_id}: {self.credits_owned} credits"
+
+
+class ChainSnapshot(models.Model):
+    """
+    Last on-chain state read by the background refresher (see
+    chain_snapshot_service), so request paths never wait on the node
+    """
+    contract_address = models.CharField(max_length=42, unique=True)
+    block_number = models.BigIntegerField()
+    market_price = models.DecimalField(max_digits=36, decimal_places=18, null=True, blank=True)
+    total_supply = models.DecimalField(max_digits=36, decimal_places=18)
+    balances = models.JSONField(default=dict, blank=True)  # watched address -> balance, as strings
+    synced_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)  # most recent failed refresh, cleared on success
+    last_attempt_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.contract_address} at block {self.block_number}"
+
+
+class LedgerChange(models.Model):
+    """
+    Append-only per-user feed of ledger events (see change_feed). The id
+    increases with every change and is the cursor clients sync from.
+    """
+    KIND_CHOICES = (
+        ("mint", "Mint"),
+        ("transfer", "Transfer"),
+        ("burn", "Burn"),
+        ("purchase", "Purchase"),
+        ("fill", "Order fill"),
+        ("chain", "Chain confirmation"),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        User1,
+        on_delete=models.CASCADE,
+        related_name="ledger_changes",
+        db_index=False  # Leading column of ledger_change_user_idx
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'], name='ledger_change_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"Change {self.id} | {self.kind} | user {self.user_id}"
+
+
+class PendingChainTx(models.Model):
+    """
+    The on-chain write mirroring a ledger Transaction (see chain_tx_service).
+    Requests only queue it; the receipt poller submits it, follows it to a
+    receipt and copies the chain hash onto the ledger rows.
+    """
+    KIND_CHOICES = (
+        ("mint", "Mint"),
+        ("transfer", "Transfer"),
+        ("burn", "Burn"),
+    )
+
+    STATUS_CHOICES = (
+        ("queued", "Queued"),
+        ("submitting", "Submitting"),  # claimed by one worker's poller, being sent
+        ("submitted", "Submitted"),
+        ("confirmed", "Confirmed"),
+        ("failed", "Failed"),
+    )
+
+    ledger_tx = models.OneToOneField(
+        Transaction,
+        on_delete=models.CASCADE,
+        related_name="chain_tx"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)  # contract call arguments
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    nonce = models.PositiveBigIntegerField(null=True, blank=True)
+    gas_price = models.PositiveBigIntegerField(null=True, blank=True)  # wei
+    tx_hash = models.CharField(max_length=66, unique=True, null=True, blank=True)
+    replaced_hashes = models.JSONField(default=list)  # earlier hashes of the same nonce, before gas bumps
+    attempts = models.PositiveIntegerField(default=0)
+    block_number = models.PositiveBigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='chain_tx_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Chain tx {self.id} | {self.kind} | {self.status}"
+
+
+class ChainEvent(models.Model):
+    """
+    A Transfer log of the credits contract, copied locally by the event
+    indexer (see chain_indexer) so chain history is queried without RPC
+    """
+    EVENT_CHOICES = (
+        ("mint", "Mint"),
+        ("transfer", "Transfer"),
+        ("burn", "Burn"),
+    )
+
+    block_number = models.BigIntegerField()
+    block_hash = models.CharField(max_length=66)
+    tx_hash = models.CharField(max_length=66, db_index=True)  # matches Transaction.tx_hash once confirmed
+    log_index = models.PositiveIntegerField()
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    from_address = models.CharField(max_length=42, blank=True)  # lower-cased; empty for mints
+    to_address = models.CharField(max_length=42, blank=True)  # lower-cased; empty for burns
+    amount = models.DecimalField(max_digits=36, decimal_places=18)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tx_hash', 'log_index'], name='chain_event_log_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['block_number', 'log_index'], name='chain_event_block_idx'),
+            models.Index(fields=['from_address', 'block_number'], name='chain_event_from_idx'),
+            models.Index(fields=['to_address', 'block_number'], name='chain_event_to_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} {self.amount} at block {self.block_number}"
+
+
+class ChainCheckpoint(models.Model):
+    """The last block the event indexer has fully stored, with its hash for reorg checks"""
+    contract_address = models.CharField(max_length=42, unique=True)
+    block_number = models.BigIntegerField()
+    block_hash = models.CharField(max_length=66)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.contract_address} indexed to block {self.block_number}"
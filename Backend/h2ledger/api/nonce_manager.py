@@ -0,0 +1,173 @@
+"""
+Nonce manager for H2Ledger
+Hands out transaction nonces per signing account locally so many transactions can be in flight
+"""
+
+import logging
+import re
+import threading
+import time
+
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+
+# The identical signed transaction is already in the pool
+ALREADY_KNOWN = ('already known', 'known transaction', 'already imported')
+# The nonce was already used, by us or another sender of the account
+NONCE_BEHIND = ('nonce too low', 'replacement transaction underpriced', 'nonce has already been used')
+# Nodes that do not queue future nonces (automining dev nodes) reject a nonce
+# whose predecessors are still on their way
+NONCE_AHEAD = ('nonce too high',)
+EXPECTED_NONCE = re.compile(r'expected(?: nonce to be)? (\d+),? but got (\d+)')
+
+
+def classify_send_error(error):
+    """'known', 'behind', 'ahead' or None for an error from send_raw_transaction"""
+    message = str(error).lower()
+    if any(text in message for text in ALREADY_KNOWN):
+        return 'known'
+    match = EXPECTED_NONCE.search(message)
+    if match:
+        return 'ahead' if int(match.group(2)) > int(match.group(1)) else 'behind'
+    if any(text in message for text in NONCE_BEHIND):
+        return 'behind'
+    if any(text in message for text in NONCE_AHEAD):
+        return 'ahead'
+    return None
+
+
+def raw_transaction(signed):
+    """Raw bytes of a signed transaction (renamed between web3 versions)"""
+    return getattr(signed, 'raw_transaction', None) or signed.rawTransaction
+
+
+class NonceAccount:
+    __slots__ = ('lock', 'next_nonce', 'gaps')
+
+    def __init__(self, next_nonce):
+        self.lock = threading.Lock()
+        self.next_nonce = next_nonce
+        self.gaps = set()  # released nonces below next_nonce, reused lowest first
+
+
+class NonceManager:
+    """
+    Each account starts from the node's pending transaction count and then
+    counts locally, so sending no longer costs a get_transaction_count
+    round trip and concurrent senders never pick the same nonce.
+
+    A nonce whose transaction never reached the node is released and
+    handed out again before any new one, so the account's queue does not
+    stall behind a gap. When the node reports the nonce as used (another
+    sender of the account got there first) the account skips forward to
+    the chain's count.
+    """
+
+    def __init__(self, w3):
+        self.w3 = w3
+        self._accounts = {}
+        self._lock = threading.Lock()
+
+    def _account(self, address):
+        address = Web3.to_checksum_address(address)
+        account = self._accounts.get(address)
+        if account is None:
+            with self._lock:
+                account = self._accounts.get(address)
+                if account is None:
+                    account = NonceAccount(self.w3.eth.get_transaction_count(address, 'pending'))
+                    self._accounts[address] = account
+        return account
+
+    def allocate(self, address):
+        """The next nonce to sign with for `address`"""
+        account = self._account(address)
+        with account.lock:
+            if account.gaps:
+                nonce = min(account.gaps)
+                account.gaps.discard(nonce)
+                return nonce
+            nonce = account.next_nonce
+            account.next_nonce += 1
+            return nonce
+
+    def release(self, address, nonce):
+        """Give back a nonce whose transaction was not accepted by the node"""
+        account = self._account(address)
+        with account.lock:
+            if nonce == account.next_nonce - 1:
+                account.next_nonce = nonce
+                # Trailing gaps collapse too
+                while account.next_nonce - 1 in account.gaps:
+                    account.next_nonce -= 1
+                    account.gaps.discard(account.next_nonce)
+            elif nonce < account.next_nonce:
+                account.gaps.add(nonce)
+
+    def resync(self, address):
+        """
+        Move `address` forward to the node's pending count after a nonce
+        conflict. Never moves back, so nonces still in flight are not
+        handed out twice.
+        """
+        account = self._account(address)
+        pending = self.w3.eth.get_transaction_count(Web3.to_checksum_address(address), 'pending')
+        with account.lock:
+            if pending > account.next_nonce:
+                logger.warning(f"Nonces for {address} were behind the chain: local {account.next_nonce}, chain {pending}")
+                account.next_nonce = pending
+            account.gaps = {nonce for nonce in account.gaps if nonce >= pending}
+
+    def reset(self, address):
+        """
+        Restart `address` from the node's pending count, dropping local
+        gaps. For when a transaction was dropped or replaced and the ones
+        after it are stuck; only safe while nothing else is being sent.
+        """
+        account = self._account(address)
+        pending = self.w3.eth.get_transaction_count(Web3.to_checksum_address(address), 'pending')
+        with account.lock:
+            logger.warning(f"Resetting nonces for {address}: local {account.next_nonce}, chain {pending}")
+            account.next_nonce = pending
+            account.gaps.clear()
+
+    def pending(self, address):
+        """(next nonce, released gaps) for `address`"""
+        account = self._account(address)
+        with account.lock:
+            return account.next_nonce, sorted(account.gaps)
+
+
+def send_transaction(w3, nonces, address, private_key, build, attempts=6, backoff=0.05, on_signed=None):
+    """
+    Sign and send the transaction `build(nonce)` returns, without waiting
+    for a receipt. A nonce the chain already used is replaced by a fresh
+    one; a nonce the node is not ready for yet is resent after a short
+    (doubling) backoff. Any other rejection releases the nonce and raises.
+    `on_signed(raw, nonce)` runs before each send, while the node cannot
+    have seen the transaction yet. Returns the transaction hash.
+    """
+    nonce = nonces.allocate(address)
+    for attempt in range(attempts):
+        try:
+            raw = raw_transaction(w3.eth.account.sign_transaction(build(nonce), private_key))
+            if on_signed is not None:
+                on_signed(raw, nonce)
+            return w3.eth.send_raw_transaction(raw)
+        except Exception as e:
+            kind = classify_send_error(e)
+            if kind == 'known':
+                return Web3.keccak(raw)
+            if attempt < attempts - 1:
+                if kind == 'behind':
+                    nonces.resync(address)
+                    nonce = nonces.allocate(address)
+                    continue
+                if kind == 'ahead':
+                    time.sleep(backoff * 2 ** attempt)
+                    continue
+            if kind != 'behind':
+                nonces.release(address, nonce)
+            raise
@@ -0,0 +1,171 @@
+"""
+Price history service for H2Ledger
+Keeps MarketPrice at full resolution for a recent window and downsamples older rows into buckets
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .models import MarketPrice, MarketPriceBucket
+
+logger = logging.getLogger(__name__)
+
+
+BUCKET_FIELDS = ('last', 'min', 'max', 'mean', 'volume', 'sample_count', 'last_timestamp')
+
+
+def floor_timestamp(timestamp, seconds):
+    """Floor a timestamp to the start of its fixed-size bucket (UTC)"""
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+
+def fold_bucket(bucket, other):
+    """Fold the samples of `other` into `bucket`; both describe the same interval"""
+    total = bucket.sample_count + other.sample_count
+    bucket.mean = (bucket.mean * bucket.sample_count + other.mean * other.sample_count) / total
+    bucket.sample_count = total
+    bucket.min = min(bucket.min, other.min)
+    bucket.max = max(bucket.max, other.max)
+    if other.last_timestamp >= bucket.last_timestamp:
+        bucket.last = other.last
+        bucket.volume = other.volume
+        bucket.last_timestamp = other.last_timestamp
+
+
+class PriceHistoryService:
+    """
+    Compaction walks rows older than the retention window oldest first, one
+    batch at a time over the timestamp index. Each batch is folded into its
+    buckets and deleted in the same transaction, so memory is bounded by the
+    batch size and an interrupted run loses nothing. The newest row is never
+    compacted, so the latest price is always a single index seek.
+    """
+
+    def __init__(self):
+        trading_config = getattr(settings, 'TRADING_SETTINGS', {})
+        self.retention = timedelta(hours=trading_config.get('PRICE_RETENTION_HOURS', 168))
+        self.bucket_seconds = trading_config.get('PRICE_BUCKET_SECONDS', 3600)
+        self.batch_size = trading_config.get('PRICE_COMPACTION_BATCH_SIZE', 10000)
+        self.interval = trading_config.get('PRICE_COMPACTION_INTERVAL', 0)
+        self._thread = None
+        self._stop = threading.Event()
+
+    def latest(self):
+        """Most recent MarketPrice row, or None"""
+        return MarketPrice.objects.order_by('-timestamp').first()
+
+    def cutoff(self, as_of=None, using=DEFAULT_DB_ALIAS):
+        """
+        Rows before this instant are compacted: the start of the bucket
+        holding `as_of - retention`, pulled back to the newest row's bucket
+        so whole buckets are compacted and the latest price survives
+        """
+        boundary = (as_of or now()) - self.retention
+        newest = MarketPrice.objects.using(using).order_by('-timestamp').values_list('timestamp', flat=True).first()
+        if newest is None:
+            return None
+        return floor_timestamp(min(boundary, newest), self.bucket_seconds)
+
+    def downsample(self, rows):
+        """Build in-memory buckets keyed by start from (timestamp, price, volume) rows in time order"""
+        buckets = {}
+        for timestamp, price, volume in rows:
+            start = floor_timestamp(timestamp, self.bucket_seconds)
+            bucket = buckets.get(start)
+            if bucket is None:
+                buckets[start] = MarketPriceBucket(
+                    bucket_start=start, bucket_seconds=self.bucket_seconds,
+                    last=price, min=price, max=price, mean=price, volume=volume,
+                    sample_count=1, last_timestamp=timestamp,
+                )
+                continue
+            bucket.sample_count += 1
+            bucket.mean += (price - bucket.mean) / bucket.sample_count
+            bucket.min = min(bucket.min, price)
+            bucket.max = max(bucket.max, price)
+            bucket.last, bucket.volume, bucket.last_timestamp = price, volume, timestamp
+        return buckets
+
+    def merge(self, buckets, using=DEFAULT_DB_ALIAS):
+        """Fold downsampled buckets into the table; buckets seen in an earlier batch are combined"""
+        existing = MarketPriceBucket.objects.using(using).in_bulk(list(buckets), field_name='bucket_start')
+        changed, created = [], []
+        for start, bucket in buckets.items():
+            stored = existing.get(start)
+            if stored is None:
+                created.append(bucket)
+            else:
+                fold_bucket(stored, bucket)
+                changed.append(stored)
+        MarketPriceBucket.objects.using(using).bulk_update(changed, BUCKET_FIELDS)
+        MarketPriceBucket.objects.using(using).bulk_create(created)
+
+    def compact(self, as_of=None, using=DEFAULT_DB_ALIAS):
+        """
+        Downsample and delete every row older than the retention window in
+        the `using` database. Returns the number of rows compacted.
+        """
+        cutoff = self.cutoff(as_of, using)
+        if cutoff is None:
+            return 0
+        compacted = 0
+
+        while True:
+            batch = list(
+                MarketPrice.objects.using(using).filter(timestamp__lt=cutoff)
+                .order_by('timestamp', 'pk')
+                .values_list('pk', 'timestamp', 'price_per_credit', 'volume_24h')[:self.batch_size]
+            )
+            if not batch:
+                break
+            last_pk, last_timestamp = batch[-1][0], batch[-1][1]
+
+            with transaction.atomic(using=using):
+                self.merge(self.downsample(row[1:] for row in batch), using)
+                # Everything up to the batch's last key has been folded in
+                MarketPrice.objects.using(using).filter(
+                    Q(timestamp__lt=last_timestamp) | Q(timestamp=last_timestamp, pk__lte=last_pk)
+                ).delete()
+            compacted += len(batch)
+
+            if len(batch) < self.batch_size:
+                break
+
+        if compacted:
+            logger.info(f"Compacted {compacted} market prices older than {cutoff}")
+        return compacted
+
+    def start(self, interval=None):
+        """Run compaction periodically in a background daemon thread"""
+        interval = interval or self.interval
+        if not interval or (self._thread and self._thread.is_alive()):
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name='price-history-compactor', daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Price history compactor started (every {interval}s)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Error compacting market prices: {e}")
+
+
+# Global price history service instance
+price_history_service = PriceHistoryService()
@@ -46,6 +46,7 @@ class HydrogenBatchSerializer(serializers.ModelSerializer):
             "production_date",
             "certification",
             "is_approved",
+            "matching_mode",
             "created_at",
         ]
         read_only_fields = ("batch_id", "created_at", "producer_name")
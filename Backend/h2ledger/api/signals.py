@@ -0,0 +1,113 @@
+"""
+Model signal handlers for the api app
+"""
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Credit, EmissionsData, HydrogenBatch, MarketPrice, TradingOrder, Transaction
+from .market_stream import market_stream, user_topic
+from .dashboard_cache import dashboard_cache
+from .ledger_summary_service import ledger_summary_service
+from .emissions_rollup_service import emissions_rollup_service
+from .change_feed import change_feed
+from .chain_tx_service import chain_tx_service
+
+
+def _publish_balance(user_id):
+    total = Credit.objects.filter(
+        owner_id=user_id,
+        status="active"
+    ).aggregate(total=Sum("amount"))["total"] or 0
+    market_stream.publish(user_topic(user_id), 'balance', {
+        'user_id': user_id,
+        'total_credits_owned': float(total),
+    })
+
+
+@receiver(post_save, sender=Transaction)
+def stream_balance_change(sender, instance, created, **kwargs):
+    """Push the new balance to streaming subscribers of both parties"""
+    if not created:
+        return
+    for user_id in {instance.from_user_id, instance.to_user_id}:
+        # Skip the balance query entirely when nobody is listening
+        if user_id and market_stream.has_subscribers(user_topic(user_id)):
+            transaction.on_commit(lambda user_id=user_id: _publish_balance(user_id))
+
+
+# Each model maps to the user columns whose dashboards it feeds
+DASHBOARD_USER_FIELDS = {
+    Credit: ('owner_id',),
+    Transaction: ('from_user_id', 'to_user_id'),
+    TradingOrder: ('user_id',),
+    EmissionsData: ('user_id',),
+    HydrogenBatch: ('producer_id',),
+}
+
+
+def invalidate_dashboard(sender, instance, **kwargs):
+    """Drop cached dashboard figures of every user a changed row belongs to"""
+    dashboard_cache.invalidate_users(getattr(instance, field) for field in DASHBOARD_USER_FIELDS[sender])
+
+
+for model in DASHBOARD_USER_FIELDS:
+    post_save.connect(invalidate_dashboard, sender=model)
+    post_delete.connect(invalidate_dashboard, sender=model)
+
+# Bulk writes (matching fills, expiry sweeps) bypass signals and invalidate explicitly
+
+
+@receiver(post_save, sender=MarketPrice)
+def invalidate_market_dashboard(sender, instance, **kwargs):
+    dashboard_cache.invalidate_market()
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_leaderboard(sender, instance, **kwargs):
+    if instance.tx_type == "burn":
+        dashboard_cache.invalidate_leaderboard()
+
+
+# Ledger summary counters. post_save runs inside the writer's transaction, so the
+# counters commit or roll back with the row; balance deltas come from credit_service.
+
+
+@receiver(post_save, sender=Transaction)
+def count_transaction(sender, instance, created, **kwargs):
+    if created:
+        ledger_summary_service.record_transaction(instance)
+
+
+@receiver(post_save, sender=Transaction)
+def record_change(sender, instance, created, **kwargs):
+    if created:
+        change_feed.record_transaction(instance)
+
+
+@receiver(post_save, sender=Transaction)
+def queue_chain_write(sender, instance, created, **kwargs):
+    """Mirror mints, transfers and burns on chain, enabled via BLOCKCHAIN_SETTINGS['MIRROR_WRITES']"""
+    if created and chain_tx_service.mirror_writes:
+        chain_tx_service.enqueue(instance)
+
+
+@receiver(post_save, sender=HydrogenBatch)
+def count_batch(sender, instance, created, **kwargs):
+    if created:
+        ledger_summary_service.apply(instance.producer_id, batches_produced=1)
+
+
+@receiver(post_save, sender=EmissionsData)
+def count_emissions(sender, instance, created, **kwargs):
+    if created:
+        ledger_summary_service.apply(instance.user_id, emissions_offset_kg=instance.co2_offset_kg)
+
+
+@receiver(post_save, sender=EmissionsData)
+def roll_up_emissions(sender, instance, created, **kwargs):
+    if created:
+        emissions_rollup_service.record(instance)
@@ -1,3 +1,1521 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from web3 import Web3
+import asyncio
+import json
+import shutil
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+from auth1.models import User1
+from .models import *
+from .matching_engine import BookOrder, OrderBook, MatchingEngine, clear_call_auction
+from .order_flow import generate_orders, read_ndjson, write_ndjson
+from .credit_service import credit_service, CreditConflictError, InsufficientCreditError
+from .emissions_rollup_service import emissions_rollup_service
+
+
+def make_user(n, role='buyer'):
+    return User1.objects.create(
+        wallet_address=f"0x{n:040d}",
+        name=f"User {n}",
+        email=f"user{n}@test.com",
+        role=role,
+        password='testpass123',
+    )
+
+
+def as_user(request, user):
+    """Give a request factory request the user an auth backend would have resolved"""
+    async def auser():
+        return user
+    request.auser = auser
+    return request
+
+
+class OrderBookTests(TestCase):
+
+    def test_price_time_priority(self):
+        book = OrderBook()
+        book.add(BookOrder(1, 1, 'sell', Decimal('51.00'), Decimal('10')))
+        book.add(BookOrder(2, 1, 'sell', Decimal('50.00'), Decimal('10')))
+        book.add(BookOrder(3, 2, 'sell', Decimal('50.00'), Decimal('10')))
+
+        taker = BookOrder(4, 3, 'buy', Decimal('51.00'), Decimal('25'))
+        fills = book.match(taker)
+
+        self.assertEqual([f.maker.order_id for f in fills], [2, 3, 1])
+        self.assertEqual([f.price for f in fills], [Decimal('50.00'), Decimal('50.00'), Decimal('51.00')])
+        self.assertEqual(taker.remaining, 0)
+        self.assertEqual(book.get(1).remaining, Decimal('5'))
+        self.assertEqual(len(book), 1)
+
+    def test_no_cross_and_cancel(self):
+        book = OrderBook()
+        book.add(BookOrder(1, 1, 'buy', Decimal('49.00'), Decimal('10')))
+        book.add(BookOrder(2, 1, 'buy', Decimal('48.00'), Decimal('10')))
+
+        self.assertEqual(book.match(BookOrder(3, 2, 'sell', Decimal('50.00'), Decimal('5'))), [])
+
+        book.cancel(1)
+        self.assertEqual(book.best_price('buy'), Decimal('48.00'))
+        fills = book.match(BookOrder(4, 2, 'sell', Decimal('48.00'), Decimal('5')))
+        self.assertEqual([f.maker.order_id for f in fills], [2])
+
+    def test_readded_order_appears_once(self):
+        book = OrderBook()
+        book.add(BookOrder(1, 1, 'sell', Decimal('50.00'), Decimal('10')))
+        book.add(BookOrder(2, 1, 'sell', Decimal('50.00'), Decimal('10')))
+        book.cancel(1)
+        book.add(BookOrder(1, 1, 'sell', Decimal('50.00'), Decimal('10')))
+
+        self.assertEqual([o.order_id for o in book._levels['sell'][Decimal('50.00')].orders], [2, 1])
+        fills = book.match(BookOrder(3, 2, 'buy', Decimal('50.00'), Decimal('25')))
+        self.assertEqual([(f.maker.order_id, f.quantity) for f in fills], [(2, Decimal('10')), (1, Decimal('10'))])
+        self.assertIsNone(book.best_price('sell'))
+
+
+class MatchingEngineTests(TestCase):
+
+    def setUp(self):
+        self.seller = make_user(1, role='producer')
+        self.buyer = make_user(2)
+
+    def test_submit_persists_fills(self):
+        resting = TradingOrder.objects.create(
+            user=self.seller, order_type='sell',
+            quantity=Decimal('10'), price_per_credit=Decimal('50.00'),
+        )
+        engine = MatchingEngine()
+        engine.load()
+
+        order = TradingOrder.objects.create(
+            user=self.buyer, order_type='buy',
+            quantity=Decimal('4'), price_per_credit=Decimal('52.00'),
+        )
+        fills = engine.submit(order)
+
+        self.assertEqual(len(fills), 1)
+        self.assertEqual(order.status, 'completed')
+        resting.refresh_from_db()
+        self.assertEqual(resting.filled_quantity, Decimal('4'))
+        self.assertEqual(resting.status, 'partial')
+
+        trade = Trade.objects.get()
+        self.assertEqual(trade.sequence, 1)
+        self.assertEqual(trade.buy_order_id, order.id)
+        self.assertEqual(trade.sell_order_id, resting.id)
+        self.assertEqual(trade.seller, self.seller)
+        self.assertEqual(trade.buyer, self.buyer)
+        self.assertEqual(trade.price, Decimal('50.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+        # Partially filled orders keep resting in the book
+        self.assertIn(resting.id, engine.book)
+
+    def test_sequence_continues_after_reload(self):
+        for i in range(2):
+            TradingOrder.objects.create(
+                user=self.seller, order_type='sell',
+                quantity=Decimal('1'), price_per_credit=Decimal('50.00'),
+            )
+        engine = MatchingEngine()
+        engine.submit(TradingOrder.objects.create(
+            user=self.buyer, order_type='buy',
+            quantity=Decimal('1'), price_per_credit=Decimal('50.00'),
+        ))
+        engine.reset()
+        engine.submit(TradingOrder.objects.create(
+            user=self.buyer, order_type='buy',
+            quantity=Decimal('1'), price_per_credit=Decimal('50.00'),
+        ))
+        self.assertEqual(list(Trade.objects.values_list('sequence', flat=True)), [1, 2])
+
+    def test_sequence_follows_other_writers(self):
+        resting = TradingOrder.objects.create(
+            user=self.seller, order_type='sell',
+            quantity=Decimal('2'), price_per_credit=Decimal('50.00'),
+        )
+
+        class RacingEngine(MatchingEngine):
+            # The first read misses a trade another worker records straight after it
+            reads = [0]
+
+            @property
+            def last_sequence(self):
+                return self.reads.pop() if self.reads else super().last_sequence
+
+        engine = RacingEngine()
+        engine.load()
+        Trade.objects.create(
+            sequence=1, buy_order=resting, sell_order=resting, buyer=self.buyer,
+            seller=self.seller, quantity=Decimal('1'), price=Decimal('50.00'),
+        )
+        engine.submit(TradingOrder.objects.create(
+            user=self.buyer, order_type='buy',
+            quantity=Decimal('1'), price_per_credit=Decimal('50.00'),
+        ))
+        self.assertEqual(list(Trade.objects.values_list('sequence', flat=True)), [1, 2])
+
+    def test_stale_maker_is_not_overwritten(self):
+        cancelled = TradingOrder.objects.create(
+            user=self.seller, order_type='sell',
+            quantity=Decimal('5'), price_per_credit=Decimal('49.00'),
+        )
+        live = TradingOrder.objects.create(
+            user=self.seller, order_type='sell',
+            quantity=Decimal('5'), price_per_credit=Decimal('50.00'),
+        )
+        engine = MatchingEngine()
+        engine.load()
+        # Cancelled behind the engine's back, e.g. by another worker
+        TradingOrder.objects.filter(id=cancelled.id).update(status='cancelled')
+
+        order = TradingOrder.objects.create(
+            user=self.buyer, order_type='buy',
+            quantity=Decimal('5'), price_per_credit=Decimal('50.00'),
+        )
+        fills = engine.submit(order)
+
+        self.assertEqual([f.maker.order_id for f in fills], [live.id])
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, 'cancelled')
+        self.assertEqual(cancelled.filled_quantity, 0)
+        self.assertEqual(Trade.objects.get().sell_order_id, live.id)
+
+    def test_trades_are_published_once_committed(self):
+        from django.db import transaction
+        from . import matching_engine as engine_module
+
+        published = []
+        self.addCleanup(setattr, engine_module, 'market_stream', engine_module.market_stream)
+        engine_module.market_stream = SimpleNamespace(publish_trades=published.extend)
+        engine = MatchingEngine()
+
+        def cross():
+            TradingOrder.objects.create(user=self.seller, order_type='sell', quantity=1, price_per_credit=50)
+            engine.submit(TradingOrder.objects.create(user=self.buyer, order_type='buy', quantity=1, price_per_credit=50))
+
+        # A rolled-back run, as in replay_orders, never reaches subscribers
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    cross()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        engine.reset()
+        self.assertEqual(published, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cross()
+        self.assertEqual([t.price for t in published], [Decimal('50')])
+
+
+class OrderExpiryTests(TestCase):
+
+    def test_sweep_cancels_expired_orders(self):
+        from django.utils.timezone import now, timedelta
+        from .expiry_service import OrderExpiryService
+        from .matching_engine import matching_engine
+
+        user = make_user(1)
+        expired = TradingOrder.objects.create(
+            user=user, order_type='sell', quantity=Decimal('5'),
+            price_per_credit=Decimal('50.00'), expires_at=now() - timedelta(minutes=1),
+        )
+        live = TradingOrder.objects.create(
+            user=user, order_type='sell', quantity=Decimal('5'),
+            price_per_credit=Decimal('50.00'), expires_at=now() + timedelta(hours=1),
+        )
+        matching_engine.load()
+
+        sweeper = OrderExpiryService()
+        sweeper.batch_size = 1
+        self.assertEqual(sweeper.sweep(), 1)
+
+        expired.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual(expired.status, 'cancelled')
+        self.assertEqual(live.status, 'pending')
+        self.assertNotIn(expired.id, matching_engine.book)
+        self.assertIn(live.id, matching_engine.book)
+        matching_engine.reset()
+
+    def test_expired_orders_are_never_filled(self):
+        from django.utils.timezone import now, timedelta
+
+        user, buyer = make_user(1), make_user(2)
+        expired = TradingOrder.objects.create(
+            user=user, order_type='sell', quantity=Decimal('5'),
+            price_per_credit=Decimal('49.00'), expires_at=now() - timedelta(minutes=1),
+        )
+        lapsing = TradingOrder.objects.create(
+            user=user, order_type='sell', quantity=Decimal('5'),
+            price_per_credit=Decimal('50.00'), expires_at=now() + timedelta(hours=1),
+        )
+        live = TradingOrder.objects.create(
+            user=user, order_type='sell', quantity=Decimal('5'),
+            price_per_credit=Decimal('51.00'),
+        )
+        engine = MatchingEngine()
+        engine.load()
+        self.assertNotIn(expired.id, engine.book)
+
+        # Expires while resting, with no sweep in between
+        engine.book.get(lapsing.id).expires_at = now() - timedelta(seconds=1)
+        fills = engine.submit(TradingOrder.objects.create(
+            user=buyer, order_type='buy', quantity=Decimal('5'), price_per_credit=Decimal('51.00'),
+        ))
+
+        self.assertEqual([f.maker.order_id for f in fills], [live.id])
+        self.assertNotIn(lapsing.id, engine.book)
+        lapsing.refresh_from_db()
+        self.assertEqual(lapsing.status, 'cancelled')
+        self.assertEqual(engine.depth_snapshot()['asks'], [])
+
+
+class OrderBookDepthTests(TestCase):
+
+    def setUp(self):
+        from .matching_engine import matching_engine
+        self.engine = matching_engine
+        self.engine.reset()
+        self.addCleanup(self.engine.reset)
+        self.user = make_user(1)
+
+    def _order(self, side, qty, price):
+        order = TradingOrder.objects.create(
+            user=self.user, order_type=side,
+            quantity=Decimal(qty), price_per_credit=Decimal(price),
+        )
+        self.engine.submit(order)
+        return order
+
+    def test_snapshot_and_incremental_changes(self):
+        self._order('sell', '5', '51.00')
+        self._order('sell', '3', '51.00')
+        self._order('buy', '2', '49.00')
+
+        response = self.client.get('/api/trading/book/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['asks'], [{'price': 51.0, 'quantity': 8.0}])
+        self.assertEqual(response.data['bids'], [{'price': 49.0, 'quantity': 2.0}])
+        since = response.data['sequence']
+
+        # A crossing buy fills part of the ask level
+        self._order('buy', '6', '52.00')
+
+        response = self.client.get('/api/trading/book/', {'since': since})
+        self.assertFalse(response.data['snapshot'])
+        self.assertEqual(
+            [(c['side'], c['price'], c['quantity']) for c in response.data['changes']],
+            [('sell', 51.0, 2.0)]
+        )
+
+    def test_stale_cursor_gets_snapshot(self):
+        self._order('sell', '5', '51.00')
+        sequence = self.engine.depth_snapshot()['sequence']
+        self.engine.reset()
+
+        response = self.client.get('/api/trading/book/', {'since': sequence - 1})
+        self.assertTrue(response.data['snapshot'])
+        self.assertGreaterEqual(response.data['sequence'], sequence)
+
+
+class MarketStreamTests(TestCase):
+
+    def test_publish_reaches_topic_subscribers_only(self):
+        import asyncio
+        from .market_stream import MarketStream, TICKS_TOPIC, user_topic
+
+        async def scenario():
+            stream = MarketStream()
+            ticks = stream.subscribe([TICKS_TOPIC])
+            balances = stream.subscribe([user_topic(7)])
+
+            stream.publish(TICKS_TOPIC, 'tick', {'price': 51.5})
+            message = await asyncio.wait_for(ticks.get(), 1)
+            self.assertIn('event: tick', message)
+            self.assertIn('"price": 51.5', message)
+            self.assertTrue(balances.queue.empty())
+
+            stream.unsubscribe(ticks)
+            self.assertFalse(stream.has_subscribers(TICKS_TOPIC))
+            self.assertIsNone(stream.publish(TICKS_TOPIC, 'tick', {'price': 52.0}))
+
+        asyncio.run(scenario())
+
+    async def test_balance_topic_follows_the_authenticated_user(self):
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import AsyncRequestFactory
+        from . import views
+        from .market_stream import MarketStream, user_topic
+
+        self.addCleanup(setattr, views, 'market_stream', views.market_stream)
+        stream = views.market_stream = MarketStream()
+        factory = AsyncRequestFactory()
+
+        async def open_stream(user):
+            request = as_user(factory.get('/api/market/stream/', {'user_id': 7}), user)
+            events = aiter((await views.market_stream_view(request)).streaming_content)
+            await anext(events)  # ": connected", sent once subscribed
+            return events
+
+        # Anonymous callers only get the public topics, whatever user_id they pass
+        await open_stream(AnonymousUser())
+        self.assertFalse(stream.has_subscribers(user_topic(7)))
+
+        events = await open_stream(SimpleNamespace(pk=8, is_authenticated=True))
+        self.assertTrue(stream.has_subscribers(user_topic(8)))
+        stream.publish(user_topic(8), 'balance', {'balance': 3})
+        self.assertIn('event: balance', (await anext(events)).decode())
+
+
+class CandleTests(TestCase):
+
+    def test_aggregate_and_merge(self):
+        from datetime import datetime, timezone as dt_timezone
+        from .candle_service import CandleService
+
+        service = CandleService()
+        t0 = datetime(2025, 8, 30, 10, 0, 5, tzinfo=dt_timezone.utc)
+        t1 = datetime(2025, 8, 30, 10, 0, 40, tzinfo=dt_timezone.utc)
+        t2 = datetime(2025, 8, 30, 10, 1, 10, tzinfo=dt_timezone.utc)
+
+        service.merge(service.aggregate([(t0, '50.00', '2'), (t1, '52.00', '1')]))
+        service.merge(service.aggregate([(t2, '49.00', '3')]))
+
+        minute = Candle.objects.get(resolution='1m', bucket_start=t0.replace(second=0))
+        self.assertEqual((minute.open, minute.high, minute.low, minute.close),
+                         (Decimal('50.00'), Decimal('52.00'), Decimal('50.00'), Decimal('52.00')))
+
+        hour = Candle.objects.get(resolution='1h')
+        self.assertEqual((hour.open, hour.high, hour.low, hour.close),
+                         (Decimal('50.00'), Decimal('52.00'), Decimal('49.00'), Decimal('49.00')))
+        self.assertEqual(hour.volume, Decimal('6'))
+        self.assertEqual(hour.trade_count, 3)
+        self.assertEqual(Candle.objects.filter(resolution='1m').count(), 2)
+
+    def test_merge_folds_into_a_bucket_opened_concurrently(self):
+        from datetime import datetime, timezone as dt_timezone
+        from .candle_service import CandleService
+
+        service = CandleService()
+        t0 = datetime(2025, 8, 30, 10, 0, 5, tzinfo=dt_timezone.utc)
+        fold = service._fold
+        raced = []
+
+        def other_process_first(new):
+            # Another process inserts the minute bucket between our UPDATE and INSERT
+            if new.resolution == '1m' and not raced:
+                raced.append(new)
+                service.merge(service.aggregate([(t0, '55.00', '1')]))
+                return 0
+            return fold(new)
+
+        service._fold = other_process_first
+        service.merge(service.aggregate([(t0, '50.00', '2')]))
+
+        minute = Candle.objects.get(resolution='1m')
+        self.assertEqual((minute.open, minute.high, minute.low, minute.close),
+                         (Decimal('55.00'), Decimal('55.00'), Decimal('50.00'), Decimal('50.00')))
+        self.assertEqual((minute.volume, minute.trade_count), (Decimal('3'), 2))
+        self.assertEqual(Candle.objects.get(resolution='1d').trade_count, 2)
+
+    def test_matching_updates_candles_and_endpoint(self):
+        user = make_user(1)
+        engine = MatchingEngine()
+        for side, price in (('sell', '50.00'), ('buy', '51.00')):
+            engine.submit(TradingOrder.objects.create(
+                user=user, order_type=side,
+                quantity=Decimal('2'), price_per_credit=Decimal(price),
+            ))
+
+        response = self.client.get('/api/market/candles/', {'resolution': '1d'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['candles']), 1)
+        self.assertEqual(response.data['candles'][0]['close'], 50.0)
+        self.assertEqual(response.data['candles'][0]['volume'], 2.0)
+
+        self.assertEqual(self.client.get('/api/market/candles/', {'resolution': '5m'}).status_code, 400)
+
+
+class CreditServiceTests(TestCase):
+
+    def setUp(self):
+        self.owner = make_user(1, role='producer')
+        self.other = make_user(2)
+        batch = HydrogenBatch.objects.create(
+            producer=self.owner, quantity_kg=100, production_date='2025-01-01'
+        )
+        self.credit = Credit.objects.create(batch=batch, owner=self.owner, amount=Decimal('10'))
+
+    def test_use_decrements_and_rejects_overdraw(self):
+        remaining, tx = credit_service.use(self.owner, self.credit.credit_id, 6)
+        self.assertEqual(remaining, Decimal('4'))
+        self.assertEqual(tx.amount, Decimal('6'))
+
+        with self.assertRaises(InsufficientCreditError):
+            credit_service.use(self.owner, self.credit.credit_id, 6)
+        with self.assertRaises(Credit.DoesNotExist):
+            credit_service.use(self.other, self.credit.credit_id, 1)
+
+        remaining, _ = credit_service.use(self.owner, self.credit.credit_id, 4)
+        self.credit.refresh_from_db()
+        self.assertEqual(self.credit.amount, 0)
+        self.assertEqual(self.credit.status, 'burned')
+        self.assertEqual(Transaction.objects.filter(credit=self.credit).count(), 2)
+
+    def test_credit_moves_only_once(self):
+        credit_service.transfer(self.credit.credit_id, self.other, 10)
+        with self.assertRaises(CreditConflictError):
+            credit_service.transfer(self.credit.credit_id, self.other, 10)
+        self.assertEqual(credit_service.burn(self.owner, [self.credit.credit_id]), [])
+        self.assertEqual(Transaction.objects.filter(credit=self.credit).count(), 1)
+
+
+class OrderReplayTests(TestCase):
+
+    def test_generated_stream_round_trips(self):
+        orders = list(generate_orders(50, volatility=0.01, size_distribution='pareto', seed=3))
+        self.assertEqual(orders, list(generate_orders(50, volatility=0.01, size_distribution='pareto', seed=3)))
+
+        buffer = StringIO()
+        write_ndjson(orders, buffer)
+        buffer.seek(0)
+        self.assertEqual(list(read_ndjson(buffer)), orders)
+
+    def test_replay_is_deterministic_across_modes(self):
+        reports = []
+        for mode in ('inprocess', 'http'):
+            out = StringIO()
+            call_command('replay_orders', generate=60, users=5, mode=mode, json=True, stdout=out)
+            reports.append(json.loads(out.getvalue()))
+
+        self.assertGreater(reports[0]['trades'], 0)
+        self.assertEqual(reports[0]['trade_digest'], reports[1]['trade_digest'])
+        # The replay is rolled back and leaves no orders behind
+        self.assertFalse(TradingOrder.objects.exists())
+
+    def test_order_owner_is_never_taken_from_the_body(self):
+        victim = make_user(1)
+        response = self.client.post('/api/trading/orders/', {
+            'user': victim.pk, 'order_type': 'buy', 'quantity': '1', 'price_per_credit': '50.00',
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TradingOrder.objects.exists())
+
+
+class CallAuctionTests(TestCase):
+
+    def test_uniform_price_maximizes_volume(self):
+        orders = [
+            BookOrder(1, 1, 'buy', Decimal('52.00'), Decimal('10')),
+            BookOrder(2, 1, 'buy', Decimal('51.00'), Decimal('10')),
+            BookOrder(3, 1, 'buy', Decimal('49.00'), Decimal('10')),
+            BookOrder(4, 2, 'sell', Decimal('50.00'), Decimal('15')),
+            BookOrder(5, 2, 'sell', Decimal('51.00'), Decimal('10')),
+            BookOrder(6, 2, 'sell', Decimal('53.00'), Decimal('10')),
+        ]
+        result = clear_call_auction(orders)
+
+        # At 51.00 demand is 20 and supply 25; no other price matches more
+        self.assertEqual(result.price, Decimal('51.00'))
+        self.assertEqual(result.volume, Decimal('20'))
+        self.assertEqual(
+            [(b.order_id, s.order_id, q) for b, s, q in result.pairs],
+            [(1, 4, Decimal('10')), (2, 4, Decimal('5')), (2, 5, Decimal('5'))]
+        )
+        self.assertIsNone(clear_call_auction(orders[2:3] + orders[5:]))
+
+    def test_auction_batch_orders_wait_for_clearing(self):
+        seller = make_user(1, role='producer')
+        buyer = make_user(2)
+        batch = HydrogenBatch.objects.create(
+            producer=seller, quantity_kg=100, production_date='2025-01-01', matching_mode='auction'
+        )
+        engine = MatchingEngine()
+        sell = TradingOrder.objects.create(
+            user=seller, order_type='sell', credit_batch=batch,
+            quantity=Decimal('5'), price_per_credit=Decimal('50.00'),
+        )
+        buy = TradingOrder.objects.create(
+            user=buyer, order_type='buy', credit_batch=batch,
+            quantity=Decimal('8'), price_per_credit=Decimal('52.00'),
+        )
+        self.assertEqual(engine.submit(sell), [])
+        self.assertEqual(engine.submit(buy), [])
+        self.assertFalse(Trade.objects.exists())
+        engine.load()
+        self.assertNotIn(buy.id, engine.book)
+
+        result = engine.clear_auction(batch.batch_id)
+        self.assertEqual(result.volume, Decimal('5'))
+        trade = Trade.objects.get()
+        self.assertEqual(trade.price, result.price)
+        sell.refresh_from_db()
+        buy.refresh_from_db()
+        self.assertEqual(sell.status, 'completed')
+        self.assertEqual((buy.status, buy.filled_quantity), ('partial', Decimal('5')))
+
+
+class DashboardServiceTests(TestCase):
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.user = make_user(1, role='producer')
+        self.other = make_user(2)
+        batch = HydrogenBatch.objects.create(
+            producer=self.user, quantity_kg=100, production_date='2025-01-01'
+        )
+        credit, _ = credit_service.mint(batch, self.user, Decimal('40'), 'dash_mint')
+        for i, (tx_type, amount) in enumerate([('transfer', 5), ('purchase', 7)]):
+            Transaction.objects.create(
+                credit=credit, from_user=self.user, to_user=self.other,
+                tx_type=tx_type, amount=amount, tx_hash=f"dash_{i}"
+            )
+        EmissionsData.objects.create(user=self.user, credits_burned=1, co2_offset_kg=10)
+        TradingOrder.objects.create(
+            user=self.user, order_type='sell', quantity=1, price_per_credit=50
+        )
+
+    def test_figures_and_query_budget(self):
+        from .dashboard_service import dashboard_service
+
+        # Two per-user queries (summary row, week's trades), three for market data
+        # (price, 24h volume, daily candles) and the stored chain snapshot
+        with self.assertNumQueries(6):
+            data = dashboard_service.get_comprehensive_analytics(self.user)
+
+        self.assertEqual(data['totalCreditsOwned'], 40.0)
+        self.assertEqual(data['creditsTraded'], {'today': 12.0, 'thisWeek': 12.0})
+        self.assertEqual(data['emissionsOffset']['total'], 10.0)
+        self.assertEqual(data['emissionsOffset']['thisMonth'], 10.0)
+        metrics = data['additional_metrics']
+        self.assertEqual(metrics['batches_produced'], 1)
+        self.assertEqual(metrics['total_transactions'], 3)
+        self.assertEqual(metrics['active_orders'], 1)
+        self.assertEqual(set(data['meta']['sections']), {'user', 'market', 'blockchain'})
+        self.assertFalse(data['meta']['partial'])
+
+    def test_cache_hits_until_users_rows_change(self):
+        from .dashboard_service import dashboard_service
+        from .dashboard_cache import dashboard_cache
+
+        dashboard_cache.reset_stats()
+        dashboard_service.get_comprehensive_analytics(self.user)
+        with self.assertNumQueries(0):
+            dashboard_service.get_comprehensive_analytics(self.user)
+        self.assertEqual(dashboard_cache.stats()['hits'], 3)  # user figures, market and chain snapshot
+
+        # Another user's activity leaves this entry alone
+        with self.captureOnCommitCallbacks(execute=True):
+            EmissionsData.objects.create(user=self.other, credits_burned=1, co2_offset_kg=99)
+        with self.assertNumQueries(0):
+            dashboard_service.get_comprehensive_analytics(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EmissionsData.objects.create(user=self.user, credits_burned=1, co2_offset_kg=5)
+        data = dashboard_service.get_comprehensive_analytics(self.user)
+        self.assertEqual(data['emissionsOffset']['total'], 15.0)
+        self.assertEqual(dashboard_cache.stats()['misses'], 4)
+
+
+class DashboardSectionTests(SimpleTestCase):
+
+    @override_settings(DASHBOARD_SETTINGS={'SECTION_WORKERS': 4, 'SECTION_TIMEOUTS': {'slow': 0.05}})
+    def test_sections_run_concurrently_with_fallback(self):
+        from .dashboard_service import DashboardService
+
+        service = DashboardService()
+        release = threading.Event()
+        results, meta = service._run_sections({
+            'fast': (lambda: 'ok', None),
+            'slow': (lambda: release.wait(5) and 'late', 'fallback'),
+            'broken': (lambda: 1 / 0, 'fallback'),
+        })
+        release.set()
+
+        self.assertEqual(results, {'fast': 'ok', 'slow': 'fallback', 'broken': 'fallback'})
+        self.assertEqual(
+            {name: timing['status'] for name, timing in meta['sections'].items()},
+            {'fast': 'ok', 'slow': 'timeout', 'broken': 'error'}
+        )
+        self.assertTrue(meta['parallel'] and meta['partial'])
+        self.assertLess(meta['total_ms'], 1000)
+
+
+class LedgerSummaryTests(TestCase):
+
+    def setUp(self):
+        self.owner = make_user(1, role='producer')
+        self.other = make_user(2)
+        self.batch = HydrogenBatch.objects.create(
+            producer=self.owner, quantity_kg=100, production_date='2025-01-01'
+        )
+
+    def summary(self, user):
+        return UserLedgerSummary.objects.values(
+            'credits_owned', 'credits_burned', 'batches_produced', 'transaction_count'
+        ).get(user=user)
+
+    def test_counters_follow_ledger_writes(self):
+        first, _ = credit_service.mint(self.batch, self.owner, Decimal('10'), 'sum_1')
+        second, _ = credit_service.mint(self.batch, self.owner, Decimal('5'), 'sum_2')
+        third, _ = credit_service.mint(self.batch, self.owner, Decimal('8'), 'sum_3')
+        credit_service.use(self.owner, first.credit_id, 4)
+        credit_service.transfer(second.credit_id, self.other, 5)
+        credit_service.burn(self.owner, [third.credit_id])
+
+        self.assertEqual(self.summary(self.owner), {
+            'credits_owned': Decimal('6'), 'credits_burned': Decimal('12'),
+            'batches_produced': 1, 'transaction_count': 6,
+        })
+        self.assertEqual(self.summary(self.other)['transaction_count'], 1)
+
+    def test_rebuild_reports_and_repairs_drift(self):
+        credit_service.mint(self.batch, self.owner, Decimal('10'), 'sum_1')
+        UserLedgerSummary.objects.filter(user=self.owner).update(credits_owned=Decimal('3'))
+
+        out = StringIO()
+        call_command('rebuild_ledger_summary', workers=1, chunk_size=1, dry_run=True, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['drifted'], 1)
+        self.assertEqual(report['examples'][0]['deltas'], {'credits_owned': '7.000'})
+
+        call_command('rebuild_ledger_summary', workers=1, chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.summary(self.owner)['credits_owned'], Decimal('10'))
+        self.assertTrue(UserLedgerSummary.objects.filter(user=self.other).exists())
+
+
+class EmissionsRollupTests(TestCase):
+
+    def setUp(self):
+        self.first = make_user(1)
+        self.second = make_user(2)
+
+    def test_rollups_follow_entries_and_backfill(self):
+        from django.utils.timezone import now, timedelta
+
+        EmissionsData.objects.create(user=self.first, credits_burned=1, co2_offset_kg=10)
+        EmissionsData.objects.create(user=self.first, credits_burned=2, co2_offset_kg=20)
+        EmissionsData.objects.create(user=self.second, credits_burned=4, co2_offset_kg=40)
+
+        today = now().date()
+        month = EmissionsRollup.objects.get(user=self.first, period='month', period_start=today.replace(day=1))
+        self.assertEqual((month.co2_offset_kg, month.credits_burned, month.entry_count), (Decimal('30'), Decimal('3'), 2))
+        self.assertEqual(EmissionsRollup.objects.get(user=self.first, period='day').co2_offset_kg, Decimal('30'))
+
+        response = self.client.get('/api/emissions/report/', {'period': 'month'})
+        self.assertEqual(response.json()['totals'], [{
+            'periodStart': today.replace(day=1).isoformat(),
+            'co2OffsetKg': 70.0, 'creditsBurned': 7.0, 'entries': 3, 'users': 2,
+        }])
+        self.assertEqual(self.client.get('/api/emissions/report/', {'period': 'year'}).status_code, 400)
+
+        # Rows moved behind the signal's back are picked up by the backfill
+        last_month = today.replace(day=1) - timedelta(days=1)
+        EmissionsData.objects.filter(user=self.second).update(timestamp=now().replace(day=1) - timedelta(days=1))
+        call_command('backfill_emissions_rollups', chunk_size=1, stdout=StringIO())
+
+        totals = emissions_rollup_service.totals('month', start=last_month)
+        self.assertEqual([(row['period_start'], row['co2_offset_kg']) for row in totals], [
+            (last_month.replace(day=1), Decimal('40')), (today.replace(day=1), Decimal('30')),
+        ])
+        self.assertEqual(len(emissions_rollup_service.totals('day', user_id=self.second.pk)), 1)
+
+
+class PriceHistoryTests(TestCase):
+    databases = {'default', 'bench'}
+
+    def add_price(self, price, timestamp, volume=0):
+        row = MarketPrice.objects.create(price_per_credit=price, volume_24h=volume)
+        MarketPrice.objects.filter(pk=row.pk).update(timestamp=timestamp)
+
+    def test_compaction_downsamples_old_rows_in_batches(self):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+        from .price_history_service import PriceHistoryService
+
+        hour = datetime(2025, 1, 1, 10, tzinfo=dt_timezone.utc)
+        for minutes, price, volume in [(5, 50, 1), (20, 54, 2), (40, 52, 3), (70, 60, 4)]:
+            self.add_price(price, hour + timedelta(minutes=minutes), volume)
+        self.add_price(58, hour + timedelta(days=30))
+
+        service = PriceHistoryService()
+        service.batch_size = 2  # the first bucket spans two batches
+        self.assertEqual(service.compact(as_of=hour + timedelta(days=30)), 4)
+
+        first, second = MarketPriceBucket.objects.all()
+        self.assertEqual(first.bucket_start, hour)
+        self.assertEqual(
+            (first.last, first.min, first.max, first.mean, first.volume, first.sample_count),
+            (Decimal('52'), Decimal('50'), Decimal('54'), Decimal('52'), Decimal('3'), 3)
+        )
+        self.assertEqual((second.last, second.sample_count), (Decimal('60'), 1))
+        self.assertEqual(list(MarketPrice.objects.values_list('price_per_credit', flat=True)), [Decimal('58')])
+
+        # A stalled feed keeps its newest price
+        self.assertEqual(service.compact(as_of=hour + timedelta(days=365)), 0)
+        self.assertEqual(service.latest().price_per_credit, Decimal('58'))
+        self.assertIn('marketprice_time_idx', MarketPrice.objects.all()[:1].explain())
+
+    def test_benchmark_command(self):
+        from django.core.management.base import CommandError
+
+        out = StringIO()
+        call_command('benchmark_price_compaction', database='bench', rows=500, spacing=3600,
+                     batch_size=100, repeat=5, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['rows_before'], 500)
+        self.assertEqual(report['rows_after'] + report['compacted'], 500)
+        self.assertGreater(report['buckets'], 300)
+        self.assertEqual(MarketPrice.objects.using('bench').count(), report['rows_after'])
+        self.assertFalse(MarketPrice.objects.exists())
+
+        # Compacting would delete real history, so the default database is refused
+        with self.assertRaisesMessage(CommandError, 'Refusing to compact the default database'):
+            call_command('benchmark_price_compaction', database='default', rows=1, stdout=StringIO())
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        # Validators are only issued from a dashboard cache every worker shares
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        shared = override_settings(CACHES={**settings.CACHES, 'dashboard': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }})
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self.owner = make_user(1, role='producer')
+        batch = HydrogenBatch.objects.create(
+            producer=self.owner, quantity_kg=100, production_date='2025-01-01'
+        )
+        self.credit, _ = credit_service.mint(batch, self.owner, Decimal('10'), 'etag_mint')
+
+    def test_unchanged_resources_short_circuit_to_304(self):
+        first = self.client.get('/api/leaderboard/')
+        etag = first['ETag']
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertTrue(first.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/leaderboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A mint leaves the leaderboard alone, a burn changes it
+        with self.captureOnCommitCallbacks(execute=True):
+            credit_service.use(self.owner, self.credit.credit_id, 2)
+        response = self.client.get('/api/leaderboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_per_user_versions(self):
+        path = '/api/credits/'
+        etag = self.client.get(path, {'user_id': self.owner.pk})['ETag']
+        self.assertNotEqual(self.client.get(path, {'user_id': 99})['ETag'], etag)
+        self.assertEqual(
+            self.client.get(path, {'user_id': self.owner.pk}, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TradingOrder.objects.create(user=self.owner, order_type='sell', quantity=1, price_per_credit=50)
+        for path in ('/api/credits/', '/api/dashboard/transactions/', '/api/dashboard/analytics/'):
+            response = self.client.get(path, {'user_id': self.owner.pk}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+    def test_per_process_cache_issues_no_validators(self):
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'h2ledger-dashboard'}
+        with override_settings(CACHES={**settings.CACHES, 'dashboard': local}):
+            first = self.client.get('/api/leaderboard/')
+            self.assertFalse(first.has_header('ETag'))
+            self.assertFalse(first.has_header('Last-Modified'))
+            self.assertIn('no-cache', first['Cache-Control'])
+            # Another worker may have changed the data, so a stale validator is never honoured
+            response = self.client.get('/api/leaderboard/', HTTP_IF_NONE_MATCH='"stale"')
+            self.assertEqual(response.status_code, 200)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'worker-a': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'a', 'TIMEOUT': 1},
+        'worker-b': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'b', 'TIMEOUT': 1},
+    })
+    def test_versions_expire_with_the_cache_ttl(self):
+        from .dashboard_cache import DashboardCache, LEADERBOARD_KEY
+
+        # Two workers, each with its own local-memory cache
+        worker_a, worker_b = DashboardCache('worker-a'), DashboardCache('worker-b')
+        before = worker_b.versions([LEADERBOARD_KEY])
+        worker_a._invalidate([LEADERBOARD_KEY])
+        self.assertEqual(worker_b.versions([LEADERBOARD_KEY]), before)
+
+        # The invalidation never reaches worker b, but its token lapses with the TTL
+        time.sleep(1.1)
+        self.assertNotEqual(worker_b.versions([LEADERBOARD_KEY]), before)
+
+
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        self.seller = make_user(1, role='producer')
+        self.buyer = make_user(2)
+        self.batch = HydrogenBatch.objects.create(
+            producer=self.seller, quantity_kg=100, production_date='2025-01-01'
+        )
+
+    @staticmethod
+    async def achanges(user, **params):
+        from django.test import AsyncRequestFactory
+        from .views import ledger_changes
+
+        response = await ledger_changes(as_user(AsyncRequestFactory().get('/api/changes/', params), user))
+        return json.loads(response.content)
+
+    def changes(self, user, **params):
+        from asgiref.sync import async_to_sync
+
+        return async_to_sync(self.achanges)(user, **params)
+
+    def test_changes_since_cursor(self):
+        for user in (self.seller, self.buyer):
+            user.is_authenticated = True
+        cursor = self.changes(self.buyer)['cursor']
+        credit, _ = credit_service.mint(self.batch, self.seller, Decimal('10'), 'feed_mint')
+        credit_service.transfer(credit.credit_id, self.buyer, 10)
+        credit_service.use(self.buyer, credit.credit_id, 3)
+
+        data = self.changes(self.buyer, since=cursor)
+        self.assertEqual([c['kind'] for c in data['changes']], ['transfer', 'burn'])
+        self.assertEqual(self.changes(self.buyer, since=data['cursor'])['changes'], [])
+
+        page = self.changes(self.seller, since=0, limit=1)
+        self.assertEqual([c['kind'] for c in page['changes']], ['mint'])
+        self.assertTrue(page['hasMore'])
+
+        # Fills are bulk written by the matching engine and still reach both parties
+        TradingOrder.objects.create(user=self.seller, order_type='sell', quantity=2, price_per_credit=50)
+        engine = MatchingEngine()
+        engine.submit(TradingOrder.objects.create(user=self.buyer, order_type='buy', quantity=2, price_per_credit=50))
+        fill = self.changes(self.buyer, since=data['cursor'])['changes']
+        self.assertEqual([(c['kind'], c['data']['side']) for c in fill], [('fill', 'buy')])
+
+        self.assertIn('error', self.changes(self.buyer, since='x'))
+        # Anonymous callers cannot read anyone's feed by naming them
+        response = self.client.get('/api/changes/', {'user_id': self.buyer.pk, 'since': 0})
+        self.assertEqual(response.status_code, 403)
+
+    async def test_long_poll_wakes_on_commit(self):
+        from asgiref.sync import sync_to_async
+
+        self.seller.is_authenticated = True
+        cursor = (await self.achanges(self.seller))['cursor']
+        started = time.perf_counter()
+        empty = await self.achanges(self.seller, since=cursor, wait=0.05)
+        self.assertEqual(empty['changes'], [])
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+
+        def mint():
+            with self.captureOnCommitCallbacks(execute=True):
+                credit_service.mint(self.batch, self.seller, Decimal('5'), 'feed_poll')
+
+        async def mint_later():
+            await asyncio.sleep(0.1)
+            await sync_to_async(mint)()
+
+        started = time.perf_counter()
+        response, _ = await asyncio.gather(
+            self.achanges(self.seller, since=cursor, wait=10),
+            mint_later(),
+        )
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertEqual([c['kind'] for c in response['changes']], ['mint'])
+
+
+class FakeNode:
+    """Just enough of BlockchainService for a snapshot read"""
+
+    def __init__(self, block, balances, fail=False):
+        self.rpc_url = 'fake'
+        self.fail = fail
+        self.calls = []
+        self.w3 = SimpleNamespace(eth=SimpleNamespace(block_number=block))
+        call = lambda value: SimpleNamespace(call=lambda block_identifier: self._call(value, block_identifier))
+        self.contract = SimpleNamespace(functions=SimpleNamespace(
+            getMarketPrice=lambda: call(52 * 10 ** 18),
+            totalSupply=lambda: call(1000 * 10 ** 18),
+        ))
+        self.balances = balances
+
+    def is_connected(self):
+        return not self.fail
+
+    def get_balances(self, addresses, block_identifier):
+        self.calls.append(block_identifier)
+        return block_identifier, {address: Decimal(self.balances.get(address, 0)) for address in addresses}
+
+    def _call(self, value, block_identifier):
+        self.calls.append(block_identifier)
+        return value
+
+
+class FakeRpcSession:
+    """Answers eth_call batches with the queried address as the balance, replies shuffled"""
+
+    def __init__(self, fail_id=None):
+        self.batches = []
+        self.fail_id = fail_id
+        self.lock = threading.Lock()
+
+    def post(self, url, json, timeout):
+        with self.lock:
+            self.batches.append(json)
+        replies = [
+            {'jsonrpc': '2.0', 'id': call['id'], 'error': {'message': 'execution reverted'}}
+            if call['id'] == self.fail_id else
+            {'jsonrpc': '2.0', 'id': call['id'], 'result': '0x' + call['params'][0]['data'][10:]}
+            for call in json
+        ]
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: replies[::-1])
+
+
+class RpcBatchTests(SimpleTestCase):
+
+    CONTRACT = '0x' + 'ee' * 20
+
+    def batch_client(self, session, **kwargs):
+        from .rpc_batch import RpcBatchClient
+
+        client = RpcBatchClient('http://node', **kwargs)
+        client._session = lambda: session
+        return client
+
+    def test_balances_are_batched_at_one_block(self):
+        session = FakeRpcSession()
+        addresses = [f"0x{n:040x}" for n in range(1, 8)]
+        balances = self.batch_client(session, chunk_size=3, concurrency=2).balances_of(self.CONTRACT, addresses, 42)
+
+        self.assertEqual(balances, {address: n for n, address in enumerate(addresses, 1)})
+        self.assertEqual(sorted(len(batch) for batch in session.batches), [1, 3, 3])
+        self.assertEqual({call['params'][1] for batch in session.batches for call in batch}, {'0x2a'})
+
+    def test_failed_call_fails_the_read(self):
+        from .rpc_batch import RpcBatchError
+
+        with self.assertRaises(RpcBatchError):
+            self.batch_client(FakeRpcSession(fail_id=1)).balances_of(self.CONTRACT, ['0x' + '01' * 20] * 3, 'latest')
+
+        rejected = SimpleNamespace(post=lambda url, json, timeout: SimpleNamespace(
+            raise_for_status=lambda: None, json=lambda: {'error': {'message': 'batch too large'}}
+        ))
+        with self.assertRaises(RpcBatchError):
+            self.batch_client(rejected).balances_of(self.CONTRACT, ['0x' + '01' * 20], 'latest')
+
+
+
+@override_settings(BLOCKCHAIN_SETTINGS={'NETWORK_URL': 'http://127.0.0.1:9', 'HEALTH_TTL': 30, 'RPC_POOL_SIZE': 3})
+class BlockchainClientTests(SimpleTestCase):
+
+    def test_client_is_built_lazily_on_a_shared_pool(self):
+        from .blockchain_service import BlockchainService
+
+        service = BlockchainService()
+        self.assertIsNone(service._w3)
+
+        self.assertIsNotNone(service.w3)
+        self.assertIsNone(service._health_checked_at)
+        session = service.rpc_batch._session()
+        self.assertIs(session, service.rpc_batch.shared_session)
+        self.assertEqual(session.get_adapter(service.rpc_url)._pool_maxsize, 3)
+
+    def test_health_probe_is_cached(self):
+        from .blockchain_service import BlockchainService
+
+        service = BlockchainService()
+        probes = []
+        service._w3 = SimpleNamespace(is_connected=lambda: probes.append(1) or True)
+
+        self.assertTrue(service.is_connected())
+        self.assertTrue(service.is_connected())
+        self.assertEqual(len(probes), 1)
+
+        service._health_checked_at -= 31
+        self.assertTrue(service.is_connected())
+        self.assertEqual(len(probes), 2)
+
+
+class ChainSnapshotTests(TestCase):
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.user = make_user(1)
+        self.user.wallet_address = '0x' + 'ab' * 20
+        self.user.save()
+
+    def test_dashboard_reads_snapshot_without_rpc(self):
+        from .chain_snapshot_service import chain_snapshot_service
+        from .dashboard_service import dashboard_service
+
+        node = FakeNode(block=7, balances={self.user.wallet_address: 12})
+        with self.captureOnCommitCallbacks(execute=True):
+            chain_snapshot_service.refresh(node)
+        self.assertEqual(set(node.calls), {7})
+
+        node.calls.clear()
+        sync = dashboard_service.get_comprehensive_analytics(self.user)['additional_metrics']['blockchain_sync']
+        self.assertEqual(node.calls, [])
+        self.assertEqual((sync['block_number'], sync['blockchain_price']), (7, 52.0))
+        self.assertEqual((sync['blockchain_balance'], sync['total_supply']), (12.0, 1000.0))
+        self.assertFalse(sync['stale'])
+
+        # A failed refresh keeps the last good figures and reports the error
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(chain_snapshot_service.refresh(FakeNode(block=8, balances={}, fail=True)))
+        sync = chain_snapshot_service.for_user(self.user)
+        self.assertEqual(sync['block_number'], 7)
+        self.assertIn('unavailable', sync['error'])
+
+
+class FakeSender:
+    """A node that checks nonces like one that does not queue, sending from one account"""
+
+    ADDRESS = '0x' + 'cd' * 20
+
+    def __init__(self, count=5):
+        self.count = count
+        self.sent = []
+        self.lock = threading.Lock()
+        self.w3 = SimpleNamespace(eth=SimpleNamespace(
+            get_transaction_count=lambda address, block='latest': self.count,
+            account=SimpleNamespace(sign_transaction=lambda tx, key: SimpleNamespace(raw_transaction=tx['nonce'])),
+            send_raw_transaction=self.send,
+        ))
+
+    def send(self, nonce):
+        with self.lock:
+            if nonce != self.count:
+                raise ValueError(f"Invalid transaction nonce: Expected {self.count}, but got {nonce}")
+            self.count += 1
+            self.sent.append(nonce)
+            return f"hash{nonce}"
+
+
+class NonceManagerTests(SimpleTestCase):
+
+    def test_concurrent_allocation_is_unique(self):
+        from .nonce_manager import NonceManager
+
+        nonces = NonceManager(FakeSender(count=5).w3)
+        allocated = []
+
+        def allocate():
+            for _ in range(50):
+                allocated.append(nonces.allocate(FakeSender.ADDRESS))
+
+        threads = [threading.Thread(target=allocate) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(allocated), list(range(5, 405)))
+
+    def test_released_nonces_are_reused_first(self):
+        from .nonce_manager import NonceManager
+
+        nonces = NonceManager(FakeSender(count=0).w3)
+        a, b, c = (nonces.allocate(FakeSender.ADDRESS) for _ in range(3))
+        nonces.release(FakeSender.ADDRESS, a)
+        self.assertEqual(nonces.pending(FakeSender.ADDRESS), (3, [0]))
+        self.assertEqual(nonces.allocate(FakeSender.ADDRESS), a)
+
+        # Releasing the newest nonces winds the counter back instead
+        nonces.release(FakeSender.ADDRESS, b)
+        nonces.release(FakeSender.ADDRESS, c)
+        self.assertEqual(nonces.pending(FakeSender.ADDRESS), (1, []))
+
+    def test_send_recovers_from_nonce_errors(self):
+        from .nonce_manager import NonceManager, send_transaction
+
+        node = FakeSender(count=3)
+        nonces = NonceManager(node.w3)
+        build = lambda nonce: {'nonce': nonce}
+
+        # Another sender of the account used nonces 3 and 4
+        nonces.allocate(FakeSender.ADDRESS)
+        node.count = 5
+        nonces.release(FakeSender.ADDRESS, 3)
+        signed = []
+
+        def on_signed(raw, nonce):
+            signed.append((nonce, nonce in node.sent))
+        self.assertEqual(
+            send_transaction(node.w3, nonces, FakeSender.ADDRESS, 'key', build, on_signed=on_signed), 'hash5'
+        )
+        self.assertEqual(nonces.pending(FakeSender.ADDRESS), (6, []))
+        # Each signed version is reported before the node has it
+        self.assertEqual(signed, [(3, False), (5, False)])
+
+        # Nonce 7 reaching the node before 6 is resent once 6 is in
+        ahead = nonces.allocate(FakeSender.ADDRESS)
+        later = threading.Timer(0.02, lambda: node.send(6))
+        later.start()
+        self.assertEqual(send_transaction(node.w3, nonces, FakeSender.ADDRESS, 'key', build), 'hash7')
+        later.join()
+        self.assertEqual((ahead, node.sent), (6, [5, 6, 7]))
+
+        # Any other rejection gives the nonce back
+        node.w3.eth.send_raw_transaction = lambda raw: (_ for _ in ()).throw(ValueError('insufficient funds'))
+        with self.assertRaises(ValueError):
+            send_transaction(node.w3, nonces, FakeSender.ADDRESS, 'key', build)
+        self.assertEqual(nonces.pending(FakeSender.ADDRESS), (8, []))
+
+
+class FakeLogNode:
+    """A chain of blocks with Transfer logs, served through get_logs"""
+
+    def __init__(self):
+        self.rpc_url = 'fake'
+        self.blocks = []  # (hash, [(from, to, amount)]) per block number
+        self.log_requests = []
+        self.w3 = SimpleNamespace(eth=SimpleNamespace(
+            block_number=-1,
+            get_block=lambda number: {'hash': self.blocks[number][0]},
+            get_logs=self.get_logs,
+        ))
+
+    def is_connected(self):
+        return True
+
+    def mine(self, *transfers, fork='a'):
+        self.blocks.append((f"0x{fork}{len(self.blocks):063x}", list(transfers)))
+        self.w3.eth.block_number = len(self.blocks) - 1
+
+    def get_logs(self, params):
+        from .chain_indexer import TRANSFER_TOPIC
+
+        self.log_requests.append((params['fromBlock'], params['toBlock']))
+        logs = []
+        for number in range(params['fromBlock'], params['toBlock'] + 1):
+            block_hash, transfers = self.blocks[number]
+            for index, (from_address, to_address, amount) in enumerate(transfers):
+                logs.append({
+                    'blockNumber': number,
+                    'blockHash': block_hash,
+                    'transactionHash': f"0x{block_hash[2]}{number:031x}{index:032x}",
+                    'logIndex': index,
+                    'topics': [TRANSFER_TOPIC, '0x' + from_address[2:].rjust(64, '0'), '0x' + to_address[2:].rjust(64, '0')],
+                    'data': hex(amount * 10 ** 18),
+                })
+        return logs
+
+
+class ChainIndexerTests(TestCase):
+
+    ZERO = '0x' + '0' * 40
+    ALICE = '0x' + 'a1' * 20
+    BOB = '0x' + 'b0' * 20
+
+    def setUp(self):
+        from .chain_indexer import ChainIndexer
+
+        self.indexer = ChainIndexer()
+        self.indexer.chunk_blocks = 3
+        self.indexer.confirmations = 3
+        self.node = FakeLogNode()
+        self.node.mine()
+        self.node.mine((self.ZERO, self.ALICE, 10))
+        for _ in range(5):
+            self.node.mine((self.ALICE, self.BOB, 1))
+        self.node.mine((self.BOB, self.ZERO, 2))
+
+    def test_indexes_in_chunks_and_resumes(self):
+        from .chain_indexer import TRANSFER_TOPIC
+
+        self.assertEqual(TRANSFER_TOPIC, Web3.to_hex(Web3.keccak(text='Transfer(address,address,uint256)')))
+        self.assertEqual(self.indexer.index(self.node, max_chunks=2), 5)
+        self.assertEqual(self.indexer.checkpoint().block_number, 5)
+
+        # A restart carries on from the checkpoint
+        self.assertEqual(self.indexer.index(self.node), 2)
+        self.assertEqual(self.node.log_requests, [(0, 2), (3, 5), (6, 7)])
+        self.assertEqual(self.indexer.index(self.node), 0)
+        self.assertEqual(
+            list(ChainEvent.objects.values_list('event', flat=True).order_by('block_number')),
+            ['mint'] + ['transfer'] * 5 + ['burn'],
+        )
+
+        events = self.indexer.events_for(Web3.to_checksum_address(self.BOB))
+        self.assertEqual([(e.block_number, e.event) for e in events][:2], [(7, 'burn'), (6, 'transfer')])
+        self.assertEqual((events[0].from_address, events[0].to_address, events[0].amount), (self.BOB, '', 2))
+
+    def test_reorg_rolls_back_above_confirmation_depth(self):
+        self.indexer.index(self.node)
+        # Blocks 6 and 7 are replaced by a fork with a single different transfer
+        del self.node.blocks[6:]
+        self.node.mine((self.BOB, self.ALICE, 4), fork='b')
+        self.node.mine(fork='b')
+
+        self.assertEqual(self.indexer.index(self.node), 2)
+        self.assertEqual(self.indexer.checkpoint().block_number, 7)
+        self.assertEqual(self.node.log_requests[-1], (5, 7))
+        self.assertEqual(ChainEvent.objects.filter(event='burn').count(), 0)
+        self.assertEqual(ChainEvent.objects.get(block_number=6).amount, 4)
+        self.assertEqual(ChainEvent.objects.count(), 6)
+
+        response = self.client.get('/api/chain/events/', {'address': self.ALICE, 'limit': 2})
+        data = response.json()
+        self.assertEqual(data['indexedBlock'], 7)
+        self.assertEqual([(e['blockNumber'], e['from'], e['to']) for e in data['events']],
+                         [(6, self.BOB, self.ALICE), (5, self.ALICE, self.BOB)])
+        self.assertEqual(self.client.get('/api/chain/events/').status_code, 400)
+
+
+class WorkerDied(BaseException):
+    """A poller's process going away mid-send, which no except Exception catches"""
+
+
+class FakeChain:
+    """Just enough of BlockchainService for the receipt poller"""
+
+    def __init__(self):
+        self.sent = []
+        self.receipts = {}
+        self.next_nonce = 0
+        self.dies = None  # 'before_send' or 'after_send' to stop the next send there
+
+    def is_ready(self):
+        return True
+
+    def submit_call(self, kind, payload, nonce=None, gas_price=None, on_signed=None):
+        if nonce is None:
+            nonce, self.next_nonce = self.next_nonce, self.next_nonce + 1
+        gas_price = gas_price or 100
+        # Like a signed transaction, the hash only depends on what was signed
+        tx_hash = f"0x{nonce:032x}{gas_price:032x}"
+        if on_signed:
+            on_signed(tx_hash, nonce, gas_price)
+        dies, self.dies = self.dies, None
+        if dies == 'before_send':
+            raise WorkerDied
+        if self.get_transaction(tx_hash) is None:
+            self.sent.append((kind, nonce, gas_price, tx_hash))
+        if dies == 'after_send':
+            raise WorkerDied
+        return tx_hash, nonce, gas_price
+
+    def get_transaction(self, tx_hash):
+        return next(({'hash': h, 'nonce': n} for _, n, _, h in self.sent if h == tx_hash), None)
+
+    def pending_nonce(self):
+        nonces = {n for _, n, _, _ in self.sent}
+        nonce = 0
+        while nonce in nonces:
+            nonce += 1
+        return nonce
+
+    def get_transaction_receipt(self, tx_hash):
+        return self.receipts.get(tx_hash)
+
+    def mine(self, tx_hash, status=1):
+        self.receipts[tx_hash] = {'transactionHash': tx_hash, 'blockNumber': len(self.receipts) + 1, 'status': status}
+
+
+class ChainTxTests(TestCase):
+
+    def setUp(self):
+        from .chain_tx_service import chain_tx_service
+
+        self.service = chain_tx_service
+        self.service.mirror_writes = True
+        self.addCleanup(setattr, self.service, 'mirror_writes', False)
+        self.chain = FakeChain()
+        self.owner = make_user(1, role='producer')
+        self.batch = HydrogenBatch.objects.create(
+            producer=self.owner, quantity_kg=100, production_date='2025-01-01'
+        )
+
+    def test_write_returns_queued_and_poller_confirms(self):
+        credit, tx = credit_service.mint(self.batch, self.owner, Decimal('10'), 'placeholder')
+        response = self.client.get(f'/api/chain/tx/{tx.tx_id}/')
+        self.assertEqual(response.json()['status'], 'queued')
+
+        self.assertEqual(self.service.poll(self.chain), 0)
+        (kind, nonce, _, chain_hash), = self.chain.sent
+        self.assertEqual((kind, nonce), ('mint', 0))
+        self.assertEqual(PendingChainTx.objects.get().status, 'submitted')
+
+        self.chain.mine(chain_hash)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.service.poll(self.chain), 1)
+        credit.refresh_from_db()
+        tx.refresh_from_db()
+        self.assertEqual((credit.tx_hash, tx.tx_hash), (chain_hash, chain_hash))
+
+        data = self.client.get(f'/api/chain/tx/{tx.tx_id}/').json()
+        self.assertEqual((data['status'], data['chainTxHash'], data['blockNumber']), ('confirmed', chain_hash, 1))
+        change = LedgerChange.objects.get(user=self.owner, kind='chain')
+        self.assertEqual(change.data['status'], 'confirmed')
+        self.assertEqual(self.client.get('/api/chain/tx/999/').status_code, 404)
+
+    def test_each_queued_write_is_sent_by_one_worker(self):
+        from .chain_tx_service import ChainTxService
+
+        for n in range(2):
+            credit_service.mint(self.batch, self.owner, Decimal('10'), f'placeholder-{n}')
+        other_worker = ChainTxService()
+        submit_call = self.chain.submit_call
+
+        def submit_call_racing_other_worker(*args, **kwargs):
+            # The other worker's poller runs while this one sends its first write
+            self.chain.submit_call = submit_call
+            other_worker.poll(self.chain)
+            return submit_call(*args, **kwargs)
+        self.chain.submit_call = submit_call_racing_other_worker
+
+        self.service.poll(self.chain)
+        self.assertEqual(len(self.chain.sent), 2)
+        self.assertEqual(set(PendingChainTx.objects.values_list('status', flat=True)), {'submitted'})
+
+    def test_writes_left_mid_send_are_reclaimed_and_sent_once(self):
+        from django.utils.timezone import now
+
+        for n in range(2):
+            credit_service.mint(self.batch, self.owner, Decimal('10'), f'placeholder-{n}')
+
+        # One worker dies after signing the first write, the next just after sending the second
+        for dies in ('before_send', 'after_send'):
+            self.chain.dies = dies
+            with self.assertRaises(WorkerDied):
+                self.service.poll(self.chain)
+        self.assertEqual([nonce for _, nonce, _, _ in self.chain.sent], [1])
+        self.assertEqual(list(PendingChainTx.objects.values_list('status', 'nonce')), [('submitting', 0), ('submitting', 1)])
+
+        # Nobody takes them over until they have been left for STUCK_TX_AFTER
+        self.service.poll(self.chain)
+        self.assertEqual(len(self.chain.sent), 1)
+        PendingChainTx.objects.update(updated_at=now() - self.service.stuck_after)
+        self.service.poll(self.chain)
+
+        # The first goes out with the nonce it was signed with; the node already has the second
+        self.assertEqual([nonce for _, nonce, _, _ in self.chain.sent], [1, 0])
+        self.assertEqual(
+            list(PendingChainTx.objects.values_list('status', 'tx_hash')),
+            [('submitted', self.chain.sent[1][3]), ('submitted', self.chain.sent[0][3])],
+        )
+
+    def test_reclaimed_write_takes_a_fresh_nonce_once_its_own_was_used(self):
+        from django.utils.timezone import now
+
+        credit_service.mint(self.batch, self.owner, Decimal('10'), 'placeholder')
+        self.chain.dies = 'before_send'
+        with self.assertRaises(WorkerDied):
+            self.service.poll(self.chain)
+        # Another sender of the account got nonce 0 mined meanwhile
+        self.chain.sent.append(('other', 0, 100, '0xother'))
+
+        PendingChainTx.objects.update(updated_at=now() - self.service.stuck_after)
+        self.service.poll(self.chain)
+        (_, nonce, _, chain_hash), = self.chain.sent[1:]
+        self.assertEqual(nonce, 1)
+        self.assertEqual(PendingChainTx.objects.get().tx_hash, chain_hash)
+
+    def test_stuck_tx_is_resent_with_more_gas(self):
+        _, tx = credit_service.mint(self.batch, self.owner, Decimal('10'), 'placeholder')
+        self.service.poll(self.chain)
+        self.service.stuck_after = timedelta(0)
+        self.addCleanup(setattr, self.service, 'stuck_after', timedelta(seconds=60))
+
+        self.service.poll(self.chain)
+        first, bumped = self.chain.sent
+        self.assertEqual(bumped[1], first[1])  # same nonce
+        self.assertEqual(bumped[2], 115)
+        pending = PendingChainTx.objects.get()
+        self.assertEqual((pending.tx_hash, pending.replaced_hashes, pending.attempts), (bumped[3], [first[3]], 2))
+
+        # The original was mined after all
+        self.chain.mine(first[3])
+        self.service.poll(self.chain)
+        tx.refresh_from_db()
+        self.assertEqual(tx.tx_hash, first[3])
+
+    def test_reverted_tx_fails_and_keeps_ledger_hash(self):
+        credit, _ = credit_service.mint(self.batch, self.owner, Decimal('10'), 'placeholder')
+        _, burn = credit_service.use(self.owner, credit.credit_id, 4)
+        self.service.poll(self.chain)
+        for _, _, _, chain_hash in self.chain.sent:
+            self.chain.mine(chain_hash, status=0 if chain_hash == self.chain.sent[1][3] else 1)
+        self.assertEqual(self.service.poll(self.chain), 2)
+
+        pending = PendingChainTx.objects.get(ledger_tx=burn)
+        self.assertEqual((pending.kind, pending.status), ('burn', 'failed'))
+        self.assertEqual(Transaction.objects.get(pk=burn.pk).tx_hash, burn.tx_hash)
+
+
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.owner = make_user(1, role='producer')
+        self.other = make_user(2)
+        batch = HydrogenBatch.objects.create(
+            producer=self.owner, quantity_kg=100, production_date='2025-01-01'
+        )
+        self.credit, _ = credit_service.mint(batch, self.owner, Decimal('10'), 'async_mint')
+        credit_service.use(self.owner, self.credit.credit_id, 4)
+
+    async def test_async_variants_match_sync_views(self):
+        for sync_path, async_path in [
+            ('/api/batch/list/', '/api/async/batch/list/'),
+            ('/api/leaderboard/', '/api/async/leaderboard/'),
+        ]:
+            sync_response = await self.async_client.get(sync_path)
+            async_response = await self.async_client.get(async_path)
+            self.assertEqual(async_response.status_code, 200)
+            self.assertEqual(async_response.json(), json.loads(sync_response.content))
+
+    async def test_credit_detail_is_owner_only(self):
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncRequestFactory
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from . import async_views, views
+
+        # Anonymous callers cannot name an owner
+        for path in ('/api/credits/', '/api/async/credits/'):
+            response = await self.async_client.get(f'{path}{self.credit.credit_id}/', {'user_id': self.owner.pk})
+            self.assertEqual(response.status_code, 403)
+
+        def requests_as(user):
+            user.is_authenticated = True
+            sync_request = APIRequestFactory().get('/')
+            force_authenticate(sync_request, user=user)
+            return sync_request, as_user(AsyncRequestFactory().get('/'), user)
+
+        sync_request, async_request = requests_as(self.owner)
+        sync_response = await sync_to_async(views.credit_detail)(sync_request, credit_id=self.credit.credit_id)
+        async_response = await async_views.credit_detail(async_request, credit_id=self.credit.credit_id)
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(json.loads(async_response.content), json.loads(json.dumps(sync_response.data)))
+
+        _, async_request = requests_as(self.other)
+        response = await async_views.credit_detail(async_request, credit_id=self.credit.credit_id)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_dashboard(self):
+        response = await self.async_client.get('/api/async/dashboard/analytics/', {'user_id': self.owner.pk})
+        data = response.json()
+        self.assertEqual(data['totalCreditsOwned'], 6.0)
+        self.assertEqual(data['additional_metrics']['total_transactions'], 2)
+        self.assertFalse(data['meta']['partial'])
+
+        self.assertEqual((await self.async_client.get('/api/async/dashboard/analytics/')).status_code, 400)
+        market = (await self.async_client.get('/api/async/market/data/')).json()
+        self.assertEqual(len(market['trend']), 7)
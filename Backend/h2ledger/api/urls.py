@@ -1,5 +1,6 @@
 from django.urls import path
 from .views import *
+from . import async_views
 
 urlpatterns = [
     # Test endpoint
@@ -11,15 +12,29 @@ urlpatterns = [
     # Dashboard endpoints
     path("dashboard/analytics/", dashboard_analytics, name="dashboard_analytics"),
     path("dashboard/transactions/", dashboard_transactions, name="dashboard_transactions"),
+    path("dashboard/cache/", dashboard_cache_stats, name="dashboard_cache_stats"),
     
     # Market data endpoints
     path("market/data/", market_data, name="market_data"),
     path("market/price/", market_data, name="market_price"),  # Alias for compatibility
+    path("market/stream/", market_stream_view, name="market_stream"),
+    path("market/candles/", market_candles, name="market_candles"),
     
     # Trading endpoints
     path("trading/orders/", trading_orders, name="trading_orders"),
+    path("trading/book/", order_book, name="order_book"),
     path("trading/burn/", burn_credits, name="burn_credits"),
     
+    # Delta sync of a user's ledger changes
+    path("changes/", ledger_changes, name="ledger_changes"),
+    
+    # On-chain status of ledger transactions and indexed contract events
+    path("chain/tx/<int:tx_id>/", chain_tx_status, name="chain_tx_status"),
+    path("chain/events/", chain_events, name="chain_events"),
+    
+    # Emissions reporting
+    path("emissions/report/", emissions_report, name="emissions_report"),
+    
     # Legacy dashboard endpoint (for backwards compatibility)
     path("dashboard/", dashboard_view, name="dashboard_view"),
     
@@ -32,6 +47,7 @@ urlpatterns = [
     path("batch/", verify_batch, name="verify_batch"),
     path("batch/create/", create_hydrogen_batch, name="create_hydrogen_batch"),
     path("batch/list/", list_hydrogen_batches, name="list_hydrogen_batches"),
+    path("batch/matching-mode/", set_batch_matching_mode, name="set_batch_matching_mode"),
     
     # Credits endpoints
     path("credits/", list_credits, name="list_credits"),
@@ -39,4 +55,11 @@ urlpatterns = [
 
     # Leaderboard endpoint
     path("leaderboard/", hydrogen_leaderboard, name="hydrogen_leaderboard"),
+
+    # Async variants of the read-heavy endpoints (serve under ASGI)
+    path("async/leaderboard/", async_views.hydrogen_leaderboard, name="async_hydrogen_leaderboard"),
+    path("async/batch/list/", async_views.list_hydrogen_batches, name="async_list_hydrogen_batches"),
+    path("async/credits/<int:credit_id>/", async_views.credit_detail, name="async_credit_detail"),
+    path("async/dashboard/analytics/", async_views.dashboard_analytics, name="async_dashboard_analytics"),
+    path("async/market/data/", async_views.market_data, name="async_market_data"),
 ]
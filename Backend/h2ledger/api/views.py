@@ -1,19 +1,34 @@
 from django.shortcuts import render
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import status
+from django.db import transaction as db_transaction
 from django.db.models import Sum, Count, Q, Avg, Max, Min
-from django.utils.timezone import now, timedelta
-from datetime import datetime, date
+from django.utils.timezone import now, timedelta, is_naive, make_aware
+from datetime import datetime, date, timezone as dt_timezone
+import asyncio
 import hashlib
-import time
 import json
 from decimal import Decimal
 
 
 from .models import *
 from .serializers import *
+from .matching_engine import matching_engine
+from .market_stream import market_stream, user_topic, TRADES_TOPIC, TICKS_TOPIC
+from .change_feed import change_feed, change_topic, serialize_change
+from .candle_service import candle_service, RESOLUTIONS
+from .auction_service import auction_service
+from .dashboard_cache import dashboard_cache, LEADERBOARD_KEY, MARKET_KEY
+from .chain_snapshot_service import CHAIN_KEY
+from .conditional import versioned, shared_resources, user_resources
+from .ledger_summary_service import ledger_summary_service
+from .emissions_rollup_service import emissions_rollup_service, PERIODS
+from .credit_service import credit_service, CreditConflictError, InsufficientCreditError
+from .chain_tx_service import serialize_chain_tx
+from .chain_indexer import chain_indexer, is_hex_address, serialize_event
 from auth1.models import User1
 
 # Test endpoint
@@ -31,6 +46,7 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 
+@versioned(shared_resources(LEADERBOARD_KEY))
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def hydrogen_leaderboard(request):
@@ -92,6 +108,102 @@ def market_data(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _parse_query_datetime(value):
+    """Parse an ISO-8601 query parameter; naive values are taken as UTC"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if is_naive(parsed):
+        parsed = make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def market_candles(request):
+    """
+    OHLCV candles for a resolution (1m, 1h, 1d) and optional ISO-8601
+    start/end range, served from the candle table in a single read
+    """
+    try:
+        resolution = request.query_params.get('resolution', '1h')
+        if resolution not in RESOLUTIONS:
+            return Response(
+                {'error': f"Invalid resolution. Must be one of {list(RESOLUTIONS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        start = _parse_query_datetime(request.query_params.get('start'))
+        end = _parse_query_datetime(request.query_params.get('end'))
+        limit = min(int(request.query_params.get('limit', 500)), 5000)
+
+        candles = candle_service.get_candles(resolution, start=start, end=end, limit=limit)
+        return Response({
+            'resolution': resolution,
+            'candles': [
+                {
+                    'time': candle.bucket_start.isoformat(),
+                    'open': float(candle.open),
+                    'high': float(candle.high),
+                    'low': float(candle.low),
+                    'close': float(candle.close),
+                    'volume': float(candle.volume),
+                    'trades': candle.trade_count
+                }
+                for candle in candles
+            ]
+        }, status=status.HTTP_200_OK)
+
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def emissions_report(request):
+    """
+    CO2 offset totals per day or month across all users (or one user_id)
+    for an optional ISO-8601 start/end date range, read from the rollups
+    """
+    try:
+        period = request.query_params.get('period', 'month')
+        if period not in PERIODS:
+            return Response(
+                {'error': f"Invalid period. Must be one of {list(PERIODS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        user_id = request.query_params.get('user_id')
+        totals = emissions_rollup_service.totals(
+            period,
+            start=date.fromisoformat(start) if start else None,
+            end=date.fromisoformat(end) if end else None,
+            user_id=int(user_id) if user_id else None,
+        )
+        return Response({
+            'period': period,
+            'totals': [
+                {
+                    'periodStart': row['period_start'].isoformat(),
+                    'co2OffsetKg': float(row['co2_offset_kg']),
+                    'creditsBurned': float(row['credits_burned']),
+                    'entries': row['entries'],
+                    'users': row['users']
+                }
+                for row in totals
+            ]
+        }, status=status.HTTP_200_OK)
+
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])  # Temporarily allow any user for testing
 def trading_orders(request):
@@ -153,75 +265,14 @@ def trading_orders(request):
     elif request.method == 'POST':
         try:
             data = request.data.copy()
-            data['user'] = user.id
+            data['user'] = user.pk
             
             serializer = TradingOrderSerializer(data=data)
             if serializer.is_valid():
                 order = serializer.save()
                 
-                # Try to match with existing orders
-                if order.order_type == 'buy':
-                    matching_orders = TradingOrder.objects.filter(
-                        order_type='sell',
-                        price_per_credit__lte=order.price_per_credit,
-                        status='pending'
-                    ).order_by('price_per_credit', 'created_at')
-                else:
-                    matching_orders = TradingOrder.objects.filter(
-                        order_type='buy',
-                        price_per_credit__gte=order.price_per_credit,
-                        status='pending'
-                    ).order_by('-price_per_credit', 'created_at')
-                
-                # Simple order matching logic
-                for match in matching_orders:
-                    if order.quantity <= order.filled_quantity:
-                        break
-                    
-                    available_quantity = match.quantity - match.filled_quantity
-                    trade_quantity = min(order.quantity - order.filled_quantity, available_quantity)
-                    
-                    if trade_quantity > 0:
-                        # Execute trade
-                        trade_price = match.price_per_credit
-                        
-                        # Update order fill quantities
-                        order.filled_quantity += trade_quantity
-                        match.filled_quantity += trade_quantity
-                        
-                        # Update order statuses
-                        if order.filled_quantity >= order.quantity:
-                            order.status = 'completed'
-                        else:
-                            order.status = 'partial'
-                        
-                        if match.filled_quantity >= match.quantity:
-                            match.status = 'completed'
-                        else:
-                            match.status = 'partial'
-                        
-                        order.save()
-                        match.save()
-                        
-                        # Create transaction record
-                        if order.order_type == 'buy':
-                            buyer = order.user
-                            seller = match.user
-                        else:
-                            buyer = match.user
-                            seller = order.user
-                        
-                        # This would need credit transfer logic
-                        # For now, just create a transaction record
-                        Transaction.objects.create(
-                            credit_id=1,  # This should be the actual credit being traded
-                            from_user=seller,
-                            to_user=buyer,
-                            tx_type='transfer',
-                            amount=trade_quantity,
-                            fiat_value_usd=trade_quantity * trade_price,
-                            tx_hash=f"trade_{int(time.time())}_{order.id}_{match.id}"
-                        )
+                # Match against the resident order book; fills are persisted in bulk
+                matching_engine.submit(order)
                 
                 return Response({
                     'order': TradingOrderSerializer(order).data,
@@ -234,6 +285,177 @@ def trading_orders(request):
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def order_book(request):
+    """
+    Aggregated L2 order book depth.
+    Pass `since=<sequence>` to get only the level changes after that sequence;
+    if they are no longer available a full snapshot is returned instead.
+    """
+    try:
+        depth = request.query_params.get('depth')
+        depth = int(depth) if depth else None
+        since = request.query_params.get('since')
+
+        if since is not None:
+            delta = matching_engine.depth_changes(int(since))
+            if delta is not None:
+                return Response({
+                    'snapshot': False,
+                    'sequence': delta['sequence'],
+                    'changes': [
+                        {
+                            'sequence': change.sequence,
+                            'side': change.side,
+                            'price': float(change.price),
+                            'quantity': float(change.quantity)
+                        }
+                        for change in delta['changes']
+                    ]
+                }, status=status.HTTP_200_OK)
+
+        book = matching_engine.depth_snapshot(depth)
+        return Response({
+            'snapshot': True,
+            'sequence': book['sequence'],
+            'bids': [{'price': float(price), 'quantity': float(qty)} for price, qty in book['bids']],
+            'asks': [{'price': float(price), 'quantity': float(qty)} for price, qty in book['asks']]
+        }, status=status.HTTP_200_OK)
+
+    except ValueError:
+        return Response({'error': 'depth and since must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+async def _authenticated_user(request):
+    """The request's authenticated user, or None for anonymous requests"""
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+async def market_stream_view(request):
+    """
+    Server-Sent Events stream of trades, price ticks and, for an
+    authenticated caller, their own balance changes. Serve under ASGI so
+    idle connections do not each hold a worker thread.
+    """
+    topics = [TRADES_TOPIC, TICKS_TOPIC]
+    user = await _authenticated_user(request)
+    if user is not None:
+        topics.append(user_topic(user.pk))
+
+    async def event_stream():
+        subscription = market_stream.subscribe(topics)
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    message = ": keepalive\n\n"
+                yield message
+        finally:
+            market_stream.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+CHANGES_MAX_WAIT_SECONDS = 30
+CHANGES_MAX_LIMIT = 1000
+
+
+async def ledger_changes(request):
+    """
+    The caller's ledger changes (mint, transfer, burn, purchase, order fill,
+    chain confirmation) after `since`, oldest first, with the cursor to pass
+    next time. Without `since` only the current cursor is returned, for
+    clients that have just loaded full lists. With `wait` (seconds) an empty
+    result is held until a change arrives or the wait expires.
+    """
+    user = await _authenticated_user(request)
+    if user is None:
+        return JsonResponse(
+            {'error': 'Authentication credentials were not provided.'}, status=status.HTTP_403_FORBIDDEN
+        )
+    user_id = user.pk
+    since = request.GET.get('since')
+    try:
+        if since is None:
+            return JsonResponse({'cursor': await change_feed.acursor(user_id), 'changes': [], 'hasMore': False})
+        since = int(since)
+        wait = min(float(request.GET.get('wait', 0)), CHANGES_MAX_WAIT_SECONDS)
+        limit = max(1, min(int(request.GET.get('limit', 500)), CHANGES_MAX_LIMIT))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Subscribe before reading so a change committed in between still wakes us
+    subscription = market_stream.subscribe([change_topic(user_id)]) if wait > 0 else None
+    try:
+        changes = await change_feed.asince(user_id, since, limit + 1)
+        if not changes and subscription is not None:
+            try:
+                await asyncio.wait_for(subscription.get(), wait)
+            except asyncio.TimeoutError:
+                pass
+            # Read again either way: a write in another process wakes nobody here
+            changes = await change_feed.asince(user_id, since, limit + 1)
+    finally:
+        if subscription is not None:
+            market_stream.unsubscribe(subscription)
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return JsonResponse({
+        'cursor': changes[-1].id if changes else since,
+        'changes': [serialize_change(change) for change in changes],
+        'hasMore': has_more,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def chain_tx_status(request, tx_id):
+    """
+    On-chain status of a ledger transaction's mirrored write: queued,
+    submitted, confirmed or failed. The parties also get a `chain`
+    change in the change feed when it settles.
+    """
+    try:
+        pending = PendingChainTx.objects.get(ledger_tx_id=tx_id)
+    except PendingChainTx.DoesNotExist:
+        return Response({'error': 'No chain write for this transaction'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(serialize_chain_tx(pending), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def chain_events(request):
+    """
+    Indexed on-chain mints, transfers and burns of a wallet, newest first,
+    served from the local ChainEvent table rather than the node
+    """
+    address = request.GET.get('address', '')
+    if not is_hex_address(address):
+        return Response({'error': 'A valid address is required'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = request.GET.get('limit', '100')
+    limit = min(int(limit), 1000) if limit.isdigit() else 100
+
+    checkpoint = chain_indexer.checkpoint()
+    return Response({
+        'address': address.lower(),
+        'indexedBlock': checkpoint.block_number if checkpoint else None,
+        'events': [serialize_event(event) for event in chain_indexer.events_for(address, limit)],
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def burn_credits(request):
@@ -247,41 +469,23 @@ def burn_credits(request):
         if not credit_ids:
             return Response({'error': 'No credits specified'}, status=status.HTTP_400_BAD_REQUEST)
         
-        total_burned = 0
-        for credit_id in credit_ids:
-            try:
-                credit = Credit.objects.get(credit_id=credit_id, owner=user, status='active')
-                
-                # Mark credit as burned
-                credit.status = 'burned'
-                credit.save()
+        with db_transaction.atomic():
+            # Each credit is burned with a conditional update, so concurrent requests cannot burn it twice
+            burned = credit_service.burn(user, credit_ids)
+            total_burned = sum(float(credit.amount) for credit in burned)
+            
+            if total_burned > 0:
+                # Calculate CO2 offset (1 credit = 10 kg CO2 offset)
+                co2_offset = total_burned * 10
                 
-                # Create burn transaction
-                tx_hash = f"burn_{int(time.time())}_{credit_id}"
-                Transaction.objects.create(
-                    credit=credit,
-                    from_user=user,
-                    tx_type='burn',
-                    amount=credit.amount,
-                    tx_hash=tx_hash
+                # Record emissions data
+                EmissionsData.objects.create(
+                    user=user,
+                    credits_burned=Decimal(str(total_burned)),
+                    co2_offset_kg=Decimal(str(co2_offset))
                 )
-                
-                total_burned += float(credit.amount)
-                
-            except Credit.DoesNotExist:
-                continue
         
         if total_burned > 0:
-            # Calculate CO2 offset (1 credit = 10 kg CO2 offset)
-            co2_offset = total_burned * 10
-            
-            # Record emissions data
-            EmissionsData.objects.create(
-                user=user,
-                credits_burned=Decimal(str(total_burned)),
-                co2_offset_kg=Decimal(str(co2_offset))
-            )
-            
             return Response({
                 'credits_burned': total_burned,
                 'co2_offset_kg': co2_offset,
@@ -294,6 +498,7 @@ def burn_credits(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@versioned(user_resources(MARKET_KEY, CHAIN_KEY))
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Temporarily allow any user for testing
 def dashboard_analytics(request):
@@ -365,6 +570,16 @@ def _fallback_dashboard_analytics(request):
         }, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def dashboard_cache_stats(request):
+    """
+    Hit/miss counters of the per-user dashboard cache in this process
+    """
+    return Response(dashboard_cache.stats(), status=status.HTTP_200_OK)
+
+
+@versioned(user_resources())
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Temporarily allow any user for testing
 def dashboard_transactions(request):
@@ -432,6 +647,7 @@ def dashboard_transactions(request):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@versioned(user_resources())
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Temporarily allow any user for testing
 def list_credits(request):
@@ -496,6 +712,43 @@ def list_credits(request):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _credit_detail_payload(credit, transactions):
+    """Credit detail response body; expects batch, producer and tx users to be loaded"""
+    transaction_history = []
+    for tx in transactions:
+        transaction_history.append({
+            'id': tx.tx_id,
+            'type': tx.tx_type,
+            'amount': float(tx.amount),
+            'fromUser': tx.from_user.name if tx.from_user else None,
+            'toUser': tx.to_user.name if tx.to_user else None,
+            'fiatValue': float(tx.fiat_value_usd) if tx.fiat_value_usd else None,
+            'txHash': tx.tx_hash,
+            'timestamp': tx.timestamp.isoformat()
+        })
+
+    credit_data = {
+        'id': credit.credit_id,
+        'batchId': credit.batch.batch_id,
+        'amount': float(credit.amount),
+        'status': credit.status,
+        'txHash': credit.tx_hash,
+        'createdAt': credit.created_at.isoformat(),
+        'batch': {
+            'id': credit.batch.batch_id,
+            'producer': credit.batch.producer.name,
+            'producerEmail': credit.batch.producer.email,
+            'quantityKg': float(credit.batch.quantity_kg),
+            'productionDate': credit.batch.production_date.isoformat(),
+            'certification': credit.batch.certification,
+            'isApproved': credit.batch.is_approved,
+            'createdAt': credit.batch.created_at.isoformat()
+        },
+        'transactions': transaction_history
+    }
+    return credit_data
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def credit_detail(request, credit_id):
@@ -505,43 +758,14 @@ def credit_detail(request, credit_id):
     try:
         user = request.user if hasattr(request, 'user') else None
         
-        credit = Credit.objects.get(credit_id=credit_id, owner=user)
+        credit = Credit.objects.select_related('batch__producer').get(credit_id=credit_id, owner=user)
         
         # Get transaction history for this credit
-        transactions = Transaction.objects.filter(credit=credit).order_by('-timestamp')
+        transactions = Transaction.objects.filter(credit=credit).select_related(
+            'from_user', 'to_user'
+        ).order_by('-timestamp')
         
-        transaction_history = []
-        for tx in transactions:
-            transaction_history.append({
-                'id': tx.tx_id,
-                'type': tx.tx_type,
-                'amount': float(tx.amount),
-                'fromUser': tx.from_user.name if tx.from_user else None,
-                'toUser': tx.to_user.name if tx.to_user else None,
-                'fiatValue': float(tx.fiat_value_usd) if tx.fiat_value_usd else None,
-                'txHash': tx.tx_hash,
-                'timestamp': tx.timestamp.isoformat()
-            })
-        
-        credit_data = {
-            'id': credit.credit_id,
-            'batchId': credit.batch.batch_id,
-            'amount': float(credit.amount),
-            'status': credit.status,
-            'txHash': credit.tx_hash,
-            'createdAt': credit.created_at.isoformat(),
-            'batch': {
-                'id': credit.batch.batch_id,
-                'producer': credit.batch.producer.name,
-                'producerEmail': credit.batch.producer.email,
-                'quantityKg': float(credit.batch.quantity_kg),
-                'productionDate': credit.batch.production_date.isoformat(),
-                'certification': credit.batch.certification,
-                'isApproved': credit.batch.is_approved,
-                'createdAt': credit.batch.created_at.isoformat()
-            },
-            'transactions': transaction_history
-        }
+        credit_data = _credit_detail_payload(credit, transactions)
         
         return Response(credit_data, status=status.HTTP_200_OK)
         
@@ -558,7 +782,9 @@ def create_hydrogen_batch(request):
         serializer = HydrogenBatchSerializer(data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            # The producer's batch counter is updated in the same transaction
+            with db_transaction.atomic():
+                serializer.save()
             return Response(
                 {"message": True, "batch": serializer.data},
                 status=status.HTTP_201_CREATED
@@ -569,12 +795,39 @@ def create_hydrogen_batch(request):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def set_batch_matching_mode(request):
+    """
+    Switch a batch between continuous matching and periodic call auctions
+    """
+    try:
+        batch_id = request.data.get("batch_id")
+        mode = request.data.get("matching_mode")
+        if mode not in dict(HydrogenBatch.MATCHING_MODES):
+            return Response(
+                {"error": "matching_mode must be 'continuous' or 'auction'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        batch = auction_service.set_mode(batch_id, mode)
+        return Response(
+            {"batch_id": batch.batch_id, "matching_mode": batch.matching_mode},
+            status=status.HTTP_200_OK
+        )
+
+    except HydrogenBatch.DoesNotExist:
+        return Response({"error": "Batch not found"}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def list_hydrogen_batches(request):
 
     try:
-        batches = HydrogenBatch.objects.all().order_by("-created_at")
+        batches = HydrogenBatch.objects.select_related("producer").order_by("-created_at")
         serializer = HydrogenBatchSerializer(batches, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Exception as e:
@@ -598,23 +851,7 @@ def mint_credit(request):
         tx_raw = f"mint-{batch_id}-{owner_id}-{now()}"
         tx_hash = hashlib.sha256(tx_raw.encode()).hexdigest()
 
-        credit = Credit.objects.create(
-            batch=batch,
-            owner=owner,
-            amount=amount,
-            status="active",
-            tx_hash=tx_hash,
-        )
-
-        transaction = Transaction.objects.create(
-            credit=credit,
-            from_user=None,   # Mint has no "from"
-            to_user=owner,
-            tx_type="mint",
-            amount=amount,
-            fiat_value_usd=None,
-            tx_hash=tx_hash,
-        )
+        credit, transaction = credit_service.mint(batch, owner, amount, tx_hash)
 
 
         credit_serializer = CreditSerializer(credit)
@@ -663,23 +900,7 @@ def mint_credit(request):
         tx_hash = hashlib.sha256(tx_raw.encode()).hexdigest()
 
   
-        credit = Credit.objects.create(
-            batch=batch,
-            owner=owner,
-            amount=amount,
-            status="active",
-            tx_hash=tx_hash,
-        )
-
-        transaction = Transaction.objects.create(
-            credit=credit,
-            from_user=None,   # Mint has no "from"
-            to_user=owner,
-            tx_type="mint",
-            amount=amount,
-            fiat_value_usd=None,
-            tx_hash=tx_hash,
-        )
+        credit, transaction = credit_service.mint(batch, owner, amount, tx_hash)
 
        
         credit_serializer = CreditSerializer(credit)
@@ -709,40 +930,18 @@ def transfer_credit(request):
         to_user_id = data.get("to_user_id")
         amount = data.get("amount")
         fiat_value_usd = amount/5
-        credit = Credit.objects.get(credit_id=credit_id)
-        from_user = credit.owner
         to_user = User1.objects.get(user_id=to_user_id)
 
-       
-        if credit.status != "active":
-            return Response({"error": "Credit is not active"}, status=status.HTTP_400_BAD_REQUEST)
-
-        if float(amount) > float(credit.amount):
-            return Response({"error": "Insufficient credit amount"}, status=status.HTTP_400_BAD_REQUEST)
-
-        
-        tx_raw = f"{credit_id}{from_user.user_id}{to_user.user_id}{now()}"
-        tx_hash = hashlib.sha256(tx_raw.encode()).hexdigest()
-
-
-        transaction = Transaction.objects.create(
-            credit=credit,
-            from_user=from_user,
-            to_user=to_user,
-            tx_type="transfer",
-            amount=amount,
-            fiat_value_usd=fiat_value_usd,
-            tx_hash=tx_hash,
-        )
-
-        credit.owner = to_user
-        credit.status = "transferred"
-        credit.save()
+        # Ownership moves with a compare-and-swap update inside one DB transaction
+        transaction = credit_service.transfer(credit_id, to_user, amount, fiat_value_usd)
 
-      
         serializer = TransactionSerializer(transaction)
         return Response({"message": True, "transaction": serializer.data}, status=status.HTTP_201_CREATED)
 
+    except CreditConflictError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except InsufficientCreditError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Credit.DoesNotExist:
         return Response({"error": "Credit not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -801,40 +1000,22 @@ def use_credit(request):
         if not credit_id or not amount:
             return Response({"error": "credit_id and amount are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        credit = Credit.objects.get(credit_id=credit_id, owner=user)
-
-        if amount > credit.amount:
-            return Response({"error": "Insufficient credit balance"}, status=status.HTTP_400_BAD_REQUEST)
-
-        credit.amount -= amount
-        if credit.amount == 0:
-            credit.status = "burned"
-        credit.save()
-
-        raw_data = f"{credit_id}{user.user_id}{amount}{time.time()}"
-        tx_hash = hashlib.sha256(raw_data.encode()).hexdigest()
-
-        tx = Transaction.objects.create(
-            credit=credit,
-            from_user=user,
-            to_user=None,  # since credits are burned, no receiver
-            tx_type="burn",
-            amount=amount,
-            fiat_value_usd=None,
-            tx_hash=tx_hash
-        )
+        # Atomic F() decrement guarded by amount >= requested; no lost updates
+        remaining, tx = credit_service.use(user, credit_id, amount)
 
         return Response(
             {
                 "message": "Credit used successfully ✅",
-                "credit_id": credit.credit_id,
-                "remaining_amount": credit.amount,
+                "credit_id": credit_id,
+                "remaining_amount": remaining,
                 "tx_id": tx.tx_id,
-                "tx_hash": tx_hash
+                "tx_hash": tx.tx_hash
             },
             status=status.HTTP_200_OK
         )
 
+    except InsufficientCreditError:
+        return Response({"error": "Insufficient credit balance"}, status=status.HTTP_400_BAD_REQUEST)
     except Credit.DoesNotExist:
         return Response({"error": "Credit not found or not owned by you"}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
@@ -846,17 +1027,20 @@ def dashboard_view(request):
     try:
         user = request.user
 
-        total_credits = Credit.objects.filter(owner=user, status="active").aggregate(total=Sum("amount"))["total"] or 0
+        summary = ledger_summary_service.get(user.pk)
+        total_credits = summary.credits_owned
 
         today = now().date()
-        week_start = today - timedelta(days=7)
+        today_start = now().replace(hour=0, minute=0, second=0, microsecond=0)
+        week_start = today_start - timedelta(days=7)
 
+        # Range filters on the raw timestamp keep the (tx_type, timestamp) index usable
         credits_traded_today = Transaction.objects.filter(
-            tx_type="transfer", timestamp__date=today
+            tx_type="transfer", timestamp__gte=today_start
         ).aggregate(total=Sum("amount"))["total"] or 0
 
         credits_traded_week = Transaction.objects.filter(
-            tx_type="transfer", timestamp__date__gte=week_start
+            tx_type="transfer", timestamp__gte=week_start
         ).aggregate(total=Sum("amount"))["total"] or 0
 
         recent_tx = Transaction.objects.filter(tx_type="transfer").order_by("-timestamp")[:10]
@@ -865,21 +1049,22 @@ def dashboard_view(request):
         else:
             avg_price = 0
 
-        emissions_offset = Transaction.objects.filter(
-            tx_type="burn", from_user=user
-        ).aggregate(total=Sum("amount"))["total"] or 0
+        emissions_offset = summary.credits_burned
 
         monthly_target = 12000 
         monthly_progress = (emissions_offset / monthly_target) * 100 if monthly_target > 0 else 0
 
+        # Daily candles for the previous five days in one indexed read
+        daily_prices = {
+            candle.bucket_start.date(): float(candle.vwap)
+            for candle in candle_service.get_candles(
+                "1d", start=today_start - timedelta(days=5), end=today_start - timedelta(days=1)
+            )
+        }
         trend = []
         for i in range(5, 0, -1):
             day = today - timedelta(days=i)
-            day_tx = Transaction.objects.filter(tx_type="transfer", timestamp__date=day)
-            if day_tx.exists():
-                avg_day_price = sum([float(t.fiat_value_usd or 0) / float(t.amount or 1) for t in day_tx]) / len(day_tx)
-            else:
-                avg_day_price = avg_price
+            avg_day_price = daily_prices.get(day, avg_price)
             trend.append({"date": str(day), "price": round(avg_day_price, 2)})
 
         return Response(
@@ -1,66 +1,79 @@
-from web3 import Web3
+from functools import lru_cache
 import json
-from web3.middleware import geth_poa_middleware
-
 
-w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+from web3 import Web3
 
-if not w3.is_connected():
-    raise Exception("❌ Could not connect to Hardhat node")
+from .nonce_manager import NonceManager, send_transaction
 
-print("✅ Connected to Hardhat")
 
+RPC_URL = "http://127.0.0.1:8545"
 contract_address = "0xe7f1725E7734CE288F8367e1Bb143E90bb3F0512"
 
-with open("./artifacts/contracts/HydrogenCredits.sol/HydrogenCredits.json") as f:
-    contract_json = json.load(f)
-    abi = contract_json["abi"]
 
-contract = w3.eth.contract(address=contract_address, abi=abi)
+@lru_cache(maxsize=None)
+def _client():
+    """
+    Connect on first use rather than at import, so importing this module
+    never blocks on (or fails without) the Hardhat node.
+    """
+    w3 = Web3(Web3.HTTPProvider(RPC_URL))
+    if not w3.is_connected():
+        _client.cache_clear()
+        raise Exception("❌ Could not connect to Hardhat node")
+    print("✅ Connected to Hardhat")
+
+    with open("./artifacts/contracts/HydrogenCredits.sol/HydrogenCredits.json") as f:
+        contract_json = json.load(f)
+        abi = contract_json["abi"]
+
+    contract = w3.eth.contract(address=contract_address, abi=abi)
+
+    # Nonces are counted locally per sender, so transactions can be sent back to back
+    nonces = NonceManager(w3)
+    return w3, contract, nonces
 
-def mint_tokens(producer_address, verifier_address, verifier_private_key, amount):
 
-    tx = contract.functions.mintCredits(producer_address, amount).buildTransaction({
-        'from': verifier_address,
-        'nonce': w3.eth.get_transaction_count(verifier_address),
+def _send(function, sender_address, sender_private_key):
+    w3, _, nonces = _client()
+    return send_transaction(w3, nonces, sender_address, sender_private_key, lambda nonce: function.build_transaction({
+        'from': sender_address,
+        'nonce': nonce,
         'gas': 2000000,
-        'gasPrice': w3.toWei('10', 'gwei')
-    })
-    signed_tx = w3.eth.account.sign_transaction(tx, private_key=verifier_private_key)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        'gasPrice': w3.to_wei('10', 'gwei')
+    }))
+
+
+def mint_tokens(producer_address, verifier_address, verifier_private_key, amount, wait=True):
+
+    w3, contract, _ = _client()
+    tx_hash = _send(contract.functions.mintCredits(producer_address, amount), verifier_address, verifier_private_key)
+    if not wait:
+        return tx_hash
     receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
     print(f"✅ Minted {amount} tokens to {producer_address}")
     return receipt
 
 
-def transfer_tokens(sender_address, sender_private_key, receiver_address, amount):
+def transfer_tokens(sender_address, sender_private_key, receiver_address, amount, wait=True):
     """
     Transfer tokens between two users.
     """
-    tx = contract.functions.transferTokens(receiver_address, amount).buildTransaction({
-        'from': sender_address,
-        'nonce': w3.eth.get_transaction_count(sender_address),
-        'gas': 2000000,
-        'gasPrice': w3.toWei('10', 'gwei')
-    })
-    signed_tx = w3.eth.account.sign_transaction(tx, private_key=sender_private_key)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+    w3, contract, _ = _client()
+    tx_hash = _send(contract.functions.transferTokens(receiver_address, amount), sender_address, sender_private_key)
+    if not wait:
+        return tx_hash
     receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
     print(f"✅ {amount} tokens transferred from {sender_address} to {receiver_address}")
     return receipt
 
-def burn_tokens(user_address, user_private_key, amount):
+def burn_tokens(user_address, user_private_key, amount, wait=True):
     """
     Burn tokens when buyer uses them.
     """
-    tx = contract.functions.burnCredits(amount).buildTransaction({
-        'from': user_address,
-        'nonce': w3.eth.get_transaction_count(user_address),
-        'gas': 2000000,
-        'gasPrice': w3.toWei('10', 'gwei')
-    })
-    signed_tx = w3.eth.account.sign_transaction(tx, private_key=user_private_key)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+    w3, contract, _ = _client()
+    tx_hash = _send(contract.functions.burnCredits(amount), user_address, user_private_key)
+    if not wait:
+        return tx_hash
     receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
     print(f"✅ {amount} tokens burned by {user_address}")
     return receipt
@@ -69,6 +82,7 @@ def check_balance(user_address):
     """
     Check token balance for any wallet.
     """
+    _, contract, _ = _client()
     balance = contract.functions.getBalance(user_address).call()
     print(f"💰 Balance for {user_address}: {balance}")
     return balance
@@ -181,7 +181,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Scratch database for benchmark_queries (manage.py migrate --database bench first)
+    'bench': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench.sqlite3',
+    },
 }
 
 # Production PostgreSQL database configuration (commented out for development)
@@ -247,7 +252,69 @@ BLOCKCHAIN_SETTINGS = {
     'PRIVATE_KEY': '0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80',  # Default Hardhat account
     'GAS_LIMIT': 3000000,
     'GAS_PRICE': 20000000000,  # 20 gwei
+    'SNAPSHOT_INTERVAL': int(os.getenv('CHAIN_SNAPSHOT_INTERVAL', 0)),  # Seconds between chain snapshots; 0 disables
+    'SNAPSHOT_MAX_AGE': 120,  # Seconds before dashboards flag the snapshot as stale
+    'WATCHED_ADDRESSES': [],  # Balances snapshotted in addition to user wallets
+    'RPC_BATCH_SIZE': 500,  # eth_calls per JSON-RPC batch request in bulk reads
+    'RPC_BATCH_CONCURRENCY': 4,  # Batch requests in flight at once
+    'MIRROR_WRITES': os.getenv('CHAIN_MIRROR_WRITES', 'false').lower() == 'true',  # Queue ledger mints/transfers/burns on chain
+    'RECEIPT_POLL_INTERVAL': int(os.getenv('CHAIN_RECEIPT_POLL_INTERVAL', 0)),  # Seconds between receipt polls; 0 disables
+    'RECEIPT_BATCH_SIZE': 100,  # Pending transactions handled per poll
+    'STUCK_TX_AFTER': 60,  # Seconds without a receipt before resending with more gas
+    'GAS_BUMP_PERCENT': 15,  # Gas price increase per resend (nodes require at least 10)
+    'MAX_TX_ATTEMPTS': 5,  # Sends (first submission plus bumps) per transaction
+    'INDEXER_INTERVAL': int(os.getenv('CHAIN_INDEXER_INTERVAL', 0)),  # Seconds between event indexer passes; 0 disables
+    'INDEXER_CHUNK_BLOCKS': 2000,  # Blocks per eth_getLogs request
+    'INDEXER_CONFIRMATIONS': 12,  # Blocks rolled back when a reorg is detected
+    'INDEXER_START_BLOCK': 0,  # First block indexed (the contract's deployment block)
+    'RPC_TIMEOUT': 10,  # Seconds before a JSON-RPC request to the node gives up
+    'RPC_POOL_SIZE': 10,  # Keep-alive connections to the node shared by all threads
+    'HEALTH_CHECK_INTERVAL': int(os.getenv('CHAIN_HEALTH_CHECK_INTERVAL', 0)),  # Seconds between background node probes; 0 disables
+    'HEALTH_TTL': 30,  # Seconds a health probe result is reused before probing again
 }
 
 # Contract ABI Path
 CONTRACT_ABI_PATH = BASE_DIR.parent.parent / 'hydrogen-credits-contracts' / 'artifacts' / 'contracts' / 'HydrogenCredits.sol' / 'HydrogenCredits.json'
+
+# Trading Configuration
+TRADING_SETTINGS = {
+    'EXPIRY_SWEEP_INTERVAL': int(os.getenv('EXPIRY_SWEEP_INTERVAL', 0)),  # Seconds; 0 disables the in-process sweeper
+    'EXPIRY_SWEEP_BATCH_SIZE': 500,
+    'AUCTION_INTERVAL': int(os.getenv('AUCTION_INTERVAL', 0)),  # Seconds between call auctions; 0 disables
+    'PRICE_RETENTION_HOURS': int(os.getenv('PRICE_RETENTION_HOURS', 168)),  # MarketPrice rows kept at full resolution
+    'PRICE_BUCKET_SECONDS': 3600,  # Older rows are downsampled into buckets of this size
+    'PRICE_COMPACTION_BATCH_SIZE': 10000,
+    'PRICE_COMPACTION_INTERVAL': int(os.getenv('PRICE_COMPACTION_INTERVAL', 0)),  # Seconds; 0 disables the in-process compactor
+}
+
+# Cache Configuration
+# The dashboard alias holds per-user analytics; local memory evicts least recently
+# used entries (CULL_FREQUENCY == MAX_ENTRIES drops one entry at a time). Point it at
+# django.core.cache.backends.filebased.FileBasedCache to share it between workers;
+# ETag/Last-Modified validators are only issued from a shared backend.
+DASHBOARD_CACHE_MAX_ENTRIES = int(os.getenv('DASHBOARD_CACHE_MAX_ENTRIES', 10000))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': os.getenv('DASHBOARD_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DASHBOARD_CACHE_LOCATION', 'h2ledger-dashboard'),
+        'TIMEOUT': int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 300)),  # Seconds
+        'OPTIONS': {
+            'MAX_ENTRIES': DASHBOARD_CACHE_MAX_ENTRIES,
+            'CULL_FREQUENCY': DASHBOARD_CACHE_MAX_ENTRIES,
+        },
+    },
+}
+
+# Dashboard Configuration
+DASHBOARD_SETTINGS = {
+    'SECTION_WORKERS': int(os.getenv('DASHBOARD_SECTION_WORKERS', 8)),  # Threads shared by all requests; 0 runs sections inline
+    'SECTION_TIMEOUTS': {  # Seconds before a section is served from its fallback
+        'user': 2.0,
+        'market': 2.0,
+        'blockchain': 0.5,
+    },
+}